@@ -13,8 +13,12 @@ class CliArgs:
     seasonal: bool
     mal: bool
     delete: bool
+    queue_worker: bool
+    queue_status: bool
+    library_scan: bool
     quality: Optional[Union[str, int]]
     ffmpeg: bool
+    enqueue: bool
     no_season_search: bool
     auto_update: bool
     optional_player: Optional[str]
@@ -96,6 +100,31 @@ def parse_args() -> CliArgs:
         help="Delete your History.",
     )
 
+    actions_group.add_argument(
+        "--queue-worker",
+        required=False,
+        dest="queue_worker",
+        action="store_true",
+        help="Download the jobs in the download queue, keeps running and waits for new ones.",
+    )
+
+    actions_group.add_argument(
+        "--queue-status",
+        required=False,
+        dest="queue_status",
+        action="store_true",
+        help="Show the jobs in the download queue.",
+    )
+
+    actions_group.add_argument(
+        "--library-scan",
+        required=False,
+        dest="library_scan",
+        action="store_true",
+        help="Index the downloaded episodes in the download folders (or -l), "
+        "indexed episodes are not downloaded again.",
+    )
+
     options_group.add_argument(
         "-q",
         "--quality",
@@ -114,6 +143,15 @@ def parse_args() -> CliArgs:
         help="Use ffmpeg to download m3u8 playlists, may be more stable but is way slower than internal downloader",
     )
 
+    options_group.add_argument(
+        "--enqueue",
+        required=False,
+        dest="enqueue",
+        action="store_true",
+        help="Add the episodes to the download queue instead of downloading them now "
+        "(with -D, -S, -a or -M), run --queue-worker to download them.",
+    )
+
     options_group.add_argument(
         "-o",
         "--no-seas-search",
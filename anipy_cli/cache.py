@@ -0,0 +1,135 @@
+import os
+import json
+import time
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from anipy_cli.config import Config
+
+
+class PersistentCache:
+    """
+    Key/value cache that keeps a json file
+    on disk and an in-process dict on top of it.
+    Every value is saved with the time it was stored
+    at, and optionally the time it expires at.
+
+    Use get_cache() to get an instance, so that
+    every part of the program shares the same
+    in-process layer for a file.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._lock = threading.RLock()
+        self._data: Optional[Dict[str, dict]] = None
+
+    def _load(self) -> Dict[str, dict]:
+        if self._data is not None:
+            return self._data
+
+        try:
+            with self.path.open("r") as f:
+                self._data = json.load(f)
+        except (OSError, ValueError):
+            # Missing, unreadable or not json
+            self._data = {}
+
+        if not isinstance(self._data, dict):
+            self._data = {}
+
+        # Drop expired values so the file doesn't grow forever
+        now = time.time()
+        self._data = {
+            k: v
+            for k, v in self._data.items()
+            if v.get("expires") is None or v["expires"] > now
+        }
+
+        return self._data
+
+    def _write(self) -> None:
+        tmp_name = None
+        try:
+            self.path.parent.mkdir(exist_ok=True, parents=True)
+            # A file of its own, other processes write the same cache
+            with tempfile.NamedTemporaryFile(
+                "w", dir=self.path.parent, prefix=self.path.name, delete=False
+            ) as f:
+                tmp_name = f.name
+                json.dump(self._data, f)
+            os.replace(tmp_name, self.path)
+        except OSError:
+            # The in-process layer still works, the
+            # cache just won't survive this process.
+            if tmp_name is not None:
+                Path(tmp_name).unlink(missing_ok=True)
+
+    def get(self, key: str, max_age: Optional[float] = None) -> Any:
+        """
+        Get a value from the cache, returns None
+        if the key is missing, expired or older
+        than max_age seconds.
+        """
+        with self._lock:
+            item = self._load().get(key)
+
+        if item is None:
+            return None
+
+        now = time.time()
+        if item.get("expires") is not None and item["expires"] <= now:
+            return None
+
+        if max_age is not None and now - item["time"] > max_age:
+            return None
+
+        return item["value"]
+
+    def set(self, key: str, value: Any, expires: Optional[float] = None) -> None:
+        """
+        Store a value, expires is a unix timestamp
+        after which the value is not returned anymore.
+        """
+        with self._lock:
+            self._load()[key] = {
+                "value": value,
+                "time": time.time(),
+                "expires": expires,
+            }
+            self._write()
+
+    def invalidate(self, key: str) -> None:
+        with self._lock:
+            if self._load().pop(key, None) is not None:
+                self._write()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data = {}
+            self._write()
+
+
+_caches: Dict[Path, PersistentCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(path: Path) -> PersistentCache:
+    """
+    Return the shared cache for a file.
+    """
+    with _caches_lock:
+        if path not in _caches:
+            _caches[path] = PersistentCache(path)
+
+        return _caches[path]
+
+
+def ep_list_cache() -> PersistentCache:
+    return get_cache(Config().ep_list_cache_path)
+
+
+def stream_cache() -> PersistentCache:
+    return get_cache(Config().stream_cache_path)
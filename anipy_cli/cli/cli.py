@@ -1,6 +1,7 @@
 from anipy_cli.misc import error, dc_presence_connect
 from anipy_cli.arg_parser import parse_args
 from anipy_cli.config import Config
+from anipy_cli.library import Library
 from anipy_cli.colors import cprint, colors
 from anipy_cli.cli.clis import *
 
@@ -23,6 +24,16 @@ def run_cli() -> None:
             error("no history file found")
         return
 
+    elif args.library_scan:
+        roots = [args.location] if args.location else None
+        result = Library().scan(roots)
+        cprint(
+            colors.CYAN,
+            f"Indexed {result.files} episode(s) in {result.seconds:.1f}s, "
+            f"{result.added} new, {result.removed} gone",
+        )
+        return
+
     clis_dict = {
         args.download: DownloadCli,
         args.binge: BingeCli,
@@ -30,6 +41,8 @@ def run_cli() -> None:
         args.history: HistoryCli,
         args.mal: MalCli,
         args.auto_update: SeasonalCli,
+        args.queue_worker: QueueCli,
+        args.queue_status: QueueCli,
     }
 
     cli_class = clis_dict.get(True, DefaultCli)
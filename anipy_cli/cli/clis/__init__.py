@@ -4,3 +4,4 @@ from anipy_cli.cli.clis.mal_cli import MalCli
 from anipy_cli.cli.clis.seasonal_cli import SeasonalCli
 from anipy_cli.cli.clis.binge_cli import BingeCli
 from anipy_cli.cli.clis.download_cli import DownloadCli
+from anipy_cli.cli.clis.queue_cli import QueueCli
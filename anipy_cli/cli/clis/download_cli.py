@@ -5,8 +5,11 @@ from anipy_cli.config import Config
 from anipy_cli.colors import cprint, colors
 from anipy_cli.misc import Entry, parsenum
 from anipy_cli.query import query
-from anipy_cli.url_handler import videourl, epHandler
+from anipy_cli.url_handler import epHandler
+from anipy_cli.scheduler import DownloadScheduler
 from anipy_cli.download import download
+from anipy_cli.library import Library
+from anipy_cli.dl_queue import enqueue_all
 from anipy_cli.cli.util import get_season_searches
 from anipy_cli.cli.clis.base_cli import CliBase
 
@@ -72,18 +75,37 @@ class DownloadCli(CliBase):
             )
 
     def process(self):
+        entries = []
         for ent in self.show_entries:
-            entry = ent["show_entry"]
-            ep_list = ent["ep_list"]
-            for i in ep_list:
+            show_entry = ent["show_entry"]
+            ep_class = epHandler(show_entry)
+            for i in ent["ep_list"]:
+                entry = deepcopy(show_entry)
                 entry.ep = parsenum(i)
                 entry.embed_url = ""
-                ep_class = epHandler(entry)
-                entry = ep_class.gen_eplink()
-                url_class = videourl(entry, self.options.quality)
-                url_class.stream_url()
-                entry = url_class.get_entry()
-                download(entry, self.options.quality, self.options.ffmpeg).download()
+                ep_class.entry = entry
+                entries.append(ep_class.gen_eplink())
+
+        library = Library()
+        count = len(entries)
+        entries = [
+            entry
+            for entry in entries
+            if library.find(download._get_valid_pathname(entry.show_name), entry.ep)
+            is None
+        ]
+        if len(entries) < count:
+            cprint(
+                colors.GREEN,
+                f"Already downloaded: {count - len(entries)} episode(s)",
+            )
+
+        if self.options.enqueue:
+            enqueue_all(entries, self.options.quality, self.options.ffmpeg)
+            return
+
+        cprint(colors.CYAN, f"Downloading {len(entries)} episode(s)...")
+        DownloadScheduler(self.options.quality, self.options.ffmpeg).run(entries)
 
     def show(self):
         pass
@@ -0,0 +1,59 @@
+import time
+
+from anipy_cli.arg_parser import CliArgs
+from anipy_cli.colors import colors, cprint
+from anipy_cli.dl_queue import DownloadQueue, QueueWorker, QUEUED, DONE, FAILED
+from anipy_cli.cli.clis.base_cli import CliBase
+
+
+class QueueCli(CliBase):
+    def __init__(self, options: CliArgs, rpc_client=None):
+        super().__init__(options, rpc_client)
+
+        self.queue = DownloadQueue()
+
+    def print_header(self):
+        if self.options.queue_worker:
+            cprint(colors.GREEN, "***Download Queue Worker***")
+            cprint(colors.GREEN, "Queue: ", colors.END, str(self.queue.path))
+
+    def take_input(self):
+        pass
+
+    def process(self):
+        if self.options.queue_worker:
+            worker = QueueWorker(self.queue)
+            worker.run()
+            cprint(
+                colors.CYAN,
+                f"Downloaded {worker.done} episode(s), {worker.failed} failed attempt(s)",
+            )
+
+    def show(self):
+        if not self.options.queue_status:
+            return
+
+        jobs = self.queue.jobs()
+        if not jobs:
+            cprint(colors.CYAN, "The download queue is empty")
+            return
+
+        cprint(colors.CYAN, "Id    State    Tries  Took     Episode")
+        for job in jobs:
+            took = ""
+            if job.state == DONE and job.started:
+                took = f"{job.finished - job.started:.0f}s"
+            print(
+                f"{job.id:<6}{job.state:<9}{job.attempts:>5}  {took:<9}"
+                f"{job.show_name} EP: {job.ep} ({job.quality})"
+            )
+            if job.state == FAILED or (job.last_error and job.state != DONE):
+                cprint(colors.RED, f"      {job.last_error}")
+            if job.state == QUEUED and job.not_before > time.time():
+                cprint(
+                    colors.YELLOW,
+                    f"      next try in {job.not_before - time.time():.0f}s",
+                )
+
+    def post(self):
+        pass
@@ -4,9 +4,9 @@ from anipy_cli.arg_parser import CliArgs
 from anipy_cli.colors import colors, cprint, cinput
 from anipy_cli.misc import Entry, print_names, error
 from anipy_cli.player import get_player
-from anipy_cli.url_handler import videourl
 from anipy_cli.query import query
-from anipy_cli.download import download
+from anipy_cli.scheduler import DownloadScheduler
+from anipy_cli.dl_queue import enqueue_all
 from anipy_cli.config import Config
 from anipy_cli.mal import MAL
 from anipy_cli.cli.util import binge, get_season_searches
@@ -214,20 +214,20 @@ class MALMenu(MenuBase):
         if not self.options.auto_update:
             cinput(colors.RED, "Enter to continue or CTRL+C to abort.")
 
-        for i in urls:
-            cprint(f"Downloading newest urls for {i}", colors.CYAN)
-            show_entry = Entry()
-            show_entry.show_name = i
-            for j in urls[i]["ep_list"]:
-                show_entry.embed_url = ""
-                show_entry.ep = j[0]
-                show_entry.ep_url = j[1]
-                url_class = videourl(show_entry, self.options.quality)
-                url_class.stream_url()
-                show_entry = url_class.get_entry()
-                download(
-                    show_entry, self.options.quality, self.options.ffmpeg, self.dl_path
-                ).download()
+        entries = [
+            Entry(show_name=i, ep=j[0], ep_url=j[1])
+            for i in urls
+            for j in urls[i]["ep_list"]
+        ]
+        if self.options.enqueue:
+            enqueue_all(
+                entries, self.options.quality, self.options.ffmpeg, self.dl_path
+            )
+        else:
+            cprint(f"Downloading newest urls for {', '.join(urls)}", colors.CYAN)
+            DownloadScheduler(
+                self.options.quality, self.options.ffmpeg, self.dl_path
+            ).run(entries)
 
         if not self.options.auto_update:
             self.print_options()
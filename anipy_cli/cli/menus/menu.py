@@ -10,6 +10,7 @@ from anipy_cli.url_handler import videourl, epHandler
 from anipy_cli.query import query
 from anipy_cli.download import download
 from anipy_cli.config import Config
+from anipy_cli.prefetch import StreamPrefetcher
 from anipy_cli.cli.menus.base_menu import MenuBase, MenuOption
 
 
@@ -21,6 +22,9 @@ class Menu(MenuBase):
         self.options = options
         self.entry = entry
         self.player = player
+        self.prefetcher = StreamPrefetcher(self.options.quality)
+        # The first episode is already playing
+        self.prefetch()
 
     @property
     def menu_options(self) -> List[MenuOption]:
@@ -53,29 +57,55 @@ class Menu(MenuBase):
         url_class.stream_url()
         self.entry = url_class.get_entry()
         self.player.play_title(self.entry)
+        self.prefetch()
+
+    def prefetch(self):
+        self.prefetcher.prefetch(
+            self.entry,
+            next_ep=Config().prefetch_next_ep,
+            prev_ep=Config().prefetch_prev_ep,
+        )
+
+    def play_prefetched(self, ep) -> bool:
+        """
+        Play episode ep if it was prefetched,
+        returns False if it was not.
+        """
+        entry = self.prefetcher.get(self.entry, ep)
+        if entry is None:
+            return False
+
+        self.entry = entry
+        self.player.play_title(self.entry)
+        self.prefetch()
+        return True
 
     def next_ep(self):
-        ep_class = epHandler(self.entry)
-        self.entry = ep_class.next_ep()
-        self.start_ep()
+        if not self.play_prefetched(self.entry.ep + 1):
+            ep_class = epHandler(self.entry)
+            self.entry = ep_class.next_ep()
+            self.start_ep()
         self.print_options()
 
     def prev_ep(self):
-        ep_class = epHandler(self.entry)
-        self.entry = ep_class.prev_ep()
-        self.start_ep()
+        if not self.play_prefetched(self.entry.ep - 1):
+            ep_class = epHandler(self.entry)
+            self.entry = ep_class.prev_ep()
+            self.start_ep()
         self.print_options()
 
     def repl_ep(self):
         self.start_ep()
 
     def selec_ep(self):
+        self.prefetcher.cancel()
         ep_class = epHandler(self.entry)
         self.entry = ep_class.pick_ep()
         self.start_ep()
         self.print_options()
 
     def search(self):
+        self.prefetcher.cancel()
         clear_console()
         query_class = query(input("Search: "), self.entry)
         if query_class.get_links() == 0:
@@ -104,5 +134,6 @@ class Menu(MenuBase):
         self.print_options()
 
     def quit(self):
+        self.prefetcher.cancel()
         self.player.kill_player()
         sys.exit(0)
@@ -8,9 +8,10 @@ from anipy_cli.arg_parser import CliArgs
 from anipy_cli.colors import colors, cprint, cinput
 from anipy_cli.misc import Entry, print_names, error, clear_console
 from anipy_cli.player import get_player
-from anipy_cli.url_handler import videourl, epHandler
+from anipy_cli.url_handler import epHandler
 from anipy_cli.query import query
-from anipy_cli.download import download
+from anipy_cli.scheduler import DownloadScheduler
+from anipy_cli.dl_queue import enqueue_all
 from anipy_cli.config import Config
 from anipy_cli.seasonal import Seasonal
 from anipy_cli.cli.util import get_season_searches, binge
@@ -122,20 +123,20 @@ class SeasonalMenu(MenuBase, Seasonal):
         if not self.options.auto_update:
             cinput(colors.RED, "Enter to continue or CTRL+C to abort.")
 
-        for i in latest_urls:
-            print(f"Downloading newest urls for {i}")
-            show_entry = Entry()
-            show_entry.show_name = i
-            for j in latest_urls[i]["ep_list"]:
-                show_entry.embed_url = ""
-                show_entry.ep = j[0]
-                show_entry.ep_url = j[1]
-                url_class = videourl(show_entry, self.options.quality)
-                url_class.stream_url()
-                show_entry = url_class.get_entry()
-                download(
-                    show_entry, self.options.quality, self.options.ffmpeg, self.dl_path
-                ).download()
+        entries = [
+            Entry(show_name=i, ep=j[0], ep_url=j[1])
+            for i in latest_urls
+            for j in latest_urls[i]["ep_list"]
+        ]
+        if self.options.enqueue:
+            enqueue_all(
+                entries, self.options.quality, self.options.ffmpeg, self.dl_path
+            )
+        else:
+            print(f"Downloading newest urls for {', '.join(latest_urls)}")
+            DownloadScheduler(
+                self.options.quality, self.options.ffmpeg, self.dl_path
+            ).run(entries)
 
         if not self.options.auto_update:
             self.print_options()
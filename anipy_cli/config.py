@@ -48,10 +48,125 @@ class Config:
     def seasonal_file_path(self):
         return self.user_files_path / "seasonals.json"
 
+    @property
+    def ep_list_cache_path(self):
+        return self.user_files_path / "ep_list_cache.json"
+
+    @property
+    def ep_list_cache_ttl(self):
+        return self._get_value("ep_list_cache_ttl", 1800, int)
+
+    @property
+    def stream_cache_path(self):
+        return self.user_files_path / "stream_cache.json"
+
+    @property
+    def stream_cache_ttl(self):
+        return self._get_value("stream_cache_ttl", 1800, int)
+
+    @property
+    def stream_resolve_workers(self):
+        return self._get_value("stream_resolve_workers", 6, int)
+
+    @property
+    def download_workers(self):
+        return self._get_value("download_workers", 12, int)
+
+    @property
+    def download_workers_min(self):
+        return self._get_value("download_workers_min", 2, int)
+
+    @property
+    def download_workers_max(self):
+        return self._get_value("download_workers_max", 24, int)
+
+    @property
+    def download_segment_retries(self):
+        return self._get_value("download_segment_retries", 5, int)
+
+    @property
+    def download_failure_budget(self):
+        return self._get_value("download_failure_budget", 50, int)
+
+    @property
+    def download_verify_segments(self):
+        return self._get_value("download_verify_segments", True, bool)
+
+    @property
+    def download_max_buffered_mb(self):
+        return self._get_value("download_max_buffered_mb", 64, int)
+
+    @property
+    def download_queue_path(self):
+        return self.user_files_path / "download_queue.db"
+
+    @property
+    def download_queue_retries(self):
+        return self._get_value("download_queue_retries", 3, int)
+
+    @property
+    def download_queue_poll_interval(self):
+        return self._get_value("download_queue_poll_interval", 60, int)
+
+    @property
+    def library_index_path(self):
+        return self.user_files_path / "library.db"
+
+    @property
+    def library_scan_workers(self):
+        return self._get_value("library_scan_workers", 8, int)
+
+    @property
+    def download_concurrency_log_path(self):
+        return self.user_files_path / "download_concurrency.log"
+
+    @property
+    def download_mp4_connections(self):
+        return self._get_value("download_mp4_connections", 4, int)
+
+    @property
+    def download_parallel_episodes(self):
+        return self._get_value("download_parallel_episodes", 2, int)
+
+    @property
+    def download_remux_workers(self):
+        return self._get_value("download_remux_workers", 2, int)
+
+    @property
+    def download_max_connections(self):
+        return self._get_value("download_max_connections", 24, int)
+
+    @property
+    def download_connections_per_host(self):
+        # One host can take all the workers of a download
+        return self._get_value(
+            "download_connections_per_host", self.download_workers_max, int
+        )
+
+    @property
+    def download_host_connections(self):
+        return self._get_value("download_host_connections", {}, dict)
+
+    @property
+    def download_speed_limit(self):
+        return self._get_value("download_speed_limit", 0, int)
+
+    @property
+    def request_timeout(self):
+        return self._get_value("request_timeout", 10, int)
+
     @property
     def gogoanime_url(self):
         return self._get_value("gogoanime_url", "https://gogoanime3.co/", str)
 
+    @property
+    def gogoanime_ajax_url(self):
+        return self._get_value("gogoanime_ajax_url", "https://ajax.gogocdn.net/", str)
+
+    @property
+    def gogoanime_max_connections(self):
+        return self._get_value("gogoanime_max_connections", 4, int)
+
     @property
     def player_path(self):
         return self._get_value("player_path", "mpv", str)
@@ -76,6 +191,14 @@ class Config:
     def ffmpeg_log_path(self):
         return self.user_files_path / "ffmpeg_log"
 
+    @property
+    def prefetch_next_ep(self):
+        return self._get_value("prefetch_next_ep", True, bool)
+
+    @property
+    def prefetch_prev_ep(self):
+        return self._get_value("prefetch_prev_ep", False, bool)
+
     @property
     def download_name_format(self):
         return self._get_value(
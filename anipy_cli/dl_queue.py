@@ -0,0 +1,374 @@
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+from anipy_cli.colors import colors, cprint
+from anipy_cli.config import Config
+from anipy_cli.misc import Entry, error, parsenum
+from anipy_cli.scheduler import DownloadScheduler
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    show_name TEXT NOT NULL,
+    ep TEXT NOT NULL,
+    ep_url TEXT NOT NULL,
+    quality TEXT NOT NULL,
+    dl_path TEXT,
+    ffmpeg INTEGER NOT NULL DEFAULT 0,
+    state TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    path TEXT,
+    created REAL NOT NULL,
+    not_before REAL NOT NULL DEFAULT 0,
+    started REAL,
+    finished REAL,
+    heartbeat REAL,
+    UNIQUE (ep_url, quality)
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, not_before);
+"""
+
+
+@dataclass
+class Job:
+    id: int
+    show_name: str
+    ep: str
+    ep_url: str
+    quality: str
+    dl_path: Optional[str]
+    ffmpeg: bool
+    state: str
+    attempts: int
+    last_error: Optional[str]
+    path: Optional[str]
+    created: float
+    not_before: float
+    started: Optional[float]
+    finished: Optional[float]
+    heartbeat: Optional[float]
+
+    def get_entry(self) -> Entry:
+        return Entry(show_name=self.show_name, ep=parsenum(self.ep), ep_url=self.ep_url)
+
+
+class DownloadQueue:
+    """
+    Download jobs kept in a SQLite database, so they
+    survive the process that added them. Jobs go from
+    queued to running to done, or back to queued with a
+    delay while they have retries left, then to failed.
+
+    Every call uses its own connection, so the queue can
+    be used from several threads and processes at once.
+    """
+
+    # A running job whose worker did not send a
+    # heartbeat for this long is queued again
+    STALE_AFTER = 120
+
+    def __init__(self, path: Path = None) -> None:
+        self.path = path or Config().download_queue_path
+        self.path.parent.mkdir(exist_ok=True, parents=True)
+        with self._connect() as db:
+            db.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        try:
+            db.execute("PRAGMA journal_mode=WAL")
+            yield db
+        finally:
+            db.close()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                yield db
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+
+    def enqueue(
+        self, entry: Entry, quality, dl_path: Path = None, ffmpeg: bool = False
+    ) -> bool:
+        """
+        Add a job for the entry (show_name, ep and ep_url are
+        needed), returns False if it is already queued or done.
+        A failed job is queued again with new retries.
+        """
+        with self._transaction() as db:
+            cursor = db.execute(
+                """
+                INSERT INTO jobs (show_name, ep, ep_url, quality, dl_path, ffmpeg, created)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (ep_url, quality) DO UPDATE
+                SET state = 'queued', attempts = 0, not_before = 0, last_error = NULL
+                WHERE state = 'failed'
+                """,
+                (
+                    entry.show_name,
+                    str(entry.ep),
+                    entry.ep_url,
+                    str(quality),
+                    str(dl_path) if dl_path else None,
+                    int(ffmpeg),
+                    time.time(),
+                ),
+            )
+            return cursor.rowcount > 0
+
+    def claim(self) -> Optional[Job]:
+        """Take the oldest job that is due, None if there is none."""
+        now = time.time()
+        with self._transaction() as db:
+            row = db.execute(
+                "SELECT * FROM jobs WHERE state = ? AND not_before <= ? "
+                "ORDER BY id LIMIT 1",
+                (QUEUED, now),
+            ).fetchone()
+            if row is None:
+                return None
+
+            db.execute(
+                "UPDATE jobs SET state = ?, started = ?, heartbeat = ? WHERE id = ?",
+                (RUNNING, now, now, row["id"]),
+            )
+
+        job = self._job(row)
+        job.state, job.started, job.heartbeat = RUNNING, now, now
+        return job
+
+    def finish(self, job: Job, path: Path) -> None:
+        with self._connect() as db:
+            db.execute(
+                "UPDATE jobs SET state = ?, path = ?, finished = ?, "
+                "attempts = attempts + 1, last_error = NULL WHERE id = ?",
+                (DONE, str(path), time.time(), job.id),
+            )
+
+    def fail(self, job: Job, reason: str, retries: int, delay: float) -> str:
+        """
+        Count a failed attempt, the job is queued again after delay
+        seconds if it had less than retries attempts.
+        Returns the new state.
+        """
+        state = QUEUED if job.attempts + 1 < retries else FAILED
+        with self._connect() as db:
+            db.execute(
+                "UPDATE jobs SET state = ?, attempts = attempts + 1, last_error = ?, "
+                "not_before = ?, finished = ? WHERE id = ?",
+                (state, reason, time.time() + delay, time.time(), job.id),
+            )
+
+        return state
+
+    def release(self, job: Job) -> None:
+        """Put a job that was interrupted back, without counting an attempt."""
+        with self._connect() as db:
+            db.execute(
+                "UPDATE jobs SET state = ? WHERE id = ? AND state = ?",
+                (QUEUED, job.id, RUNNING),
+            )
+
+    def heartbeat(self, jobs: List[Job]) -> None:
+        if not jobs:
+            return
+
+        with self._connect() as db:
+            db.executemany(
+                "UPDATE jobs SET heartbeat = ? WHERE id = ?",
+                [(time.time(), job.id) for job in jobs],
+            )
+
+    def recover(self) -> int:
+        """
+        Queue running jobs again whose worker stopped
+        sending heartbeats (it crashed or was killed).
+        """
+        with self._connect() as db:
+            return db.execute(
+                "UPDATE jobs SET state = ? WHERE state = ? AND heartbeat < ?",
+                (QUEUED, RUNNING, time.time() - self.STALE_AFTER),
+            ).rowcount
+
+    def jobs(self, state: str = None) -> List[Job]:
+        with self._connect() as db:
+            if state is None:
+                rows = db.execute("SELECT * FROM jobs ORDER BY id").fetchall()
+            else:
+                rows = db.execute(
+                    "SELECT * FROM jobs WHERE state = ? ORDER BY id", (state,)
+                ).fetchall()
+
+        return [self._job(row) for row in rows]
+
+    @staticmethod
+    def _job(row: sqlite3.Row) -> Job:
+        job = Job(**dict(row))
+        job.ffmpeg = bool(job.ffmpeg)
+        return job
+
+
+def enqueue_all(
+    entries: List[Entry], quality, ffmpeg: bool = False, dl_path: Path = None
+) -> int:
+    """Add the entries to the download queue, returns how many were new."""
+    queue = DownloadQueue()
+    added = sum(queue.enqueue(entry, quality, dl_path, ffmpeg) for entry in entries)
+    cprint(
+        colors.CYAN,
+        f"Added {added} episode(s) to the download queue",
+        colors.END,
+        f" ({len(entries) - added} already in it)" if added < len(entries) else "",
+    )
+    return added
+
+
+class QueueWorker:
+    """
+    Drains a DownloadQueue with download_parallel_episodes
+    threads, each runs one job at a time through a
+    DownloadScheduler (resolve, transfer, remux), all
+    share the connections of net.get_budget().
+    A failed job is retried later with a growing delay,
+    up to download_queue_retries attempts.
+    """
+
+    HEARTBEAT_INTERVAL = 30
+    # Seconds before the first retry of a failed job,
+    # doubled for every further one, up to MAX_RETRY_DELAY
+    RETRY_DELAY = 60
+    MAX_RETRY_DELAY = 3600
+
+    def __init__(self, queue: DownloadQueue, parallel: int = None) -> None:
+        self.queue = queue
+        self.parallel = max(parallel or Config().download_parallel_episodes, 1)
+        self.retries = Config().download_queue_retries
+        self.poll_interval = Config().download_queue_poll_interval
+        self.done = 0
+        self.failed = 0
+        self._stop = threading.Event()
+        self._running: List[Job] = []
+        self._schedulers: List[DownloadScheduler] = []
+        self._lock = threading.Lock()
+
+    def run(self, until_empty: bool = False) -> None:
+        """
+        Work on jobs until stop() is called or CTRL+C, with
+        until_empty return once no job is due anymore.
+        """
+        recovered = self.queue.recover()
+        if recovered:
+            cprint(colors.CYAN, "Queued again after a crash: ", colors.RED, recovered)
+
+        threads = [
+            threading.Thread(target=self._work, args=(until_empty,), daemon=True)
+            for _ in range(self.parallel)
+        ]
+        for thread in threads:
+            thread.start()
+
+        try:
+            while any(thread.is_alive() for thread in threads):
+                if self._stop.wait(1):
+                    break
+                self._beat()
+        except KeyboardInterrupt:
+            error("interrupted, running jobs are queued again")
+            self.stop()
+
+        for thread in threads:
+            thread.join()
+
+    def stop(self) -> None:
+        self._stop.set()
+        with self._lock:
+            for download_scheduler in self._schedulers:
+                download_scheduler.cancel()
+
+    def _beat(self) -> None:
+        now = time.time()
+        with self._lock:
+            jobs = [
+                job
+                for job in self._running
+                if now - job.heartbeat >= self.HEARTBEAT_INTERVAL
+            ]
+            for job in jobs:
+                job.heartbeat = now
+        self.queue.heartbeat(jobs)
+
+    def _work(self, until_empty: bool) -> None:
+        while not self._stop.is_set():
+            job = self.queue.claim()
+            if job is None:
+                if until_empty:
+                    return
+                self.queue.recover()
+                self._stop.wait(self.poll_interval)
+                continue
+
+            self._run_job(job)
+
+    def _run_job(self, job: Job) -> None:
+        cprint(
+            colors.CYAN,
+            "Queue: ",
+            colors.RED,
+            f"{job.show_name} EP: {job.ep} (attempt {job.attempts + 1})",
+        )
+        download_scheduler = DownloadScheduler(
+            job.quality,
+            job.ffmpeg,
+            Path(job.dl_path) if job.dl_path else None,
+            parallel=1,
+        )
+        with self._lock:
+            self._running.append(job)
+            self._schedulers.append(download_scheduler)
+            if self._stop.is_set():
+                download_scheduler.cancel()
+
+        try:
+            result = download_scheduler.run([job.get_entry()])[0]
+        finally:
+            with self._lock:
+                self._running.remove(job)
+                self._schedulers.remove(download_scheduler)
+
+        # A download that got cancelled must not count as done
+        done = result.ok and result.path is not None and Path(result.path).is_file()
+        if self._stop.is_set() and not done:
+            self.queue.release(job)
+        elif done:
+            self.done += 1
+            self.queue.finish(job, result.path)
+        else:
+            self.failed += 1
+            failure = result.error or IOError(f"{result.path} is missing")
+            reason = " ".join(str(arg) for arg in failure.args if arg)
+            state = self.queue.fail(
+                job,
+                reason or type(failure).__name__,
+                self.retries,
+                min(self.RETRY_DELAY * 2**job.attempts, self.MAX_RETRY_DELAY),
+            )
+            if state == FAILED:
+                error(f"giving up on {job.show_name} EP: {job.ep}: {failure}")
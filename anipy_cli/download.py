@@ -3,19 +3,43 @@ import urllib
 from pathlib import Path
 
 import m3u8
-import requests
 import shutil
+import sqlite3
 import sys
+import time
+import threading
+import requests
+from datetime import datetime
 
 from tqdm import tqdm
-from requests.adapters import HTTPAdapter, Retry
 from concurrent.futures import ThreadPoolExecutor
-from better_ffmpeg_progress import FfmpegProcess
-from moviepy.editor import ffmpeg_tools
 
 from anipy_cli.misc import response_err, error, keyboard_inter
 from anipy_cli.colors import colors, color, cprint
 from anipy_cli.config import Config
+from anipy_cli.net import get_session, get_transfer_session, get_budget, USER_AGENT
+from anipy_cli.journal import SegmentJournal
+from anipy_cli.library import Library
+from anipy_cli.ordered_writer import OrderedWriter
+from anipy_cli.limiter import AdaptiveLimiter
+from anipy_cli.remux import (
+    remux_file,
+    download_file,
+    find_ffmpeg,
+    part_path,
+    RemuxError,
+    FFMPEG_MISSING,
+)
+from anipy_cli.ts_verify import is_ts, verify_ts
+from anipy_cli.retry import RetryPolicy, FailureBudget, sleep
+from anipy_cli.mirrors import MirrorSet, Source
+from anipy_cli.hls_crypto import (
+    KeyCache,
+    SegmentDecryptor,
+    SUPPORTED_METHODS,
+    is_encrypted,
+    segment_iv,
+)
 
 
 class download:
@@ -24,6 +48,13 @@ class download:
     A entry with all fields is required.
     """
 
+    # Bytes read from a connection at once
+    READ_SIZE = 1024 * 1024
+    # Bytes of a hls segment read at once
+    SEGMENT_CHUNK = 64 * 1024
+    # Smaller mp4 files are not worth splitting up
+    MIN_RANGED_SIZE = 8 * 1024 * 1024
+
     def __init__(
         self, entry, quality, ffmpeg=False, dl_path: Path = None, file_name_format=""
     ) -> None:
@@ -34,7 +65,22 @@ class download:
         self.is_audio = None
         self.content_audio_media = None
         self._m3u8_content = None
-        self.session = None
+        self._variant = None
+        self.journal = None
+        self._writer = None
+        self._limiter = None
+        self._keys = None
+        self._media_sequence = 0
+        self._verify_ts = False
+        self._merge_parts = None
+        self._resolution = None
+        self._mirrors = MirrorSet()
+        self._cancelled = threading.Event()
+        self._retry = RetryPolicy(Config().download_segment_retries)
+        self._failures = FailureBudget(Config().download_failure_budget)
+        self.session = get_session()
+        # Parts, keys and ranges, without retries underneath the RetryPolicy
+        self.transfer_session = get_transfer_session()
         self.entry = entry
         self.ffmpeg = ffmpeg
         self.dl_path = dl_path
@@ -42,11 +88,45 @@ class download:
         if dl_path is None:
             self.dl_path = Config().download_folder_path
         self.headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; WOW64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/86.0.4240.198 Safari/537.36",
+            "User-Agent": USER_AGENT,
             "referer": self.entry.embed_url,
         }
 
     def download(self):
+        dl_path = self.fetch()
+        self.remux()
+        return dl_path
+
+    def cancel(self):
+        """
+        Stop a download running in another thread,
+        it ends like it got interrupted with CTRL+C.
+        """
+        self._cancelled.set()
+
+    def remux(self):
+        """
+        Merge the parts that fetch() downloaded into
+        the final file, does nothing if there are none
+        (mp4 and ffmpeg downloads are done after fetch).
+        """
+        if self._merge_parts is None:
+            return
+
+        merged_video_ts, merged_audio_ts = self._merge_parts
+        self._merge_parts = None
+        self.ffmpeg_merge(merged_video_ts, merged_audio_ts)
+
+        cprint("\n", colors.CYAN, "Parts Merged")
+        shutil.rmtree(self.temp_folder)
+        self._add_to_library(self.show_folder / self._get_fname())
+
+    def fetch(self):
+        """
+        Download everything that has to be downloaded for
+        the entry, the network part of download(), call
+        remux() afterwards. Returns the path of the final file.
+        """
         show_name = self._get_valid_pathname(self.entry.show_name)
         self.show_folder = self.dl_path / f"{show_name}"
 
@@ -57,17 +137,14 @@ class download:
 
         self.dl_path.mkdir(exist_ok=True, parents=True)
         self.show_folder.mkdir(exist_ok=True)
-        self.session = requests.Session()
-        retry = Retry(connect=3, backoff_factor=0.5)
-        adapter = HTTPAdapter(max_retries=retry)
-        self.session.mount("http://", adapter)
-        self.session.mount("https://", adapter)
-        self.session.headers.update(self.headers)
 
         fname = self._get_fname()
         dl_path = self.show_folder / fname
 
-        if dl_path.is_file():
+        # The index knows the episode even if it was
+        # stored under another name format or quality
+        library_file = Library().find(self.show_folder.name, self.entry.ep)
+        if library_file is not None or dl_path.is_file():
             print("-" * 20)
             cprint(
                 colors.GREEN,
@@ -75,6 +152,9 @@ class download:
                 colors.RED,
                 f"{self.entry.show_name} EP: {self.entry.ep} - {self.entry.quality}",
             )
+            if library_file is not None:
+                return library_file.path
+
             return dl_path
 
         print("-" * 20)
@@ -90,6 +170,7 @@ class download:
             if self.ffmpeg or Config().ffmpeg_hls:
                 cprint(colors.CYAN, "Downloader: ", colors.RED, "ffmpeg")
                 self.ffmpeg_dl()
+                self._add_to_library(dl_path)
                 return dl_path
 
             cprint(colors.CYAN, "Downloader:", colors.RED, "internal")
@@ -97,145 +178,286 @@ class download:
         elif "mp4" in self.entry.stream_url:
             cprint(colors.CYAN, "Type: ", colors.RED, "mp4")
             self.mp4_dl(self.entry.stream_url)
+            self._add_to_library(dl_path)
 
         return dl_path
 
+    def _add_to_library(self, path):
+        """
+        Index path, only call this once a download or remux
+        wrote it completely (they exit otherwise), a file
+        that merely exists might be one that broke off.
+        """
+        try:
+            Library().add(
+                path,
+                self.show_folder.name,
+                self.entry.ep,
+                self.entry.quality,
+                self.entry.category_url,
+            )
+        except (OSError, sqlite3.Error) as e:
+            error(f"could not add {path.name} to the library index: {e}")
+
     def ffmpeg_dl(self):
+        """
+        Download the hls stream with ffmpeg, the file
+        only appears under its name once ffmpeg succeeded.
+        """
         Config().user_files_path.mkdir(exist_ok=True, parents=True)
         Config().ffmpeg_log_path.mkdir(exist_ok=True, parents=True)
         fname = self._get_fname()
 
         dl_path = self.show_folder / fname
 
-        ffmpeg_process = FfmpegProcess(
-            [
-                "ffmpeg",
-                "-headers",
-                f"referer:{self.entry.embed_url}",
-                "-i",
-                self.entry.stream_url,
-                "-vcodec",
-                "copy",
-                "-acodec",
-                "copy",
-                "-scodec",
-                "mov_text",
-                "-c",
-                "copy",
-                str(dl_path),
-            ]
-        )
-
-        try:
-            ffmpeg_process.run(
-                ffmpeg_output_file=str(
-                    Config().ffmpeg_log_path / fname.replace("mp4", "log")
+        with tqdm(desc=self.entry.show_name, unit="s", mininterval=0.5) as bar:
+            try:
+                download_file(
+                    self.entry.stream_url,
+                    dl_path,
+                    self.entry.embed_url,
+                    Config().ffmpeg_log_path / f"{Path(fname).stem}.log",
+                    lambda seconds: bar.update(seconds - bar.n),
                 )
-            )
-            cprint(colors.CYAN, "Download finished.")
-        except KeyboardInterrupt:
-            error("interrupted deleting partially downloaded file")
-            fname.unlink()
+            except KeyboardInterrupt:
+                error("interrupted deleting partially downloaded file")
+                keyboard_inter()
+                exit()
+            except RemuxError as e:
+                error(f"download failed: {e}")
+                exit()
+
+        cprint(colors.CYAN, "Download finished.")
 
-    def ffmpeg_merge(self, input_file, audio_input_file):
+    def ffmpeg_merge(self, merged_video_ts, merged_audio_ts=None):
+        """
+        Remux the merged parts (and the separate audio
+        rendition, if there is one) into the final file
+        with ffmpeg, the streams are copied, not re-encoded.
+        """
         Config().user_files_path.mkdir(exist_ok=True, parents=True)
         Config().ffmpeg_log_path.mkdir(exist_ok=True, parents=True)
         fname = self._get_fname()
 
         dl_path = self.show_folder / fname
+        duration = sum(segment.duration or 0 for segment in self._m3u8_content.segments)
 
-        merged_video_ts = self.merge_ts_files(input_file)
-        merged_audio_ts = None
-        if audio_input_file:
-            merged_audio_ts = self.merge_ts_files(audio_input_file, "_audio")
+        cprint(colors.CYAN, "Merging Parts using ffmpeg...")
+        with tqdm(
+            desc=self.entry.show_name,
+            total=round(duration) or None,
+            unit="s",
+            mininterval=0.5,
+        ) as progress_bar:
 
-        try:
-            cprint(colors.CYAN, "Merging Parts using Movie.py...")
-            if audio_input_file:
-                ffmpeg_tools.ffmpeg_merge_video_audio(
+            def on_progress(seconds):
+                progress_bar.update(min(seconds, duration) - progress_bar.n)
+
+            try:
+                remux_file(
                     merged_video_ts,
+                    dl_path,
                     merged_audio_ts,
-                    str(dl_path),
-                    vcodec="copy",
-                    acodec="copy",
-                    ffmpeg_output=False,
-                    logger="bar",
-                )
-            else:
-                ffmpeg_tools.ffmpeg_merge_video_audio(
-                    merged_video_ts,
-                    merged_video_ts,
-                    str(dl_path),
-                    vcodec="copy",
-                    acodec="copy",
-                    ffmpeg_output=False,
-                    logger="bar",
+                    Config().ffmpeg_log_path / f"{Path(fname).stem}.log",
+                    on_progress,
                 )
+            except KeyboardInterrupt:
+                error("interrupted deleting partially merged file")
+                keyboard_inter()
+                exit()
+            except RemuxError as e:
+                error(f"could not merge parts: {e}")
+                exit()
 
-            cprint(colors.CYAN, "Merge finished.")
-        except KeyboardInterrupt:
-            error("interrupted deleting partially downloaded file")
-            fname.unlink()
-
-    def merge_ts_files(self, input_file, suffix=""):
-        filename = f"{self.temp_folder}/{self._get_valid_pathname(self.entry.show_name)}_{self.entry.ep}_merged{suffix}.ts"
-        # Parse playlist for filenames with ending .ts and put them into the list ts_filenames
-        with open(input_file, "r") as playlist:
-            ts_filenames = [
-                line.rstrip() + f"{suffix}"
-                for line in playlist
-                if not line.lstrip().startswith("#")
-            ]
-        # open one ts_file from the list after another and append them to merged.ts
-        with open(filename, "wb") as merged:
-            for ts_file in ts_filenames:
-                with open(ts_file, "rb") as mergefile:
-                    shutil.copyfileobj(mergefile, merged)
-        return filename
+        cprint(colors.CYAN, "Merge finished.")
 
     def mp4_dl(self, dl_link):
         """
+        Download a mp4 stream, over multiple connections
+        that each fetch a range of the file if the server
+        supports it, otherwise over a single one.
 
         :param dl_link:
         :type dl_link:
         :return:
         :rtype:
         """
-        r = self.session.get(dl_link, headers=self.headers, stream=True)
-        response_err(r, dl_link)
-        total = int(r.headers.get("content-length", 0))
         fname = self.show_folder / self._get_fname()
+        # Written under another name until it is complete
+        part = part_path(fname)
+        # Ask for the first byte, the answer tells
+        # if ranges work and how big the file is
+        r = self.session.get(
+            dl_link, headers={**self.headers, "Range": "bytes=0-0"}, stream=True
+        )
+        response_err(r, dl_link)
+        total = self._range_total(r)
+        connections = Config().download_mp4_connections
         try:
-            with fname.open("wb") as out_file, tqdm(
-                desc=self.entry.show_name,
-                total=total,
-                unit="iB",
-                unit_scale=True,
-                unit_divisor=1024,
-            ) as bar:
-                for data in r.iter_content(chunk_size=1024):
-                    size = out_file.write(data)
-                    bar.update(size)
+            if total and total >= self.MIN_RANGED_SIZE and connections > 1:
+                r.close()
+                self._ranged_mp4_dl(dl_link, part, total, connections)
+            else:
+                if total is not None:
+                    r.close()
+                    r = self.session.get(dl_link, headers=self.headers, stream=True)
+                    response_err(r, dl_link)
+                with get_budget().connection(dl_link):
+                    self._single_mp4_dl(r, part)
+            part.replace(fname)
         except KeyboardInterrupt:
+            self._cancelled.set()
             error("interrupted deleting partially downloaded file")
-            fname.unlink()
+            part.unlink(missing_ok=True)
+            exit()
+        except (requests.RequestException, IOError) as e:
+            self._cancelled.set()
+            error(f"download failed, deleting partially downloaded file: {e}")
+            part.unlink(missing_ok=True)
+            exit()
 
         cprint(colors.CYAN, "Download finished.")
 
-    def download_ts(self, m3u8_segments, retry=0):
+    def _single_mp4_dl(self, r, fname):
+        total = int(r.headers.get("content-length", 0))
+        with r, fname.open("wb") as out_file, self._progress_bar(total) as bar:
+            for data in r.iter_content(chunk_size=self.READ_SIZE):
+                if self._cancelled.is_set():
+                    raise KeyboardInterrupt
+
+                size = out_file.write(data)
+                bar.update(size)
+                get_budget().throttle(size)
+
+    def _ranged_mp4_dl(self, dl_link, fname, total, connections):
+        part_size = -(-total // connections)
+        ranges = [
+            (start, min(start + part_size, total) - 1)
+            for start in range(0, total, part_size)
+        ]
+
+        # Preallocate, so that every connection
+        # can write to its own part of the file
+        with fname.open("wb") as out_file:
+            out_file.truncate(total)
+
+        lock = threading.Lock()
+        with self._progress_bar(total) as bar:
+
+            def progress(size):
+                with lock:
+                    bar.update(size)
+
+            pool = ThreadPoolExecutor(len(ranges))
+            try:
+                for _ in pool.map(
+                    lambda part: self._download_range(
+                        dl_link, fname, part[0], part[1], progress
+                    ),
+                    ranges,
+                ):
+                    pass
+            except BaseException:
+                self._cancelled.set()
+                raise
+            finally:
+                pool.shutdown()
+
+        if self._cancelled.is_set():
+            raise KeyboardInterrupt
+
+    def _download_range(self, dl_link, fname, start, end, progress):
+        """
+        Fetch the bytes start to end (inclusive) of dl_link into the
+        same position in fname, a dropped connection continues
+        where it stopped (see download_segment_retries).
+        """
+        pos = start
+        with fname.open("r+b") as out_file:
+            for attempt in range(self._retry.attempts):
+                try:
+                    with get_budget().connection(dl_link), self.transfer_session.get(
+                        dl_link,
+                        headers={**self.headers, "Range": f"bytes={pos}-{end}"},
+                        stream=True,
+                    ) as r:
+                        r.raise_for_status()
+                        if r.status_code != 206:
+                            raise requests.RequestException(
+                                f"range request answered with {r.status_code}"
+                            )
+
+                        out_file.seek(pos)
+                        for data in r.iter_content(chunk_size=self.READ_SIZE):
+                            if self._cancelled.is_set():
+                                return
+
+                            out_file.write(data)
+                            pos += len(data)
+                            progress(len(data))
+                            get_budget().throttle(len(data))
+                except requests.RequestException as e:
+                    if (
+                        attempt == self._retry.attempts - 1
+                        or not self._retry.is_retryable(e)
+                        or not self._failures.spend()
+                    ):
+                        raise
+
+                    if not sleep(self._retry.delay(attempt, e), self._cancelled):
+                        return
+                    continue
+
+                if pos > end:
+                    return
+
+        raise IOError(f"bytes {pos}-{end} missing")
+
+    def _progress_bar(self, total):
+        return tqdm(
+            desc=self.entry.show_name,
+            total=total,
+            unit="iB",
+            unit_scale=True,
+            unit_divisor=1024,
+            mininterval=0.5,
+        )
+
+    @staticmethod
+    def _range_total(response):
+        """
+        Size of the whole file if the server answered
+        a range request with a part of it, otherwise None.
+        """
+        if response.status_code != 206:
+            return None
+
+        match = re.match(
+            r"bytes \d+-\d+/(\d+)", response.headers.get("content-range", "")
+        )
+        return int(match.group(1)) if match else None
+
+    def download_ts(self, m3u8_segments, index):
         self.counter += 1
         audio_suffix = ""
+        writer = self._writer
+        mirrors = self._mirrors
         uri = urllib.parse.urljoin(m3u8_segments.base_uri, m3u8_segments.uri)
         if not self._is_url(uri):
             input(f"uri: {uri} is not an uri")
+            writer.fail()
             return
 
         if self.is_audio:
             audio_suffix = "audio"
-        filename = self._get_filename(uri, self.temp_folder, audio_suffix)
         headers = self.headers
-        retry_count = 0
-        while not Path(filename).is_file() and retry_count < 20:
+        # Sources that failed this part since the last wait
+        tried = set()
+        source, segment = mirrors.pick(m3u8_segments, index, tried)
+        for attempt in range(self._retry.attempts):
+            if writer.failed or self._cancelled.is_set():
+                break
+
             cprint(
                 colors.CYAN,
                 f"Downloading {audio_suffix} Part: {self.counter}/{self.segment_count}",
@@ -243,39 +465,143 @@ class download:
             )
             print("\r", end="")
 
+            # Room for the segment is reserved before a request slot
+            # is taken, so waiting for memory never holds up a request
+            if not writer.reserve(index):
+                break
+
+            uri = urllib.parse.urljoin(segment.base_uri, segment.uri)
+            self._limiter.acquire()
+            started = time.monotonic()
+            content = b""
+            received = 0
+            failure = None
             try:
-                with self.session.get(
-                    uri, timeout=10, headers=headers, stream=False
-                ) as response:
-                    if response.status_code == 416:
-                        return
+                with get_budget().connection(uri):
+                    # Waiting for a slot of the host is not its latency
+                    started = time.monotonic()
+                    with self.transfer_session.get(
+                        uri, timeout=10, headers=headers, stream=True
+                    ) as response:
+                        if response.status_code == 416:
+                            writer.put(index, b"")
+                            return
+
+                        response.raise_for_status()
+                        content, received = self._read_segment(
+                            response, segment.key, index
+                        )
+                        expected_size = self._expected_size(response)
+                        if expected_size is not None and received != expected_size:
+                            failure = IOError(
+                                f"got {received} of {expected_size} bytes"
+                            )
+
+                if failure is None and self._verify_ts and is_ts(content, uri):
+                    broken = verify_ts(content)
+                    if broken is not None:
+                        failure = IOError(f"broken part: {broken}")
+            except (requests.RequestException, ValueError) as e:
+                # ValueError: the segment did not decrypt
+                failure = e
+            finally:
+                self._limiter.release(
+                    failure is None, received, time.monotonic() - started
+                )
+
+            if failure is None:
+                mirrors.report(source, True)
+                writer.put(index, content)
+                return
+
+            writer.release(index)
+            if not self._retry.is_retryable(failure):
+                error(f"part {index} failed: {failure}")
+                break
+
+            if mirrors.report(source, False):
+                error(f"{source.name} keeps failing, trying other mirrors first")
+
+            if not self._failures.spend():
+                error(f"too many failed parts, giving up (last: {failure})")
+                break
+
+            # Another mirror is tried right away, only once
+            # every source failed the part there is a wait
+            tried.add(source)
+            picked = mirrors.pick(m3u8_segments, index, tried)
+            if picked is None:
+                tried.clear()
+                picked = mirrors.pick(m3u8_segments, index, tried)
+                if attempt < self._retry.attempts - 1 and not sleep(
+                    self._retry.delay(attempt, failure), self._cancelled
+                ):
+                    break
+            source, segment = picked
+        else:
+            error(f"part {index} failed {self._retry.attempts} times: {failure}")
+
+        writer.fail()
+
+    def _read_segment(self, response, key, index):
+        """
+        Read the body of a segment in chunks of SEGMENT_CHUNK
+        into one buffer, decrypting it on the way if it
+        is encrypted. Returns the segment and the number
+        of bytes received.
+        """
+        decryptor = None
+        if is_encrypted(key):
+            decryptor = SegmentDecryptor(
+                self._keys.get(key.absolute_uri),
+                segment_iv(key, self._media_sequence + index),
+            )
+
+        content = bytearray()
+        received = 0
+        for chunk in response.iter_content(chunk_size=self.SEGMENT_CHUNK):
+            if self._cancelled.is_set():
+                raise requests.RequestException("cancelled")
 
-                    response.raise_for_status()
+            received += len(chunk)
+            content += decryptor.update(chunk) if decryptor else chunk
+            get_budget().throttle(len(chunk))
 
-                    with open(filename, "wb") as fout:
-                        fout.write(response.content)
+        if decryptor is not None:
+            content += decryptor.finalize()
 
-            except Exception as e:
-                exit(e.__str__())
-            retry_count += 1
+        return content, received
 
     def multithread_m3u8_dl(self):
         """
         Multithread download
         function for m3u8 links.
         - Creates show and temp folder
+        - Resumes from the journal in the
+          temp folder if there is one
         - Starts ThreadPoolExecutor instance
-          and downloads all ts links
-        - Merges ts files
-        - Deletes temp folder
+          and downloads all missing ts links,
+          they are appended to one merged ts
+          file in order while downloading
+        - AES-128 encrypted parts are decrypted
+          as they arrive, every key is fetched once
+        - Parts that time out or fail with 5xx are
+          fetched from a mirror (entry.mirror_urls)
+        Call remux() afterwards to remux the
+        merged ts file and delete the temp folder.
 
         :return:
         :rtype:
         """
+        # Without ffmpeg the parts could not be merged afterwards
+        if find_ffmpeg() is None:
+            error(FFMPEG_MISSING)
+            exit()
 
         self.temp_folder = self.show_folder / f"{self.entry.ep}_temp"
         self.temp_folder.mkdir(exist_ok=True)
-        self.counter = 0
+        self.journal = SegmentJournal(self.temp_folder)
+        self._keys = KeyCache(self.transfer_session, self.headers)
 
         self._m3u8_content = self._download_m3u8(
             self.entry.stream_url, 10, self.headers
@@ -283,41 +609,193 @@ class download:
 
         assert self._m3u8_content.is_variant is False
 
+        resumed = self.journal.start(
+            self._strip_query(self.entry.stream_url),
+            self._variant or self._strip_query(self.entry.stream_url),
+        )
+        if resumed:
+            cprint(
+                colors.CYAN,
+                "Resuming download, parts already downloaded: ",
+                colors.RED,
+                len(self.journal.segments),
+            )
+
+        self._limiter = AdaptiveLimiter(
+            Config().download_workers,
+            Config().download_workers_min,
+            Config().download_workers_max,
+            on_change=self._log_concurrency,
+        )
+
+        merged_name = (
+            f"{self._get_valid_pathname(self.entry.show_name)}_{self.entry.ep}_merged"
+        )
+        merged_video_ts = self.temp_folder / f"{merged_name}.ts"
+        merged_audio_ts = None
+        streams = [(self._m3u8_content, merged_video_ts, "")]
+        if self.content_audio_media and not self.content_audio_media.is_variant:
+            merged_audio_ts = self.temp_folder / f"{merged_name}_audio.ts"
+            streams.insert(0, (self.content_audio_media, merged_audio_ts, "audio"))
+
         try:
-            if self.content_audio_media and not self.content_audio_media.is_variant:
-                self.segment_count = len(self.content_audio_media.segments)
-                self.is_audio = True
-                with ThreadPoolExecutor(12) as pool_audio:
-                    pool_audio.map(self.download_ts, self.content_audio_media.segments)
-            self.is_audio = False
-            self.counter = 0
-            self.segment_count = len(self._m3u8_content.segments)
-            print("\n")
-            with ThreadPoolExecutor(12) as pool_video:
-                pool_video.map(self.download_ts, self._m3u8_content.segments)
+            for content, merged_ts, suffix in streams:
+                # Every part is retried on its own (download_ts),
+                # a stream that still misses parts stops the episode
+                if not self._download_stream(content, merged_ts, suffix):
+                    error(
+                        "could not download all parts, "
+                        "run the download again to continue where it stopped"
+                    )
+                    exit()
         except KeyboardInterrupt:
-            shutil.rmtree(self.temp_folder)
+            # The temp folder is kept, the next
+            # run continues from the journal
             keyboard_inter()
             exit()
 
-        input_file = self._dump_m3u8(self._m3u8_content)
-        audio_input_file = None
-        if self.content_audio_media and not self.content_audio_media.is_variant:
-            self.is_audio = True
-            audio_input_file = self._dump_m3u8(self.content_audio_media)
-
         cprint("\n", colors.CYAN, "Parts Downloaded")
+        cprint(
+            colors.CYAN,
+            "Parts fetched at once: ",
+            colors.RED,
+            f"{self._limiter.limit} ({urllib.parse.urlsplit(self.entry.stream_url).hostname})",
+        )
+        self._merge_parts = (merged_video_ts, merged_audio_ts)
+
+    def _download_stream(self, content, merged_ts, suffix=""):
+        """
+        Download the segments of content that are not yet
+        in merged_ts, returns True once all of them are.
+        """
+        names = [
+            Path(
+                self._get_filename(
+                    urllib.parse.urljoin(segment.base_uri, segment.uri),
+                    self.temp_folder,
+                    suffix,
+                )
+            ).name
+            for segment in content.segments
+        ]
+        start = self.journal.resume(merged_ts, names)
+        if start == len(names):
+            return True
+
+        self.is_audio = bool(suffix)
+        self._media_sequence = content.media_sequence or 0
+        # The mirrors are other copies of the video, separate
+        # audio is only fetched from the primary playlist
+        self._mirrors = MirrorSet(
+            self._media_sequence,
+            None if self.is_audio else self._load_mirrors,
+            urllib.parse.urlsplit(self.entry.stream_url).hostname,
+        )
+        # fMP4 playlists (with an init section) are not ts,
+        # audio renditions are usually packed audio (.aac)
+        self._verify_ts = (
+            Config().download_verify_segments
+            and not content.segment_map
+            and not self.is_audio
+        )
+        self.counter = start
+        self.segment_count = len(names)
+        print("\n")
+
+        # The limiter decides how many of the
+        # workers actually fetch at the same time
+        workers = self._limiter.maximum
+        self._writer = OrderedWriter(
+            merged_ts,
+            names,
+            self.journal,
+            start,
+            window=workers + 8,
+            max_bytes=Config().download_max_buffered_mb * 1024 * 1024,
+        )
+        pool = ThreadPoolExecutor(workers)
         try:
-            self.ffmpeg_merge(input_file, audio_input_file)
-        except FileNotFoundError:
-            # This restarts the download if a file is missing
-            error("Missing a download part, restarting download")
-            return self.multithread_m3u8_dl()
+            for _ in pool.map(
+                self.download_ts,
+                content.segments[start:],
+                range(start, len(names)),
+            ):
+                pass
+        except KeyboardInterrupt:
+            self._writer.fail()
+            raise
+        finally:
+            pool.shutdown()
+            self._writer.close()
 
-        cprint("\n", colors.CYAN, "Parts Merged")
-        shutil.rmtree(self.temp_folder)
+        if self._cancelled.is_set():
+            raise KeyboardInterrupt
 
-    def _download_m3u8(self, uri, timeout, headers, is_audio=False):
+        return self._writer.done
+
+    def _log_concurrency(self, old, new, reason):
+        """
+        Append a change of the segment concurrency to the log,
+        to see what works for which cdn.
+        """
+        host = urllib.parse.urlsplit(self.entry.stream_url).hostname
+        line = f"{datetime.now().isoformat(timespec='seconds')} {host} {old} -> {new} ({reason})\n"
+        try:
+            log_path = Config().download_concurrency_log_path
+            log_path.parent.mkdir(exist_ok=True, parents=True)
+            with log_path.open("a") as log:
+                log.write(line)
+        except OSError:
+            pass
+
+    def _load_mirrors(self):
+        """
+        The media playlists of the mirrors of the stream
+        (entry.mirror_urls) at the resolution that is
+        downloaded, mirrors that can't be used are left out.
+        """
+        sources = []
+        for url in self.entry.mirror_urls:
+            name = urllib.parse.urlsplit(url).hostname
+            try:
+                content = self._fetch_m3u8(url, 10)
+                if content.is_variant:
+                    playlist = next(
+                        (
+                            playlist
+                            for playlist in content.playlists
+                            if playlist.stream_info.resolution == self._resolution
+                        ),
+                        None,
+                    )
+                    if playlist is None:
+                        continue
+                    content = self._fetch_m3u8(
+                        urllib.parse.urljoin(content.base_uri, playlist.uri), 10
+                    )
+            except (requests.RequestException, ValueError) as e:
+                error(f"mirror {name} can't be used: {e}")
+                continue
+
+            if content.is_variant or any(
+                key and key.method not in SUPPORTED_METHODS for key in content.keys
+            ):
+                continue
+
+            sources.append(Source(name, content))
+
+        if sources:
+            cprint(
+                "\n",
+                colors.CYAN,
+                "Mirrors for failed parts: ",
+                colors.RED,
+                ", ".join(source.name for source in sources),
+            )
+
+        return sources
+
+    def _fetch_m3u8(self, uri, timeout):
         if self._is_url(uri):
             resp = self.session.get(uri, timeout=timeout, headers=self.headers)
             resp.raise_for_status()
@@ -327,7 +805,10 @@ class download:
             with open(uri) as fin:
                 raw_content = fin.read()
                 base_uri = Path(uri)
-        content = m3u8.M3U8(raw_content, base_uri=base_uri)
+        return m3u8.M3U8(raw_content, base_uri=base_uri)
+
+    def _download_m3u8(self, uri, timeout, headers, is_audio=False):
+        content = self._fetch_m3u8(uri, timeout)
         if content.is_variant:
             if self.content_audio_media is not None:
                 content.add_media(media=self.content_audio_media)
@@ -366,8 +847,14 @@ class download:
                 chosen_uri = content.playlists[selected_index].uri
                 if not self._is_url(chosen_uri):
                     chosen_uri = urllib.parse.urljoin(content.base_uri, chosen_uri)
+                self._variant = self._strip_query(chosen_uri)
+                self._resolution = content.playlists[
+                    selected_index
+                ].stream_info.resolution
                 if self.content_audio_media is not None:
                     media_uri = self.content_audio_media.uri
+                    if not self._is_url(media_uri):
+                        media_uri = urllib.parse.urljoin(content.base_uri, media_uri)
                     self.content_audio_media = self._download_m3u8(
                         media_uri, timeout, headers, True
                     )
@@ -383,40 +870,12 @@ class download:
                 exit("Failed to get stream for chosen quality")
 
         else:
-            self._download_key(content)
+            for key in content.keys:
+                if key and key.method not in SUPPORTED_METHODS:
+                    exit(f"Encryption {key.method} is not supported")
 
         return content
 
-    def _dump_m3u8(self, content):
-        audio_suffix = ""
-        for index, segment in enumerate(content.segments):
-            content.segments[index].uri = self._get_filename(
-                segment.uri, self.temp_folder
-            )
-
-        if self.is_audio:
-            audio_suffix = "_audio"
-        filename = self._get_filename(f"master{audio_suffix}.m3u8", self.temp_folder)
-        content.dump(filename)
-        return filename
-
-    def _download_key(self, content):
-        for key in content.keys:
-            if key:
-                uri = key.absolute_uri
-                filename = self._get_filename(uri, self.temp_folder)
-
-                with self.session.get(
-                    uri, timeout=10, headers=self.headers
-                ) as response:
-                    response.raise_for_status()
-                    with open(filename, "wb") as fout:
-                        fout.write(response.content)
-
-                key.uri = filename.__str__().replace(
-                    "\\", "/"
-                )  # ffmpeg error when using \\ in windows
-
     def _get_fname(self) -> str:
         """
         This function returns what the filename for the outputted video should be.
@@ -454,6 +913,25 @@ class download:
 
         return name
 
+    @staticmethod
+    def _strip_query(url):
+        """Stream urls are signed, only the path stays the same"""
+        return urllib.parse.urlsplit(url)._replace(query="", fragment="").geturl()
+
+    @staticmethod
+    def _expected_size(response):
+        """
+        Size the body should have according to the
+        Content-Length header, None if it can't be
+        compared (missing or the body was compressed).
+        """
+        length = response.headers.get("content-length")
+        encoding = response.headers.get("content-encoding", "identity")
+        if length is None or not length.isdigit() or encoding != "identity":
+            return None
+
+        return int(length)
+
     @staticmethod
     def _is_url(uri):
         return re.match(r"https?://", uri) is not None
@@ -0,0 +1,92 @@
+import threading
+from typing import Dict
+
+import requests
+from Cryptodome.Cipher import AES
+from Cryptodome.Util.Padding import unpad
+
+# Encryption methods of #EXT-X-KEY that can be decrypted
+SUPPORTED_METHODS = (None, "NONE", "AES-128")
+
+
+def is_encrypted(key) -> bool:
+    """key is the m3u8 Key of a segment (or None)"""
+    return key is not None and key.method == "AES-128"
+
+
+def segment_iv(key, sequence: int) -> bytes:
+    """
+    The IV of a segment is the IV attribute of its key,
+    or else its media sequence number as 16 bytes (RFC 8216 5.2).
+    """
+    if key.iv:
+        iv = key.iv[2:] if key.iv.lower().startswith("0x") else key.iv
+        return bytes.fromhex(iv).rjust(AES.block_size, b"\x00")
+
+    return sequence.to_bytes(AES.block_size, "big")
+
+
+class KeyCache:
+    """
+    Fetches every key uri of a playlist once, no matter
+    how many segments (and threads) need it.
+    """
+
+    def __init__(self, session: requests.Session, headers: dict = None) -> None:
+        self.session = session
+        self.headers = headers
+        self._keys: Dict[str, bytes] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def get(self, uri: str) -> bytes:
+        with self._lock:
+            lock = self._locks.setdefault(uri, threading.Lock())
+
+        with lock:
+            if uri not in self._keys:
+                with self.session.get(
+                    uri, timeout=10, headers=self.headers
+                ) as response:
+                    response.raise_for_status()
+                    key = response.content
+
+                if len(key) != 16:
+                    raise ValueError(f"key {uri} has {len(key)} bytes instead of 16")
+                self._keys[uri] = key
+
+            return self._keys[uri]
+
+
+class SegmentDecryptor:
+    """
+    AES-128-CBC decryption of one segment, fed with the
+    data as it arrives. The last block is held back until
+    finalize(), because it carries the padding.
+    """
+
+    def __init__(self, key: bytes, iv: bytes) -> None:
+        self._cipher = AES.new(key, AES.MODE_CBC, iv=iv)
+        self._pending = b""
+
+    def update(self, data: bytes) -> bytes:
+        data = self._pending + data
+        keep = len(data) % AES.block_size or AES.block_size
+        if len(data) <= keep:
+            self._pending = data
+            return b""
+
+        self._pending = data[-keep:]
+        return self._cipher.decrypt(data[:-keep])
+
+    def finalize(self) -> bytes:
+        """Raises ValueError if the segment was cut off or the key is wrong."""
+        if len(self._pending) != AES.block_size:
+            raise ValueError("encrypted segment is not a multiple of 16 bytes")
+
+        return unpad(self._cipher.decrypt(self._pending), AES.block_size)
+
+
+def decrypt(data: bytes, key: bytes, iv: bytes) -> bytes:
+    decryptor = SegmentDecryptor(key, iv)
+    return decryptor.update(data) + decryptor.finalize()
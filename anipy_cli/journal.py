@@ -0,0 +1,122 @@
+import json
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+class SegmentJournal:
+    """
+    Append-only record of a hls download, kept in
+    the temp folder of the episode so an interrupted
+    download can be picked up where it left off.
+
+    The first line describes the playlist and the
+    selected variant, every following line is a
+    segment that was appended to the merged file,
+    with its byte length.
+    """
+
+    FILE_NAME = "journal.jsonl"
+
+    def __init__(self, folder: Path) -> None:
+        self.path = folder / self.FILE_NAME
+        self.header: Optional[dict] = None
+        self.segments: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            lines = self.path.read_text().splitlines()
+        except FileNotFoundError:
+            return
+
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # The last line may be cut off if the
+                # process got killed while writing it
+                continue
+
+            if "segment" in record:
+                self.segments[record["segment"]] = record["size"]
+            else:
+                self.header = record
+
+    def _append(self, record: dict) -> None:
+        with self.path.open("a") as f:
+            f.write(json.dumps(record) + "\n")
+            f.flush()
+
+    def start(self, playlist: str, variant: str) -> bool:
+        """
+        Start or continue the journal for a playlist and variant.
+        Returns True if an earlier download of the same
+        variant can be resumed, otherwise the journal is
+        reset and False is returned.
+        """
+        header = {"playlist": playlist, "variant": variant}
+        with self._lock:
+            if self.header == header:
+                return True
+
+            self.header = header
+            self.segments = {}
+            self.path.parent.mkdir(exist_ok=True, parents=True)
+            self.path.write_text(json.dumps(header) + "\n")
+            return False
+
+    def add(self, name: str, size: int) -> None:
+        """Record that the segment name was written completely."""
+        with self._lock:
+            self.segments[name] = size
+            self._append({"segment": name, "size": size})
+
+    def resume(self, path: Path, names: List[str]) -> int:
+        """
+        Find how many segments of names (in playlist order)
+        are already in the merged file at path, and cut
+        off anything after them, like a segment that was
+        only written halfway. Returns the number of segments.
+        """
+        try:
+            file_size = path.stat().st_size
+        except FileNotFoundError:
+            file_size = 0
+
+        count = 0
+        offset = 0
+        for name in names:
+            size = self.segments.get(name)
+            if size is None or offset + size > file_size:
+                break
+
+            offset += size
+            count += 1
+
+        if file_size != offset:
+            with path.open("ab") as f:
+                f.truncate(offset)
+
+        # Forget segments that are not in the file anymore,
+        # they have to be written and recorded again
+        stale = [name for name in names[count:] if name in self.segments]
+        if stale:
+            with self._lock:
+                for name in stale:
+                    del self.segments[name]
+                self._rewrite()
+
+        return count
+
+    def _rewrite(self) -> None:
+        tmp_path = self.path.with_suffix(".tmp")
+        with tmp_path.open("w") as f:
+            f.write(json.dumps(self.header) + "\n")
+            for name, size in self.segments.items():
+                f.write(json.dumps({"segment": name, "size": size}) + "\n")
+        tmp_path.replace(self.path)
+
+    def remove(self) -> None:
+        self.path.unlink(missing_ok=True)
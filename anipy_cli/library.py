@@ -0,0 +1,287 @@
+import os
+import re
+import time
+import sqlite3
+import hashlib
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from anipy_cli.config import Config
+from anipy_cli.misc import parsenum
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    show TEXT NOT NULL,
+    ep TEXT NOT NULL,
+    quality TEXT,
+    category_url TEXT,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    checksum TEXT NOT NULL,
+    added REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_episode ON files (show, ep);
+"""
+
+# Bytes read from the start and the end of a file for its checksum
+CHECKSUM_SPAN = 64 * 1024
+
+
+@dataclass
+class LibraryFile:
+    path: Path
+    show: str
+    ep: str
+    quality: Optional[str]
+    category_url: Optional[str]
+    size: int
+    mtime: float
+    checksum: str
+    added: float
+
+
+@dataclass
+class ScanResult:
+    files: int
+    added: int
+    removed: int
+    seconds: float
+
+
+def episode_key(ep) -> str:
+    """1, "1" and "1.0" are the same episode"""
+    ep = parsenum(str(ep))
+    if isinstance(ep, float) and ep.is_integer():
+        ep = int(ep)
+    return str(ep)
+
+
+def quick_checksum(path: Path, size: int) -> str:
+    """
+    blake2b of the size and the first and last
+    CHECKSUM_SPAN bytes, enough to tell a cut off or
+    replaced file apart without reading all of it.
+    """
+    digest = hashlib.blake2b(str(size).encode(), digest_size=16)
+    with path.open("rb") as f:
+        digest.update(f.read(CHECKSUM_SPAN))
+        if size > CHECKSUM_SPAN:
+            f.seek(max(size - CHECKSUM_SPAN, CHECKSUM_SPAN))
+            digest.update(f.read(CHECKSUM_SPAN))
+
+    return digest.hexdigest()
+
+
+def name_pattern(name_format: str) -> "re.Pattern":
+    """
+    Regex for file names made with download_name_format,
+    with the episode (and quality) as groups.
+    """
+    pattern = re.escape(name_format)
+    for field, group in [
+        ("show_name", r"(?P<show_name>.+?)"),
+        ("episode_number", r"(?P<ep>\d+(?:\.\d+)?)"),
+        ("quality", r"(?P<quality>.*?)"),
+    ]:
+        # re.escape escapes the braces around the field
+        pattern = pattern.replace(re.escape("{" + field + "}"), group, 1)
+
+    return re.compile(pattern + "$")
+
+
+class Library:
+    """
+    Index of the downloaded episodes (show folder and
+    episode to file, with size, quality and checksum) in
+    SQLite, so "is it downloaded" does not depend on the
+    current download_name_format or quality.
+
+    scan() (re)builds it from the download folders,
+    add() records a finished download.
+    """
+
+    def __init__(self, path: Path = None) -> None:
+        self.path = path or Config().library_index_path
+        self.path.parent.mkdir(exist_ok=True, parents=True)
+        with self._connect() as db:
+            db.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        db = sqlite3.connect(self.path, timeout=30)
+        db.row_factory = sqlite3.Row
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def add(
+        self,
+        path: Path,
+        show: str,
+        ep,
+        quality: str = None,
+        category_url: str = None,
+    ) -> None:
+        """Record the file of an episode, show is the name of its folder."""
+        stat = path.stat()
+        with self._connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    str(path.resolve()),
+                    show,
+                    episode_key(ep),
+                    quality or None,
+                    category_url or None,
+                    stat.st_size,
+                    stat.st_mtime,
+                    quick_checksum(path, stat.st_size),
+                    time.time(),
+                ),
+            )
+
+    def find(self, show: str, ep) -> Optional[LibraryFile]:
+        """
+        The file of an episode, if it is in the index and still
+        on disk with the same size, no matter its name or quality.
+        """
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT * FROM files WHERE show = ? AND ep = ? ORDER BY added DESC",
+                (show, episode_key(ep)),
+            ).fetchall()
+
+        for row in rows:
+            library_file = self._file(row)
+            try:
+                if library_file.path.stat().st_size == library_file.size:
+                    return library_file
+            except OSError:
+                pass
+
+        return None
+
+    def episodes(self, show: str) -> List[str]:
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT DISTINCT ep FROM files WHERE show = ?", (show,)
+            ).fetchall()
+
+        return [row["ep"] for row in rows]
+
+    def missing(self, show: str, eps: List) -> List:
+        """The episodes of eps that are not in the index."""
+        have = set(self.episodes(show))
+        return [ep for ep in eps if episode_key(ep) not in have]
+
+    def scan(self, roots: List[Path] = None, workers: int = None) -> ScanResult:
+        """
+        Index every episode file in the show folders of roots
+        (download_folder_path and seasonals_dl_path), show
+        folders are listed in parallel. Files whose size and
+        mtime did not change keep their checksum, files that
+        are gone are dropped from the index.
+        """
+        start = time.monotonic()
+        if roots is None:
+            roots = [Config().download_folder_path, Config().seasonals_dl_path]
+        roots = [root.resolve() for root in roots if root.is_dir()]
+        workers = workers or Config().library_scan_workers
+        pattern = name_pattern(Config().download_name_format)
+        if "ep" not in pattern.groupindex:
+            # File names without the episode can't be indexed
+            roots = []
+
+        show_folders = [
+            Path(entry.path)
+            for root in roots
+            for entry in os.scandir(root)
+            if entry.is_dir() and Path(entry.path) not in roots
+        ]
+
+        with self._connect() as db:
+            known: Dict[str, Tuple[int, float]] = {
+                row["path"]: (row["size"], row["mtime"])
+                for row in db.execute("SELECT path, size, mtime FROM files")
+            }
+
+        with ThreadPoolExecutor(max(workers, 1)) as pool:
+            found = [
+                file
+                for files in pool.map(
+                    lambda folder: self._scan_folder(folder, pattern), show_folders
+                )
+                for file in files
+            ]
+            changed = [
+                file for file in found if known.get(file[0]) != (file[4], file[5])
+            ]
+            checksums = list(
+                pool.map(lambda file: quick_checksum(Path(file[0]), file[4]), changed)
+            )
+
+        now = time.time()
+        seen = {file[0] for file in found}
+        gone = [
+            path
+            for path in known
+            if path not in seen and any(Path(path).is_relative_to(r) for r in roots)
+        ]
+        with self._connect() as db:
+            # The category url and quality that add() recorded stay
+            db.executemany(
+                "INSERT INTO files "
+                "(path, show, ep, quality, size, mtime, checksum, added) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(path) DO UPDATE SET "
+                "show = excluded.show, ep = excluded.ep, "
+                "quality = COALESCE(excluded.quality, quality), "
+                "size = excluded.size, mtime = excluded.mtime, "
+                "checksum = excluded.checksum, added = excluded.added",
+                [file + (checksum, now) for file, checksum in zip(changed, checksums)],
+            )
+            db.executemany("DELETE FROM files WHERE path = ?", [(p,) for p in gone])
+
+        return ScanResult(
+            len(found),
+            len([file for file in changed if file[0] not in known]),
+            len(gone),
+            time.monotonic() - start,
+        )
+
+    @staticmethod
+    def _scan_folder(folder: Path, pattern: "re.Pattern") -> List[tuple]:
+        files = []
+        for entry in os.scandir(folder):
+            match = pattern.match(entry.name)
+            if match is None or not entry.is_file():
+                continue
+            # Downloads that did not finish (see remux.part_path)
+            if Path(entry.name).stem.endswith(".part"):
+                continue
+
+            stat = entry.stat()
+            files.append(
+                (
+                    entry.path,
+                    folder.name,
+                    episode_key(match.group("ep")),
+                    match.groupdict().get("quality"),
+                    stat.st_size,
+                    stat.st_mtime,
+                )
+            )
+
+        return files
+
+    @staticmethod
+    def _file(row: sqlite3.Row) -> LibraryFile:
+        library_file = LibraryFile(**dict(row))
+        library_file.path = Path(library_file.path)
+        return library_file
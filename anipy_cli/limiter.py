@@ -0,0 +1,105 @@
+import time
+import statistics
+import threading
+from typing import Callable, List, Optional, Tuple
+
+
+class AdaptiveLimiter:
+    """
+    Limits how many requests are in flight at once and
+    adapts the limit to the connection (AIMD): after every
+    window of requests the limit goes up by one while the
+    throughput keeps up and the latency stays low, it goes
+    down by one when either gets worse, and is halved
+    when requests fail (e.g. 429, 5xx, timeouts).
+
+    on_change is called with the old limit, the new
+    limit and the reason, whenever the limit changes.
+    """
+
+    # Latency this many times the lowest seen
+    # means requests are queueing up somewhere
+    LATENCY_FACTOR = 2.0
+    # Throughput may drop this much before it counts as worse
+    THROUGHPUT_TOLERANCE = 0.9
+
+    def __init__(
+        self,
+        initial: int,
+        minimum: int,
+        maximum: int,
+        on_change: Optional[Callable[[int, int, str], None]] = None,
+    ) -> None:
+        self.minimum = max(minimum, 1)
+        self.maximum = max(maximum, self.minimum)
+        self.limit = self._clamp(initial)
+        self.on_change = on_change
+        self.in_flight = 0
+        self._cond = threading.Condition()
+        self._samples: List[Tuple[bool, int, float]] = []
+        self._window_start = time.monotonic()
+        self._last_throughput: Optional[float] = None
+        self._base_latency: Optional[float] = None
+
+    def _clamp(self, limit: int) -> int:
+        return max(self.minimum, min(self.maximum, limit))
+
+    def acquire(self) -> None:
+        """Wait until a request may be started."""
+        with self._cond:
+            while self.in_flight >= self.limit:
+                self._cond.wait()
+            self.in_flight += 1
+
+    def release(self, ok: bool, size: int, latency: float) -> None:
+        """
+        Report how a request that was started with acquire()
+        went: ok is False if it failed or was throttled,
+        size is the number of bytes received.
+        """
+        with self._cond:
+            self.in_flight -= 1
+            self._samples.append((ok, size, latency))
+            if len(self._samples) >= max(self.limit, 4):
+                self._adapt()
+            self._cond.notify_all()
+
+    def _adapt(self) -> None:
+        now = time.monotonic()
+        elapsed = max(now - self._window_start, 1e-6)
+        errors = sum(1 for ok, _, _ in self._samples if not ok)
+        throughput = sum(size for _, size, _ in self._samples) / elapsed
+        latencies = [latency for ok, _, latency in self._samples if ok]
+        latency = statistics.median(latencies) if latencies else None
+
+        if errors:
+            limit = self.limit // 2
+            reason = f"{errors} failed requests"
+        elif (
+            latency is not None
+            and self._base_latency is not None
+            and latency > self._base_latency * self.LATENCY_FACTOR
+        ):
+            limit = self.limit - 1
+            reason = f"latency up to {latency * 1000:.0f}ms"
+        elif (
+            self._last_throughput is None
+            or throughput >= self._last_throughput * self.THROUGHPUT_TOLERANCE
+        ):
+            limit = self.limit + 1
+            reason = f"throughput {throughput / 1024:.0f}KiB/s"
+        else:
+            limit = self.limit - 1
+            reason = f"throughput down to {throughput / 1024:.0f}KiB/s"
+
+        if latency is not None:
+            self._base_latency = min(self._base_latency or latency, latency)
+        self._last_throughput = throughput
+        self._samples = []
+        self._window_start = now
+
+        limit = self._clamp(limit)
+        if limit != self.limit:
+            old, self.limit = self.limit, limit
+            if self.on_change is not None:
+                self.on_change(old, limit, reason)
@@ -8,7 +8,6 @@ from copy import deepcopy
 from multiprocessing import Pool
 
 import requests
-from requests.adapters import HTTPAdapter, Retry
 
 from anipy_cli.url_handler import epHandler
 from anipy_cli.seasonal import Seasonal
@@ -16,6 +15,7 @@ from anipy_cli.query import query
 from anipy_cli.colors import colors, cprint
 from anipy_cli.config import Config
 from anipy_cli.misc import read_json, error, Entry
+from anipy_cli.net import get_session, USER_AGENT
 
 
 def _base64_decode(b64: str):
@@ -73,15 +73,10 @@ class MAL:
 
         self.headers = {
             "Content-Type": "application/x-www-form-urlencoded",
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; WOW64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/86.0.4240.198 Safari/537.36",
+            "User-Agent": USER_AGENT,
             "X-MAL-Client-ID": self.api_client_id,
         }
-        self.session = requests.Session()
-        retry = Retry(connect=3, backoff_factor=0.5)
-        adapter = HTTPAdapter(max_retries=retry)
-        self.session.mount("http://", adapter)
-        self.session.mount("https://", adapter)
-        self.session.headers.update(self.headers)
+        self.session = get_session()
         self.read_save_data()
         if self.mal_user:
             if not self.auth():
@@ -134,7 +129,12 @@ class MAL:
     ):
         try:
             response = self.session.request(
-                method, url, data=data, params=query_params, json=body
+                method,
+                url,
+                data=data,
+                params=query_params,
+                json=body,
+                headers=self.headers,
             )
             response.raise_for_status()
             return response.json()
@@ -199,9 +199,7 @@ class MAL:
         if isinstance(response, dict):
             if response["access_token"]:
                 self.access_token = response["access_token"]
-                self.session.headers.update(
-                    {"Authorization": "Bearer " + self.access_token}
-                )
+                self.headers.update({"Authorization": "Bearer " + self.access_token})
                 self.access_token_expire_time = time_now + datetime.timedelta(
                     0, int(response["expires_in"])
                 )
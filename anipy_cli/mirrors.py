@@ -0,0 +1,127 @@
+import math
+import time
+import threading
+from typing import Callable, List, Optional, Set, Tuple
+
+# A part of a mirror only stands in for a part of the
+# primary playlist if their durations are this close
+DURATION_TOLERANCE = 0.5
+
+
+class Source:
+    """
+    One copy of the stream, the primary playlist
+    (content is None) or the media playlist of a mirror.
+    """
+
+    def __init__(self, name: str, content=None) -> None:
+        self.name = name
+        self.content = content
+        # Failures since the last part that came through
+        self.failures = 0
+        self.demoted_until = 0.0
+
+    @property
+    def demoted(self) -> bool:
+        return self.demoted_until > time.monotonic()
+
+    def segment(self, segment, sequence: int):
+        """
+        The part of this source with the media sequence number
+        of segment (sequence), None if it has no such part.
+        """
+        if self.content is None:
+            return segment
+
+        index = sequence - (self.content.media_sequence or 0)
+        if not 0 <= index < len(self.content.segments):
+            return None
+
+        found = self.content.segments[index]
+        duration = getattr(segment, "duration", None)
+        if duration is not None and not math.isclose(
+            found.duration, duration, abs_tol=DURATION_TOLERANCE
+        ):
+            return None
+
+        return found
+
+
+class MirrorSet:
+    """
+    The sources a part can be fetched from: the primary
+    playlist first, then the mirrors (the other sources
+    and backup sources of the same quality). Parts are
+    matched by media sequence number.
+
+    The mirrors are loaded (loader) once a part failed
+    for the first time. A source that failed DEMOTE_AFTER
+    times in a row is tried after all others for
+    DEMOTE_FOR seconds, a part that comes through
+    resets its count.
+    """
+
+    DEMOTE_AFTER = 3
+    DEMOTE_FOR = 60.0
+
+    def __init__(
+        self,
+        media_sequence: int = 0,
+        loader: Callable[[], List[Source]] = None,
+        name: str = "primary",
+    ) -> None:
+        self.media_sequence = media_sequence
+        self.sources = [Source(name)]
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+    def _load(self) -> None:
+        # Parts that failed meanwhile wait for the mirrors
+        with self._load_lock:
+            loader, self._loader = self._loader, None
+            if loader is not None:
+                self.sources = self.sources + loader()
+
+    def ranked(self) -> List[Source]:
+        """Sources in the order they are tried, demoted ones last."""
+        return sorted(self.sources, key=lambda source: source.demoted)
+
+    def pick(self, segment, index: int, tried: Set[Source]) -> Optional[Tuple]:
+        """
+        The best source that was not tried for the part
+        (segment at index in the primary playlist) yet and
+        its part there, None if no source is left.
+        """
+        if tried:
+            self._load()
+
+        sequence = self.media_sequence + index
+        for source in self.ranked():
+            if source in tried:
+                continue
+
+            found = source.segment(segment, sequence)
+            if found is not None:
+                return source, found
+
+        return None
+
+    def report(self, source: Source, ok: bool) -> bool:
+        """
+        Count a part that came through (ok) or failed,
+        returns True if the source was demoted by it.
+        """
+        with self._lock:
+            if ok:
+                source.failures = 0
+                return False
+
+            source.failures += 1
+            if source.failures < self.DEMOTE_AFTER or source.demoted:
+                return False
+
+            # After DEMOTE_FOR one more failure demotes it again
+            source.failures = self.DEMOTE_AFTER - 1
+            source.demoted_until = time.monotonic() + self.DEMOTE_FOR
+            return True
@@ -1,15 +1,15 @@
 import os
-import requests
 import sys
 import json
 import time
 from pypresence import Presence
 from pypresence.exceptions import DiscordNotFound
-from bs4 import BeautifulSoup
-from dataclasses import dataclass
-from typing import Union
+from dataclasses import dataclass, field
+from typing import List, Union
 
 from anipy_cli.config import Config
+from anipy_cli.net import get_session
+from anipy_cli.soup import make_soup, ANIME_INFO, SEASON_LIST
 from anipy_cli.colors import colors, color, cprint
 
 
@@ -28,6 +28,8 @@ class Entry:
     ep: Union[int, float] = 0
     latest_ep: Union[int, float] = 0
     quality: str = ""
+    # Other sources of the stream with the same quality
+    mirror_urls: List[str] = field(default_factory=list)
 
 
 def clear_console():
@@ -129,8 +131,8 @@ def get_anime_info(category_url: str) -> dict:
     """
     Get metadata about an anime.
     """
-    r = requests.get(category_url)
-    soup = BeautifulSoup(r.text, "html.parser")
+    r = get_session().get(category_url)
+    soup = make_soup(r.content, ANIME_INFO)
     info_body = soup.find("div", {"class": "anime_info_body_bg"})
     image_url = info_body.find("img")["src"]
     other_info = info_body.find_all("p", {"class": "type"})
@@ -138,10 +140,7 @@ def get_anime_info(category_url: str) -> dict:
         "image_url": image_url,
         "type": other_info[0].text.replace("\n", "").replace("Type: ", ""),
         "synopsis": other_info[1].text.replace("\n", ""),
-        "genres": [
-            x["title"]
-            for x in BeautifulSoup(str(other_info[2]), "html.parser").find_all("a")
-        ],
+        "genres": [x["title"] for x in other_info[2].find_all("a")],
         "release_year": other_info[3].text.replace("Released: ", ""),
         "status": other_info[4].text.replace("\n", "").replace("Status: ", ""),
     }
@@ -154,11 +153,11 @@ def search_in_season_on_gogo(s_year, s_name):
     content = True
     gogo_anime_season_list = []
     while content:
-        r = requests.get(
+        r = get_session().get(
             f"{Config().gogoanime_url}/sub-category/{s_name}-{s_year}-anime",
             params={"page": page},
         )
-        soup = BeautifulSoup(r.content, "html.parser")
+        soup = make_soup(r.content, SEASON_LIST)
         wrapper_div = soup.find("div", attrs={"class": "last_episodes"})
         try:
             anime_items = wrapper_div.findAll("li")
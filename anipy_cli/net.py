@@ -0,0 +1,206 @@
+import time
+import threading
+import requests
+from contextlib import contextmanager
+from typing import Dict
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter, Retry
+
+from anipy_cli.config import Config
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; WOW64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/86.0.4240.198 Safari/537.36"
+
+_session = None
+_session_lock = threading.Lock()
+_transfer_session = None
+_transfer_session_lock = threading.Lock()
+_budget = None
+_budget_lock = threading.Lock()
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """
+    HTTPAdapter that uses a default timeout
+    for requests that don't specify one.
+    """
+
+    __attrs__ = HTTPAdapter.__attrs__ + ["timeout"]
+
+    def __init__(self, *args, timeout=None, **kwargs):
+        self.timeout = timeout
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, timeout=None, **kwargs):
+        if timeout is None:
+            timeout = self.timeout
+
+        return super().send(request, timeout=timeout, **kwargs)
+
+
+def pool_size() -> int:
+    """
+    Connections kept per host, derived from the
+    worker counts so that no worker has to wait for
+    (or throw away) a connection.
+    """
+    host_limits = Config().download_host_connections.values()
+    return (
+        max(
+            Config().download_workers_max,
+            Config().stream_resolve_workers,
+            Config().download_connections_per_host,
+            *[limit for limit in host_limits if isinstance(limit, int)],
+        )
+        + 4
+    )
+
+
+def new_session(retry: Retry = None) -> requests.Session:
+    """
+    Create a session with the retry policy, timeouts,
+    pool sizes and headers used throughout anipy-cli.
+    Use get_session() unless you need a separate cookie
+    jar, every new session has its own connection pool.
+    """
+    session = requests.Session()
+    if retry is None:
+        retry = Retry(
+            total=3,
+            connect=3,
+            read=2,
+            status=2,
+            backoff_factor=0.5,
+            status_forcelist=[429, 502, 503, 504],
+            raise_on_status=False,
+            respect_retry_after_header=True,
+        )
+    adapter = TimeoutHTTPAdapter(
+        max_retries=retry,
+        pool_connections=20,
+        pool_maxsize=pool_size(),
+        timeout=Config().request_timeout,
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({"User-Agent": USER_AGENT})
+
+    return session
+
+
+def get_session() -> requests.Session:
+    """
+    Returns the process-wide session, headers
+    that only belong to one request (e.g. referer)
+    have to be passed per request.
+    """
+    global _session
+
+    with _session_lock:
+        if _session is None:
+            _session = new_session()
+
+        return _session
+
+
+def get_transfer_session() -> requests.Session:
+    """
+    Returns the process-wide session for the transfers
+    (hls parts, keys and mp4 ranges). Only failed connects
+    are retried by it, everything else is up to the
+    RetryPolicy of the download, which sees every failure
+    and does not sleep while holding a connection slot.
+    """
+    global _transfer_session
+
+    with _transfer_session_lock:
+        if _transfer_session is None:
+            _transfer_session = new_session(
+                Retry(total=None, connect=2, read=0, status=0, other=0)
+            )
+
+        return _transfer_session
+
+
+class ConnectionBudget:
+    """
+    Limits the connections that all downloads together
+    open, in total and per host, and optionally
+    the bandwidth they use (token bucket).
+    """
+
+    def __init__(
+        self,
+        max_connections: int,
+        per_host: int,
+        host_limits: Dict[str, int] = None,
+        speed_limit: int = 0,
+    ) -> None:
+        self.speed_limit = speed_limit
+        self._total = threading.Semaphore(max(max_connections, 1))
+        self._per_host = max(per_host, 1)
+        self._host_limits = host_limits or {}
+        self._hosts: Dict[str, threading.Semaphore] = {}
+        self._hosts_lock = threading.Lock()
+        self._tokens = float(speed_limit)
+        self._last_refill = time.monotonic()
+        self._bucket_lock = threading.Lock()
+
+    def _host_slots(self, url: str) -> threading.Semaphore:
+        host = urlsplit(url).hostname or ""
+        with self._hosts_lock:
+            if host not in self._hosts:
+                limit = self._host_limits.get(host, self._per_host)
+                self._hosts[host] = threading.Semaphore(max(int(limit), 1))
+
+            return self._hosts[host]
+
+    @contextmanager
+    def connection(self, url: str):
+        """
+        Hold a connection slot for url while in the with block,
+        blocks until one is free. The host slot is taken first, so
+        requests to a busy host don't keep others waiting.
+        """
+        with self._host_slots(url):
+            with self._total:
+                yield
+
+    def throttle(self, size: int) -> None:
+        """
+        Account for size bytes that were just received,
+        sleeps if the speed limit is exceeded.
+        """
+        if not self.speed_limit:
+            return
+
+        with self._bucket_lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.speed_limit,
+                self._tokens + (now - self._last_refill) * self.speed_limit,
+            )
+            self._last_refill = now
+            self._tokens -= size
+            wait = -self._tokens / self.speed_limit if self._tokens < 0 else 0
+
+        if wait:
+            time.sleep(wait)
+
+
+def get_budget() -> ConnectionBudget:
+    """
+    Returns the process-wide connection budget
+    that every download takes its connections from.
+    """
+    global _budget
+
+    with _budget_lock:
+        if _budget is None:
+            _budget = ConnectionBudget(
+                Config().download_max_connections,
+                Config().download_connections_per_host,
+                Config().download_host_connections,
+                Config().download_speed_limit * 1024,
+            )
+
+        return _budget
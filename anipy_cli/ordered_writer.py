@@ -0,0 +1,142 @@
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from anipy_cli.journal import SegmentJournal
+
+
+class OrderedWriter:
+    """
+    Puts segments that are downloaded concurrently
+    back into playlist order and appends them to
+    one file as soon as they are contiguous.
+
+    Segments that arrive early wait in memory,
+    put() blocks a worker whose segment is more
+    than window segments ahead of the next one
+    to be written, so memory use stays bounded.
+
+    With max_bytes set, workers reserve() room for
+    their segment before downloading it and wait while
+    the segments in memory and in flight would take more,
+    except for the next one to be written, which
+    always may go ahead so the file keeps growing.
+    """
+
+    # Reserved for a segment before any has been written
+    DEFAULT_ESTIMATE = 1024 * 1024
+
+    def __init__(
+        self,
+        path: Path,
+        names: List[str],
+        journal: Optional[SegmentJournal] = None,
+        start: int = 0,
+        window: int = 16,
+        max_bytes: int = 0,
+    ) -> None:
+        self.path = path
+        self.names = names
+        self.journal = journal
+        self.next_index = start
+        self.window = max(window, 1)
+        self.max_bytes = max_bytes
+        self.failed = False
+        # Bytes of the segments in memory or reserved
+        self.held = 0
+        self._written = 0
+        self._written_count = 0
+        self._reserved: Dict[int, int] = {}
+        self._buffer: Dict[int, bytes] = {}
+        self._cond = threading.Condition()
+        self._file = path.open("ab")
+
+    @property
+    def estimate(self) -> int:
+        """Average size of the segments written so far"""
+        if not self._written_count:
+            return self.DEFAULT_ESTIMATE
+        return self._written // self._written_count
+
+    def reserve(self, index: int) -> bool:
+        """
+        Wait until there is room for the segment at index
+        (as big as the average one), returns False if the
+        writer failed. put() or release() give it back.
+        """
+        with self._cond:
+            size = self.estimate
+            while (
+                not self.failed
+                and self.max_bytes
+                and self.held
+                and self.held + size > self.max_bytes
+                and index != self.next_index
+            ):
+                self._cond.wait()
+
+            if self.failed:
+                return False
+
+            self.held += size - self._reserved.get(index, 0)
+            self._reserved[index] = size
+            return True
+
+    def release(self, index: int) -> None:
+        """Give back what was reserved for index, e.g. to retry it later"""
+        with self._cond:
+            self.held -= self._reserved.pop(index, 0)
+            self._cond.notify_all()
+
+    def put(self, index: int, data: bytes) -> bool:
+        """
+        Hand over the segment at index, returns
+        False if the writer failed and the
+        segment was thrown away.
+        """
+        with self._cond:
+            while not self.failed and index >= self.next_index + self.window:
+                self._cond.wait()
+
+            if self.failed:
+                return False
+
+            self._buffer[index] = data
+            self.held += len(data) - self._reserved.pop(index, 0)
+            while self.next_index in self._buffer:
+                self._append(self._buffer.pop(self.next_index))
+
+            self._cond.notify_all()
+            return True
+
+    def _append(self, data: bytes) -> None:
+        self._file.write(data)
+        self.held -= len(data)
+        self._written += len(data)
+        self._written_count += 1
+        # Flush before journaling, so the journal
+        # never gets ahead of what is in the file
+        self._file.flush()
+        if self.journal is not None:
+            self.journal.add(self.names[self.next_index], len(data))
+        self.next_index += 1
+
+    def fail(self) -> None:
+        """
+        Give up on the segments after the next one,
+        waiting workers return and the file ends after
+        the last contiguous segment.
+        """
+        with self._cond:
+            self.failed = True
+            self._buffer.clear()
+            self._reserved.clear()
+            self.held = 0
+            self._cond.notify_all()
+
+    @property
+    def done(self) -> bool:
+        return self.next_index == len(self.names)
+
+    def close(self) -> None:
+        self._file.close()
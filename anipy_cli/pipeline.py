@@ -0,0 +1,177 @@
+import time
+import queue
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+_DONE = object()
+
+
+@dataclass
+class Stage:
+    """
+    One step of a Pipeline, func is called with the
+    output of the previous stage by worker threads.
+    """
+
+    name: str
+    func: Callable[[Any], Any]
+    workers: int = 1
+    busy: float = field(default=0.0, init=False)
+    blocked: float = field(default=0.0, init=False)
+    items: int = field(default=0, init=False)
+    failed: int = field(default=0, init=False)
+
+    def __post_init__(self):
+        self.workers = max(self.workers, 1)
+
+
+@dataclass
+class StageStats:
+    name: str
+    workers: int
+    items: int
+    failed: int
+    # Share of the run time the workers spent working,
+    # and waiting for the next stage to take their output
+    utilization: float
+    blocked: float
+
+
+class Pipeline:
+    """
+    Runs items through stages that each have their own
+    workers, connected by bounded queues, so while one
+    item is in a later stage the next ones are already
+    in the earlier ones. A full queue makes the stage
+    before it wait, so no stage runs far ahead.
+
+    An item whose stage raises skips the rest, the exception
+    is its result. stats() tells how busy every stage was,
+    the most utilized one is the bottleneck.
+    """
+
+    def __init__(
+        self,
+        stages: List[Stage],
+        queue_size: int = 1,
+        on_cancel: Optional[Callable[[], None]] = None,
+    ) -> None:
+        self.stages = stages
+        self.queue_size = max(queue_size, 1)
+        self.on_cancel = on_cancel
+        self.elapsed = 0.0
+        self._cancelled = threading.Event()
+
+    def run(self, items: List[Any]) -> List[Any]:
+        """
+        Returns the output of the last stage (or the exception
+        that stopped an item) for every item, in input order.
+        """
+        results: Dict[int, Any] = {}
+        queues = [queue.Queue(self.queue_size) for _ in self.stages]
+        finished = threading.Event()
+        left = [stage.workers for stage in self.stages]
+        left_lock = threading.Lock()
+        start = time.monotonic()
+
+        def put(stage_index: int, item, stage: Stage = None) -> None:
+            put_start = time.monotonic()
+            queues[stage_index].put(item)
+            if stage is not None:
+                with left_lock:
+                    stage.blocked += time.monotonic() - put_start
+
+        def work(stage_index: int) -> None:
+            stage = self.stages[stage_index]
+            last = stage_index == len(self.stages) - 1
+            while True:
+                item = queues[stage_index].get()
+                if item is _DONE:
+                    break
+
+                index, value = item
+                if self._cancelled.is_set():
+                    results[index] = KeyboardInterrupt()
+                    continue
+
+                work_start = time.monotonic()
+                try:
+                    value = stage.func(value)
+                except (Exception, SystemExit) as e:
+                    value = e
+                with left_lock:
+                    stage.busy += time.monotonic() - work_start
+                    stage.items += 1
+                    stage.failed += isinstance(value, BaseException)
+
+                if last or isinstance(value, BaseException):
+                    results[index] = value
+                else:
+                    put(stage_index + 1, (index, value), stage)
+
+            with left_lock:
+                left[stage_index] -= 1
+                if left[stage_index] != 0:
+                    return
+
+            # The last worker of a stage tells the next one
+            if last:
+                finished.set()
+            else:
+                for _ in range(self.stages[stage_index + 1].workers):
+                    put(stage_index + 1, _DONE)
+
+        def feed() -> None:
+            for item in enumerate(items):
+                if self._cancelled.is_set():
+                    results[item[0]] = KeyboardInterrupt()
+                    continue
+                put(0, item)
+            for _ in range(self.stages[0].workers):
+                put(0, _DONE)
+
+        threads = [threading.Thread(target=feed, daemon=True)]
+        for stage_index, stage in enumerate(self.stages):
+            threads += [
+                threading.Thread(target=work, args=(stage_index,), daemon=True)
+                for _ in range(stage.workers)
+            ]
+        for thread in threads:
+            thread.start()
+
+        try:
+            # Wait with a timeout, so CTRL+C gets through
+            while not finished.wait(0.2):
+                pass
+        except KeyboardInterrupt:
+            self.cancel()
+            finished.wait()
+            raise
+        finally:
+            self.elapsed = time.monotonic() - start
+
+        return [results[index] for index in range(len(items))]
+
+    def cancel(self) -> None:
+        """
+        Stop starting new work, items
+        that were not processed yet get a
+        KeyboardInterrupt as their result.
+        """
+        self._cancelled.set()
+        if self.on_cancel is not None:
+            self.on_cancel()
+
+    def stats(self) -> List[StageStats]:
+        return [
+            StageStats(
+                stage.name,
+                stage.workers,
+                stage.items,
+                stage.failed,
+                stage.busy / (stage.workers * self.elapsed) if self.elapsed else 0,
+                stage.blocked / (stage.workers * self.elapsed) if self.elapsed else 0,
+            )
+            for stage in self.stages
+        ]
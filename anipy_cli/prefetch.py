@@ -0,0 +1,106 @@
+import time
+import threading
+from copy import copy
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Dict, Optional, Tuple
+
+from anipy_cli.misc import Entry, parsenum
+from anipy_cli.url_handler import epHandler, videourl, stream_url_expiry
+
+
+class StreamPrefetcher:
+    """
+    Resolves the streams of neighbouring episodes
+    in the background, so that they are ready when
+    the user wants to play them. A prefetched stream
+    is only handed out until its url expires.
+    """
+
+    def __init__(self, quality) -> None:
+        self.quality = quality
+        self._pool = ThreadPoolExecutor(2)
+        self._futures: Dict[Tuple[str, str], Future] = {}
+        self._lock = threading.Lock()
+
+    def prefetch(self, entry: Entry, next_ep=True, prev_ep=False) -> None:
+        """
+        Start resolving the next and/or previous
+        episode of entry. Prefetches for other
+        episodes that are still pending get cancelled.
+        """
+        wanted = []
+        if next_ep:
+            wanted.append(entry.ep + 1)
+        if prev_ep and entry.ep > 1:
+            wanted.append(entry.ep - 1)
+
+        keys = {(entry.category_url, str(ep)): ep for ep in wanted}
+
+        with self._lock:
+            for key in list(self._futures):
+                if key not in keys:
+                    self._futures.pop(key).cancel()
+
+            for key, ep in keys.items():
+                if key not in self._futures:
+                    self._futures[key] = self._pool.submit(
+                        self._resolve_with_expiry, copy(entry), ep
+                    )
+
+    def get(self, entry: Entry, ep) -> Optional[Entry]:
+        """
+        Get the prefetched entry for episode ep of the show of entry,
+        waits if it is still being resolved. Returns None if
+        the episode was not prefetched, could not be resolved
+        or its stream url expired meanwhile.
+        """
+        with self._lock:
+            future = self._futures.pop((entry.category_url, str(ep)), None)
+
+        if future is None or future.cancelled():
+            return None
+
+        try:
+            resolved = future.result()
+        except (Exception, SystemExit):
+            return None
+
+        if resolved is None:
+            return None
+
+        prefetched, expires = resolved
+        return prefetched if expires > time.time() else None
+
+    def cancel(self) -> None:
+        """
+        Cancel all pending prefetches, already
+        running ones finish but get discarded.
+        """
+        with self._lock:
+            for future in self._futures.values():
+                future.cancel()
+
+            self._futures.clear()
+
+    def _resolve_with_expiry(self, entry: Entry, ep) -> Optional[Tuple[Entry, float]]:
+        # The expiry is taken when the stream is resolved,
+        # stream_cache_ttl counts from then, not from get()
+        entry = self._resolve(entry, ep)
+        if entry is None:
+            return None
+
+        return entry, stream_url_expiry(entry.stream_url)
+
+    def _resolve(self, entry: Entry, ep) -> Optional[Entry]:
+        ep_class = epHandler(entry)
+        if str(ep) not in ep_class._get_ep_index():
+            return None
+
+        entry.ep = parsenum(str(ep))
+        entry.embed_url = ""
+        entry.latest_ep = ep_class.get_latest()
+        ep_class.gen_eplink()
+
+        url_class = videourl(entry, self.quality)
+        url_class.stream_url()
+        return url_class.get_entry()
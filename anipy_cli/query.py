@@ -1,6 +1,5 @@
-import requests
 import re
-from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor
 from yaspin import yaspin
 from yaspin.spinners import Spinners
 
@@ -8,6 +7,8 @@ from yaspin.spinners import Spinners
 from anipy_cli.misc import loc_err, response_err, error, print_names
 from anipy_cli.colors import colors, cinput
 from anipy_cli.config import Config
+from anipy_cli.net import get_session
+from anipy_cli.soup import make_soup, SEARCH_RESULTS
 
 base_url = Config().gogoanime_url
 
@@ -27,9 +28,9 @@ class query:
             spinner.color = "cyan"
             self.entry = entry
             self.search_url = base_url + f"/search.html?keyword={search_param}"
-            r = requests.get(self.search_url)
+            r = get_session().get(self.search_url)
             response_err(r, self.search_url)
-            self.soup = BeautifulSoup(r.content, "html.parser")
+            self.soup = make_soup(r.content, SEARCH_RESULTS)
             spinner.ok("✓")
 
     def get_pages(self):
@@ -44,6 +45,12 @@ class query:
         except:
             self.pages = 1
 
+    def _get_page(self, page):
+        req_link = self.search_url + f"&page={page}"
+        r = get_session().get(req_link)
+        response_err(r, req_link)
+        return req_link, make_soup(r.content, SEARCH_RESULTS)
+
     def get_links(self):
         """
         Get all category links and names of a query
@@ -52,13 +59,17 @@ class query:
         self.get_pages()
         self.links = []
         self.names = []
-        for i in range(self.pages):
-            req_link = self.search_url + f"&page={i + 1}"
-            r = requests.get(req_link)
-            response_err(r, req_link)
-            self.soup = BeautifulSoup(r.content, "html.parser")
 
-            for link in self.soup.find_all("p", attrs={"class": "name"}):
+        # Page 1 was already fetched in __init__,
+        # the rest is fetched concurrently.
+        pages = [(self.search_url, self.soup)]
+        workers = min(Config().gogoanime_max_connections, self.pages - 1)
+        if workers > 0:
+            with ThreadPoolExecutor(workers) as pool:
+                pages += pool.map(self._get_page, range(2, self.pages + 1))
+
+        for req_link, soup in pages:
+            for link in soup.find_all("p", attrs={"class": "name"}):
                 name_lower = link.text.lower()
                 if len(Config().anime_types) == 1:
                     if "sub" in Config().anime_types and "(dub)" in name_lower:
@@ -0,0 +1,157 @@
+import os
+import shutil
+import subprocess
+from pathlib import Path
+from typing import Callable, List, Optional
+
+FFMPEG_MISSING = "ffmpeg not found, install it or run: pip install imageio-ffmpeg"
+
+
+class RemuxError(Exception):
+    pass
+
+
+def find_ffmpeg() -> Optional[str]:
+    """
+    ffmpeg from the PATH, or the one that
+    comes with the imageio-ffmpeg package.
+    """
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg:
+        return ffmpeg
+
+    try:
+        import imageio_ffmpeg
+
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except (ImportError, RuntimeError):
+        return None
+
+
+def remux_command(
+    ffmpeg: str, video: Path, output: Path, audio: Path = None
+) -> List[str]:
+    """
+    Copy the streams of video (and the audio rendition
+    in audio, if it is separate) into output, nothing is
+    re-encoded, the container is chosen by the extension.
+    """
+    command = [ffmpeg, "-hide_banner", "-nostdin", "-y"]
+    command += ["-nostats", "-progress", "pipe:1", "-i", str(video)]
+    if audio is not None:
+        command += ["-i", str(audio), "-map", "0:v", "-map", "1:a"]
+    else:
+        command += ["-map", "0:v", "-map", "0:a?"]
+
+    return command + ["-c", "copy", str(output)]
+
+
+def download_command(
+    ffmpeg: str, url: str, output: Path, referer: str = None
+) -> List[str]:
+    """
+    Copy the streams of the hls stream at url into
+    output, nothing is re-encoded, subtitles become
+    mov_text, the container is chosen by the extension.
+    """
+    command = [ffmpeg, "-hide_banner", "-nostdin", "-y"]
+    command += ["-nostats", "-progress", "pipe:1"]
+    if referer:
+        command += ["-headers", f"referer:{referer}"]
+
+    command += ["-i", url, "-vcodec", "copy", "-acodec", "copy"]
+    return command + ["-scodec", "mov_text", "-c", "copy", str(output)]
+
+
+def part_path(path: Path) -> Path:
+    """
+    Where path is written until it is complete, the
+    extension stays last so ffmpeg picks the same container.
+    """
+    return path.with_name(f"{path.stem}.part{path.suffix}")
+
+
+def _run_ffmpeg(
+    command: Callable[[str, Path], List[str]],
+    output: Path,
+    log_path: Path = None,
+    on_progress: Optional[Callable[[float], None]] = None,
+) -> None:
+    """
+    Run the ffmpeg command(ffmpeg, target) that writes
+    to target, a part file that replaces output only
+    once ffmpeg succeeded, it is removed otherwise.
+    """
+    ffmpeg = find_ffmpeg()
+    if ffmpeg is None:
+        raise RemuxError(FFMPEG_MISSING)
+
+    target = part_path(output)
+    try:
+        with open(log_path or os.devnull, "w") as log, subprocess.Popen(
+            command(ffmpeg, target),
+            stdout=subprocess.PIPE,
+            stderr=log,
+            text=True,
+        ) as process:
+            try:
+                for line in process.stdout:
+                    key, _, value = line.strip().partition("=")
+                    # out_time_us is the position in microseconds
+                    if key == "out_time_us" and value.isdigit() and on_progress:
+                        on_progress(int(value) / 1_000_000)
+            except BaseException:
+                process.kill()
+                raise
+
+        if process.returncode != 0:
+            message = f"ffmpeg exited with {process.returncode}"
+            if log_path is not None:
+                message += f", see {log_path}"
+            raise RemuxError(message)
+
+        target.replace(output)
+    except BaseException:
+        target.unlink(missing_ok=True)
+        raise
+
+
+def remux_file(
+    video: Path,
+    output: Path,
+    audio: Path = None,
+    log_path: Path = None,
+    on_progress: Optional[Callable[[float], None]] = None,
+) -> None:
+    """
+    Remux video (and audio) into output with ffmpeg,
+    on_progress is called with the seconds of the output
+    written so far. ffmpeg's own output goes to log_path.
+    Raises RemuxError if ffmpeg is missing or fails, output
+    only exists once ffmpeg succeeded.
+    """
+    _run_ffmpeg(
+        lambda ffmpeg, target: remux_command(ffmpeg, video, target, audio),
+        output,
+        log_path,
+        on_progress,
+    )
+
+
+def download_file(
+    url: str,
+    output: Path,
+    referer: str = None,
+    log_path: Path = None,
+    on_progress: Optional[Callable[[float], None]] = None,
+) -> None:
+    """
+    Download the hls stream at url into output with
+    ffmpeg, like remux_file.
+    """
+    _run_ffmpeg(
+        lambda ffmpeg, target: download_command(ffmpeg, url, target, referer),
+        output,
+        log_path,
+        on_progress,
+    )
@@ -0,0 +1,111 @@
+import time
+import random
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+import requests
+
+# Statuses that mean "try again later", every other
+# 4xx/5xx won't get better by asking again
+RETRYABLE_STATUSES = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+
+class RetryPolicy:
+    """
+    How often and after how long a failed request
+    is tried again: exponential backoff with full jitter,
+    unless the server says how long to wait (Retry-After).
+    """
+
+    def __init__(
+        self,
+        attempts: int = 5,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+        max_retry_after: float = 120.0,
+    ) -> None:
+        self.attempts = max(attempts, 1)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+
+    @staticmethod
+    def is_retryable(failure: BaseException) -> bool:
+        """
+        Connection errors, timeouts and cut off bodies are
+        worth another try, http errors only for some statuses.
+        """
+        if isinstance(failure, requests.HTTPError) and failure.response is not None:
+            return failure.response.status_code in RETRYABLE_STATUSES
+
+        return True
+
+    def delay(self, attempt: int, failure: BaseException = None) -> float:
+        """Seconds to wait before the attempt after attempt (counted from 0)."""
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+        response = getattr(failure, "response", None)
+        retry_after = self.retry_after(response) if response is not None else None
+        if retry_after is None:
+            return backoff
+
+        return min(max(retry_after, backoff), self.max_retry_after)
+
+    @staticmethod
+    def retry_after(response: requests.Response) -> Optional[float]:
+        """
+        Parse the Retry-After header, which is
+        either a number of seconds or a http date.
+        """
+        value = response.headers.get("retry-after")
+        if not value:
+            return None
+
+        value = value.strip()
+        if value.isdigit():
+            return float(value)
+
+        try:
+            date = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+
+        if date.tzinfo is None:
+            date = date.replace(tzinfo=timezone.utc)
+        return max((date - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+class FailureBudget:
+    """
+    Number of failed attempts a whole download may have,
+    so a few bad parts get retried, but a download
+    where everything fails gives up instead of
+    retrying every part again and again.
+    """
+
+    def __init__(self, budget: int) -> None:
+        self.left = budget
+        self._lock = threading.Lock()
+
+    def spend(self) -> bool:
+        """Count a failed attempt, returns False once the budget is used up."""
+        with self._lock:
+            self.left -= 1
+            return self.left >= 0
+
+    @property
+    def exhausted(self) -> bool:
+        return self.left < 0
+
+
+def sleep(seconds: float, cancelled: threading.Event = None) -> bool:
+    """
+    Wait seconds, or until cancelled is set.
+    Returns False if it was cancelled.
+    """
+    if cancelled is None:
+        time.sleep(seconds)
+        return True
+
+    return not cancelled.wait(seconds)
@@ -0,0 +1,170 @@
+import threading
+from copy import copy
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from anipy_cli.colors import colors, cprint
+from anipy_cli.config import Config
+from anipy_cli.download import download
+from anipy_cli.misc import Entry, error, keyboard_inter
+from anipy_cli.pipeline import Pipeline, Stage, StageStats
+from anipy_cli.url_handler import videourl
+
+
+@dataclass
+class DownloadResult:
+    """
+    Result of DownloadScheduler.run for one entry,
+    error is set if it could not be resolved or downloaded.
+    """
+
+    entry: Entry
+    path: Optional[Path] = None
+    error: Optional[BaseException] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class DownloadScheduler:
+    """
+    Downloads many episodes at once, in a pipeline of
+    three stages: resolving the stream (videourl.resolve),
+    transferring it and remuxing it. Every stage has its
+    own workers (stream_resolve_workers, at most as many
+    as transfer, download_parallel_episodes and
+    download_remux_workers),
+    so the next episode resolves while one transfers
+    and the one before remuxes. All transfers share
+    the connections of net.get_budget().
+    """
+
+    def __init__(
+        self, quality, ffmpeg=False, dl_path: Path = None, parallel: int = None
+    ) -> None:
+        self.quality = quality
+        self.ffmpeg = ffmpeg
+        self.dl_path = dl_path
+        self.parallel = max(parallel or Config().download_parallel_episodes, 1)
+        self.stats: List[StageStats] = []
+        self._active: List[download] = []
+        self._active_lock = threading.Lock()
+        self._pipeline: Optional[Pipeline] = None
+        self._cancelled = threading.Event()
+
+    def run(self, entries: List[Entry]) -> List[DownloadResult]:
+        """
+        Resolve (if they have no stream url yet) and download
+        the entries, the results are in the order of the input,
+        an entry that fails does not stop the others.
+        """
+        if not entries:
+            return []
+
+        entries = [copy(entry) for entry in entries]
+        pipeline = Pipeline(
+            [
+                Stage(
+                    "resolve",
+                    self._resolve,
+                    min(Config().stream_resolve_workers, self.parallel),
+                ),
+                Stage("transfer", self._fetch, self.parallel),
+                Stage("remux", self._remux, Config().download_remux_workers),
+            ],
+            # Resolve at most one round ahead,
+            # stream urls expire after a while
+            queue_size=self.parallel,
+            on_cancel=self._cancel_active,
+        )
+        self._pipeline = pipeline
+        if self._cancelled.is_set():
+            pipeline.cancel()
+        try:
+            outcomes = pipeline.run(entries)
+        except KeyboardInterrupt:
+            keyboard_inter()
+        finally:
+            self.stats = pipeline.stats()
+
+        if len(entries) > 1:
+            self.print_stats()
+
+        return [
+            (
+                DownloadResult(entry, error=outcome)
+                if isinstance(outcome, BaseException)
+                else DownloadResult(entry, outcome)
+            )
+            for entry, outcome in zip(entries, outcomes)
+        ]
+
+    def cancel(self) -> None:
+        """
+        Stop run() from another thread, running downloads end
+        like interrupted, entries that did not get to the
+        transfer yet are not downloaded.
+        """
+        self._cancelled.set()
+        if self._pipeline is not None:
+            self._pipeline.cancel()
+        else:
+            self._cancel_active()
+
+    def _cancel_active(self) -> None:
+        with self._active_lock:
+            for dl_class in self._active:
+                dl_class.cancel()
+
+    def print_stats(self) -> None:
+        """
+        Print how busy every stage was, the
+        busiest one is what limits the downloads.
+        """
+        cprint(colors.CYAN, "\nStage       Workers  Episodes  Busy  Waiting")
+        for stage in self.stats:
+            print(
+                f"{stage.name:<12}{stage.workers:>7}{stage.items:>10}"
+                f"{stage.utilization:>6.0%}{stage.blocked:>9.0%}"
+            )
+
+    def _resolve(self, entry: Entry) -> Entry:
+        if entry.stream_url:
+            return entry
+
+        result = videourl.resolve(entry, self.quality)
+        if not result.ok:
+            error(f"skipping EP: {entry.ep}, could not resolve stream")
+            raise result.error
+
+        return result.entry
+
+    def _fetch(self, entry: Entry) -> Tuple[download, Path]:
+        dl_class = download(entry, self.quality, self.ffmpeg, self.dl_path)
+        with self._active_lock:
+            self._active.append(dl_class)
+        # cancel() may have come after the pipeline let the entry through
+        if self._cancelled.is_set():
+            dl_class.cancel()
+
+        try:
+            return dl_class, dl_class.fetch()
+        except (Exception, SystemExit):
+            error(f"could not download EP: {entry.ep}")
+            raise
+        finally:
+            with self._active_lock:
+                self._active.remove(dl_class)
+
+    @staticmethod
+    def _remux(fetched: Tuple[download, Path]) -> Path:
+        dl_class, path = fetched
+        try:
+            dl_class.remux()
+        except (Exception, SystemExit):
+            error(f"could not remux EP: {dl_class.entry.ep}")
+            raise
+
+        return path
@@ -36,19 +36,11 @@ class Seasonal:
         for i, e, n in zip(categ_urls, user_eps, names):
             self.entry.category_url = i
             ep_class = epHandler(self.entry)
+            ep_index = ep_class._get_ep_index()
 
-            eps_range = ep_class._load_eps_list()
-            for j in eps_range:
-                if parsenum(j["ep"]) == e:
-                    eps_range = eps_range[eps_range.index(j) + 1 :]
-                    break
-
-            ep_urls = []
-            for j in eps_range:
-                self.entry.ep = parsenum(j["ep"])
-                ep_class = epHandler(self.entry)
-                entry = ep_class.gen_eplink()
-                ep_urls.append([parsenum(j["ep"]), entry.ep_url])
+            ep_urls = [
+                [parsenum(j["ep"]), ep_index.link(j["ep"])] for j in ep_index.after(e)
+            ]
 
             latest_urls.update({n: {"ep_list": ep_urls, "category_url": i}})
 
@@ -0,0 +1,38 @@
+import functools
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    import lxml  # noqa: F401
+
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
+
+
+@functools.lru_cache()
+def get_backend() -> str:
+    """
+    Returns the parser BeautifulSoup should use,
+    lxml (C, a lot faster) if it is installed,
+    otherwise the builtin html.parser.
+    """
+    return "lxml" if HAS_LXML else "html.parser"
+
+
+def make_soup(markup, only: SoupStrainer = None, backend: str = None) -> BeautifulSoup:
+    """
+    Parse markup with the fastest available backend.
+    Pass a SoupStrainer as only, to build the tree
+    just for the parts of the page that are needed,
+    everything else gets skipped while parsing.
+    """
+    return BeautifulSoup(markup, backend or get_backend(), parse_only=only)
+
+
+# Strainers for the pages that get scraped, the episode list
+# has none as the response contains nothing but the list.
+SEARCH_RESULTS = SoupStrainer(["p", "a"])
+EMBED_LINKS = SoupStrainer("a")
+EMBED_TOKEN = SoupStrainer("script")
+ANIME_INFO = SoupStrainer("div", attrs={"class": "anime_info_body_bg"})
+SEASON_LIST = SoupStrainer("div", attrs={"class": "last_episodes"})
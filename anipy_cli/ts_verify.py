@@ -0,0 +1,100 @@
+from typing import Optional
+from urllib.parse import urlsplit
+
+try:
+    import numpy as np
+
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+PACKET_SIZE = 188
+SYNC_BYTE = 0x47
+NULL_PID = 0x1FFF
+
+
+def is_ts(data: bytes, uri: str = "") -> bool:
+    """
+    If data is meant to be a mpeg-ts segment: it starts with
+    the sync byte, or uri is a .ts file (so an error page in
+    its place is still caught). Packed audio (.aac) is not.
+    """
+    return data[:1] == bytes([SYNC_BYTE]) or urlsplit(uri).path.lower().endswith(".ts")
+
+
+def verify_ts(data: bytes) -> Optional[str]:
+    """
+    Check if data is a complete mpeg-ts segment: whole
+    188 byte packets that all start with the sync byte and
+    continuity counters without gaps. Returns what is wrong
+    with it, or None if nothing is.
+    """
+    if not data:
+        return "empty"
+
+    if data[:1] == b"<":
+        return "got a html page instead"
+
+    if len(data) % PACKET_SIZE:
+        return f"{len(data)} bytes is not a whole number of packets"
+
+    count = len(data) // PACKET_SIZE
+    if data[::PACKET_SIZE] != bytes([SYNC_BYTE]) * count:
+        return "packets without sync byte"
+
+    errors = _continuity_errors(data) if HAS_NUMPY else _continuity_errors_py(data)
+    if errors:
+        return f"{errors} continuity errors"
+
+    return None
+
+
+def _continuity_errors(data: bytes) -> int:
+    """
+    Number of packets whose continuity counter is not the one
+    of the previous packet of the same pid plus one (or the same,
+    a duplicate), unless the discontinuity indicator is set.
+    The packets are viewed without copying and checked all at once.
+    """
+    packets = np.frombuffer(data, dtype=np.uint8).reshape(-1, PACKET_SIZE)
+    pid = (packets[:, 1].astype(np.uint16) & 0x1F) << 8 | packets[:, 2]
+    control = packets[:, 3] >> 4 & 0x03
+    counter = packets[:, 3] & 0x0F
+    discontinuity = (
+        (control & 0x02 != 0) & (packets[:, 4] > 0) & (packets[:, 5] & 0x80 != 0)
+    )
+    transport_errors = int(np.count_nonzero(packets[:, 1] & 0x80))
+
+    # Only packets with payload count up
+    counted = (control & 0x01 != 0) & (pid != NULL_PID)
+    pid, counter, discontinuity = pid[counted], counter[counted], discontinuity[counted]
+    order = np.argsort(pid, kind="stable")
+    pid, counter, discontinuity = pid[order], counter[order], discontinuity[order]
+
+    step = (counter[1:] - counter[:-1]) & 0x0F
+    gaps = (pid[1:] == pid[:-1]) & (step > 1) & ~discontinuity[1:]
+
+    return transport_errors + int(np.count_nonzero(gaps))
+
+
+def _continuity_errors_py(data: bytes) -> int:
+    """_continuity_errors without numpy, packet by packet"""
+    errors = 0
+    last = {}
+    for offset in range(0, len(data), PACKET_SIZE):
+        header = data[offset + 1 : offset + 6]
+        if header[0] & 0x80:
+            errors += 1
+
+        pid = (header[0] & 0x1F) << 8 | header[1]
+        control = header[2] >> 4 & 0x03
+        if not control & 0x01 or pid == NULL_PID:
+            continue
+
+        counter = header[2] & 0x0F
+        discontinuity = control & 0x02 and header[3] > 0 and header[4] & 0x80
+        if pid in last and not discontinuity and (counter - last[pid]) & 0x0F > 1:
+            errors += 1
+        last[pid] = counter
+
+    return errors
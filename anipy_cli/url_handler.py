@@ -1,21 +1,86 @@
 import sys
 import json
-import requests
+import time
+import threading
 import re
 import base64
-import functools
+import bisect
 import m3u8
+from copy import copy
+from dataclasses import dataclass
+from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor
 from yaspin import yaspin
 from yaspin.spinners import Spinners
 from pathlib import Path
 from urllib.parse import urlparse, parse_qsl, urlencode, urljoin
-from bs4 import BeautifulSoup
-from requests.adapters import HTTPAdapter, Retry
 from Cryptodome.Cipher import AES
 
 from anipy_cli.misc import response_err, error, loc_err, parsenum, Entry, clear_console
 from anipy_cli.colors import cinput, color, colors, cprint
 from anipy_cli.config import Config
+from anipy_cli.cache import ep_list_cache, stream_cache
+from anipy_cli.net import get_session
+from anipy_cli.soup import make_soup, EMBED_LINKS, EMBED_TOKEN
+
+
+class EpisodeList:
+    """
+    Index over the episode list of a show
+    (as returned by epHandler._load_eps_list),
+    so that lookups don't have to scan the whole list.
+        - links: episode -> episode link
+        - positions: episode -> position in the list
+        - numbers/keys: episodes sorted numerically,
+          used for range queries with bisect
+        - specials: special episodes (e.g. 7.5)
+    """
+
+    def __init__(self, ep_list: list) -> None:
+        self.ep_list = ep_list
+        self.links = {x["ep"]: x["link"] for x in ep_list}
+        self.positions = {x["ep"]: i for i, x in enumerate(ep_list)}
+
+        ordered = sorted(self.links, key=parsenum)
+        self.keys = ordered
+        self.numbers = [parsenum(x) for x in ordered]
+
+        self.specials = [
+            x["ep"] for x in ep_list if re.match(r"^-?\d+(?:\.\d+)$", x["ep"])
+        ]
+
+    def __contains__(self, ep) -> bool:
+        return str(ep) in self.links
+
+    def __len__(self) -> int:
+        return len(self.ep_list)
+
+    def link(self, ep):
+        """
+        Get link of an episode or None
+        if the episode does not exist.
+        """
+        return self.links.get(str(ep))
+
+    def range(self, first, last) -> list:
+        """
+        All episodes from first to last
+        (both included) in numerical order.
+        """
+        start = bisect.bisect_left(self.numbers, parsenum(str(first)))
+        end = bisect.bisect_right(self.numbers, parsenum(str(last)))
+        return self.keys[start:end]
+
+    def after(self, ep) -> list:
+        """
+        Entries of the episode list that come after ep,
+        if ep is not in the list the whole list is returned.
+        """
+        position = self.positions.get(str(ep))
+        if position is None:
+            return self.ep_list
+
+        return self.ep_list[position + 1 :]
 
 
 class epHandler:
@@ -29,6 +94,7 @@ class epHandler:
         self.entry = entry
         self.movie_id = None
         self.ep_list = None
+        self.ep_index = None
 
     def get_entry(self) -> Entry:
         """
@@ -41,14 +107,23 @@ class epHandler:
         if self.ep_list:
             return self.ep_list
 
+        cache = ep_list_cache()
+        cached = cache.get(self.entry.category_url)
+
+        if cached:
+            self.movie_id = self.movie_id or cached["movie_id"]
+            if cache.get(self.entry.category_url, max_age=Config().ep_list_cache_ttl):
+                self._set_ep_list(cached["ep_list"])
+                return self.ep_list
+
         if not self.movie_id:
-            r = requests.get(self.entry.category_url, timeout=2)
+            r = get_session().get(self.entry.category_url, timeout=2)
             self.movie_id = re.search(
                 r'<input.+?value="(\d+)" id="movie_id"', r.text
             ).group(1)
 
-        res = requests.get(
-            "https://ajax.gogocdn.net/ajax/load-list-episode",
+        res = get_session().get(
+            urljoin(Config().gogoanime_ajax_url, "ajax/load-list-episode"),
             params={"ep_start": 0, "ep_end": 9999, "id": self.movie_id},
             timeout=2,
         )
@@ -61,15 +136,26 @@ class epHandler:
                 ).group(0),
                 "link": Config().gogoanime_url + x.find("a")["href"].strip(),
             }
-            for x in BeautifulSoup(res.text, "html.parser").find_all("li")
+            for x in make_soup(res.content).find_all("li")
         ]
 
         ep_list.reverse()
 
-        self.ep_list = ep_list
+        self._set_ep_list(ep_list)
+        cache.set(
+            self.entry.category_url, {"movie_id": self.movie_id, "ep_list": ep_list}
+        )
 
         return ep_list
 
+    def _set_ep_list(self, ep_list):
+        self.ep_list = ep_list
+        self.ep_index = EpisodeList(ep_list)
+
+    def _get_ep_index(self) -> EpisodeList:
+        self._load_eps_list()
+        return self.ep_index
+
     def gen_eplink(self):
         """
         Generate episode url
@@ -78,15 +164,13 @@ class epHandler:
         to
         https://gogoanime.film/hyouka-episode-1
         """
-        ep_list = self._load_eps_list()
-
-        filtered = list(filter(lambda x: x["ep"] == str(self.entry.ep), ep_list))
+        link = self._get_ep_index().link(self.entry.ep)
 
-        if not filtered:
+        if link is None:
             error(f"Episode {self.entry.ep} does not exist.")
             sys.exit()
 
-        self.entry.ep_url = filtered[0]["link"]
+        self.entry.ep_url = link
 
         return self.entry
 
@@ -95,8 +179,8 @@ class epHandler:
         Get List of Special Episodes (.5)
         """
 
-        ep_list = self._load_eps_list()
-        return list(filter(lambda x: re.match(r"^-?\d+(?:\.\d+)$", x["ep"]), ep_list))
+        ep_index = self._get_ep_index()
+        return [{"ep": x, "link": ep_index.link(x)} for x in ep_index.specials]
 
     def get_latest(self):
         """
@@ -149,11 +233,7 @@ class epHandler:
         character even though it is not in the episode list.
         """
 
-        ep_list = self._load_eps_list()
-
-        is_in_list = bool(list(filter(lambda x: ep == x["ep"], ep_list)))
-
-        return is_in_list
+        return ep in self._get_ep_index()
 
     def pick_ep(self):
         """
@@ -240,22 +320,17 @@ class epHandler:
                     error("invalid input")
             elif len(which_episode) == 2:
                 try:
-                    ep_list = self._load_eps_list()
-
-                    first_index = ep_list.index(
-                        list(filter(lambda x: x["ep"] == which_episode[0], ep_list))[0]
-                    )
+                    ep_index = self._get_ep_index()
 
-                    second_index = ep_list.index(
-                        list(filter(lambda x: x["ep"] == which_episode[1], ep_list))[0]
-                    )
+                    if not all(x in ep_index for x in which_episode):
+                        raise ValueError("episode does not exist")
 
-                    ep_list = ep_list[first_index : second_index + 1]
+                    ep_list = ep_index.range(*which_episode)
 
                     if not ep_list:
                         error("invalid input1")
                     else:
-                        return [x["ep"] for x in ep_list]
+                        return ep_list
 
                 except Exception as e:
                     error(f"invalid input {e}")
@@ -288,20 +363,65 @@ class epHandler:
             return self.entry
 
 
+# Query parameters that signed stream urls
+# use to say until when they are valid.
+EXPIRY_PARAMS = ["expires", "expire", "expiry", "exp", "e", "validto"]
+# Signed stream urls live for hours, an expiry further
+# out is no timestamp in seconds (milliseconds, a counter)
+MAX_URL_LIFETIME = 24 * 60 * 60
+
+
+def stream_url_expiry(stream_url: str) -> float:
+    """
+    Get the timestamp after which a cached stream url
+    should not be used anymore. This is read from the
+    signed url if possible (with a minute of margin),
+    otherwise stream_cache_ttl from the config is used.
+    Values more than MAX_URL_LIFETIME ahead are ignored.
+    """
+    params = {k.lower(): v for k, v in parse_qsl(urlparse(stream_url).query)}
+    now = time.time()
+
+    for param in EXPIRY_PARAMS:
+        value = params.get(param, "")
+        if value.isdigit() and now < int(value) <= now + MAX_URL_LIFETIME:
+            return int(value) - 60
+
+    return now + Config().stream_cache_ttl
+
+
+# Aes keys of the embed hosts, {host: (keys, expires)}
+ENC_KEYS_TTL = 6 * 60 * 60
+_enc_keys_cache = {}
+_enc_keys_lock = threading.Lock()
+
+
+@dataclass
+class StreamResult:
+    """
+    Result of videourl.resolve(_many) for one entry,
+    error is set if the entry could not be resolved.
+    """
+
+    entry: Entry
+    error: Optional[BaseException] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
 class videourl:
     """
     Class that fetches embed and
     stream url.
     """
 
-    def __init__(self, entry: Entry, quality) -> None:
+    def __init__(self, entry: Entry, quality, session=None) -> None:
         self.entry = entry
         self.qual = quality.lower().strip("p")
-        self.session = requests.Session()
-        retry = Retry(connect=3, backoff_factor=0.5)
-        adapter = HTTPAdapter(max_retries=retry)
-        self.session.mount("http://", adapter)
-        self.session.mount("https://", adapter)
+        self.session = session or get_session()
+        self._embed_page = None
         self.ajax_url = "/encrypt-ajax.php?"
         self.enc_key_api = "https://raw.githubusercontent.com/justfoolingaround/animdl-provider-benchmarks/master/api/gogoanime.json"
         self.mode = AES.MODE_CBC
@@ -309,6 +429,42 @@ class videourl:
         self.padder = "\x08\x0e\x03\x08\t\x03\x04\t"
         self.pad = lambda s: s + chr(len(s) % 16) * (16 - len(s) % 16)
 
+    @classmethod
+    def resolve(cls, entry: Entry, quality) -> StreamResult:
+        """
+        Resolve the stream url of a copy of entry, an error
+        ends up in the result instead of being raised.
+        """
+        entry = copy(entry)
+        try:
+            url_class = cls(entry, quality)
+            url_class.stream_url()
+            return StreamResult(url_class.get_entry())
+        except (Exception, SystemExit) as e:
+            # response_err and loc_err exit on failure
+            return StreamResult(entry, e)
+
+    @classmethod
+    def resolve_many(
+        cls, entries: List[Entry], quality, workers: int = None
+    ) -> List[StreamResult]:
+        """
+        Resolve the stream urls of many entries
+        concurrently over the shared session. The entries
+        need the same fields as for stream_url() and are not modified,
+        the results are returned in the order of the
+        input, an entry that fails does not stop the others.
+        """
+        if not entries:
+            return []
+
+        if workers is None:
+            workers = Config().stream_resolve_workers
+
+        workers = max(1, min(workers, len(entries)))
+        with ThreadPoolExecutor(workers) as pool:
+            return list(pool.map(lambda entry: cls.resolve(entry, quality), entries))
+
     def get_entry(self) -> Entry:
         """
         Returns the entry with stream and emebed url fields filled
@@ -319,32 +475,61 @@ class videourl:
     def embed_url(self):
         r = self.session.get(self.entry.ep_url)
         response_err(r, self.entry.ep_url)
-        soup = BeautifulSoup(r.content, "html.parser")
+        soup = make_soup(r.content, EMBED_LINKS)
         link = soup.find("a", {"class": "active", "rel": "1"})
         loc_err(link, self.entry.ep_url, "embed-url")
-        self.entry.embed_url = (
-            f'https:{link["data-video"]}'
-            if not link["data-video"].startswith("https:")
-            else link["data-video"]
-        )
+        # data-video is usually protocol-relative (//host/...)
+        self.entry.embed_url = urljoin(self.entry.ep_url, link["data-video"])
+
+    def embed_page(self):
+        """
+        Fetch the embed page, it is only downloaded
+        once per instance as both the encryption keys
+        and the token are read from it.
+        """
+        if self._embed_page is None:
+            r = self.session.get(self.entry.embed_url)
+            response_err(r, self.entry.embed_url)
+            self._embed_page = r.text
+
+        return self._embed_page
+
+    def get_enc_keys(self, refresh=False):
+        """
+        Get the aes keys for the host of the embed url,
+        keys are cached per host for ENC_KEYS_TTL seconds,
+        pass refresh to read them from the embed page again.
+        """
+        host = urlparse(self.entry.embed_url).netloc
 
-    @functools.lru_cache()
-    def get_enc_keys(self):
-        page = self.session.get(self.entry.embed_url).text
+        if not refresh:
+            with _enc_keys_lock:
+                cached = _enc_keys_cache.get(host)
+            if cached and cached[1] > time.time():
+                return cached[0]
 
-        keys = re.findall(r"(?:container|videocontent)-(\d+)", page)
+        keys = re.findall(r"(?:container|videocontent)-(\d+)", self.embed_page())
 
         if not keys:
             return {}
 
         key, iv, second_key = keys
 
-        return {
+        enc_keys = {
             "key": key.encode(),
             "second_key": second_key.encode(),
             "iv": iv.encode(),
         }
 
+        with _enc_keys_lock:
+            _enc_keys_cache[host] = (enc_keys, time.time() + ENC_KEYS_TTL)
+
+        return enc_keys
+
+    def invalidate_enc_keys(self):
+        with _enc_keys_lock:
+            _enc_keys_cache.pop(urlparse(self.entry.embed_url).netloc, None)
+
     def aes_encrypt(self, data, key, iv):
         return base64.b64encode(
             AES.new(key, self.mode, iv=iv).encrypt(self.pad(data).encode())
@@ -358,32 +543,25 @@ class videourl:
         )
 
     def get_data(self):
-        r = self.session.get(self.entry.embed_url)
-        soup = BeautifulSoup(r.content, "html.parser")
+        soup = make_soup(self.embed_page(), EMBED_TOKEN)
         crypto = soup.find("script", {"data-name": "episode"})
         loc_err(crypto, self.entry.embed_url, "token")
         return crypto["data-value"]
 
-    def stream_url(self):
+    def get_sources(self, enc_keys):
         """
-        Fetches stream url and executes
-        quality function.
+        Request and decrypt the json
+        with the sources of the stream.
         """
-        if not self.entry.embed_url:
-            self.embed_url()
-
-        enc_keys = self.get_enc_keys()
-
         parsed = urlparse(self.entry.embed_url)
-        self.ajax_url = parsed.scheme + "://" + parsed.netloc + self.ajax_url
+        ajax_url = parsed.scheme + "://" + parsed.netloc + self.ajax_url
 
         data = self.aes_decrypt(
             self.get_data(), enc_keys["key"], enc_keys["iv"]
         ).decode()
         data = dict(parse_qsl(data))
 
-        id = urlparse(self.entry.embed_url).query
-        id = dict(parse_qsl(id))["id"]
+        id = dict(parse_qsl(parsed.query))["id"]
         enc_id = self.aes_encrypt(id, enc_keys["key"], enc_keys["iv"]).decode()
         data.update(id=enc_id)
 
@@ -393,41 +571,80 @@ class videourl:
         }
 
         r = self.session.post(
-            self.ajax_url + urlencode(data) + f"&alias={id}",
+            ajax_url + urlencode(data) + f"&alias={id}",
             headers=headers,
         )
 
         response_err(r, r.url)
 
-        json_resp = json.loads(
+        return json.loads(
             self.aes_decrypt(
                 r.json().get("data"), enc_keys["second_key"], enc_keys["iv"]
             )
         )
 
+    def stream_url(self, use_cache=True):
+        """
+        Fetches stream url and executes
+        quality function. Resolved streams are
+        cached until the stream url expires,
+        pass use_cache=False (or set stream_cache_ttl
+        to 0) to always resolve.
+        """
+        cache_key = f"{self.entry.ep_url}|{self.qual}"
+        cached_streams = Config().stream_cache_ttl > 0 and self.entry.ep_url
+        if use_cache and cached_streams:
+            cached = stream_cache().get(cache_key)
+            if cached:
+                self.entry.embed_url = cached["embed_url"]
+                self.entry.stream_url = cached["stream_url"]
+                self.entry.quality = cached["quality"]
+                self.entry.mirror_urls = cached.get("mirror_urls", [])
+                return
+
+        if not self.entry.embed_url:
+            self.embed_url()
+
+        try:
+            json_resp = self.get_sources(self.get_enc_keys())
+        except ValueError:
+            # Decryption failed, the cached keys
+            # might be outdated, read them again.
+            self.invalidate_enc_keys()
+            json_resp = self.get_sources(self.get_enc_keys(refresh=True))
+
         source_data = [x for x in json_resp["source"]]
-        self.quality(source_data)
+        self.quality(source_data, json_resp.get("source_bk") or [])
+
+        if cached_streams:
+            stream_cache().set(
+                cache_key,
+                {
+                    "embed_url": self.entry.embed_url,
+                    "stream_url": self.entry.stream_url,
+                    "quality": self.entry.quality,
+                    "mirror_urls": self.entry.mirror_urls,
+                },
+                expires=stream_url_expiry(self.entry.stream_url),
+            )
 
-    def quality(self, json_data):
+    def quality(self, json_data, backup_data=()):
         """
         Get quality options from
         JSON repons and change
         stream url to the either
         the quality option that was picked,
         or the best one available.
+        The other sources (and backup sources)
+        with the same quality and type become
+        the mirrors of the stream.
         """
         self.entry.quality = ""
 
-        streams = []
-        for i in json_data:
-            if "m3u8" in i["file"] or i["type"] == "hls":
-                type = "hls"
-            else:
-                type = "mp4"
-
-            quality = i["label"].replace(" P", "").lower()
-
-            streams.append({"file": i["file"], "type": type, "quality": quality})
+        streams = self._streams(json_data)
+        backups = self._streams(backup_data)
+        if not streams:
+            streams = backups
 
         filtered_q_user = list(filter(lambda x: x["quality"] == self.qual, streams))
 
@@ -443,10 +660,35 @@ class videourl:
         self.entry.quality = stream["quality"]
         self.entry.stream_url = stream["file"]
 
+        self.entry.mirror_urls = []
+        for i in streams + backups:
+            if (
+                i["quality"] == stream["quality"]
+                and i["type"] == stream["type"]
+                and i["file"] != stream["file"]
+                and i["file"] not in self.entry.mirror_urls
+            ):
+                self.entry.mirror_urls.append(i["file"])
+
+    @staticmethod
+    def _streams(json_data):
+        streams = []
+        for i in json_data:
+            if "m3u8" in i["file"] or i["type"] == "hls":
+                type = "hls"
+            else:
+                type = "mp4"
+
+            quality = i["label"].replace(" P", "").lower()
+
+            streams.append({"file": i["file"], "type": type, "quality": quality})
+
+        return streams
+
 
 def extract_m3u8_streams(uri):
     if re.match(r"https?://", uri):
-        resp = requests.get(uri)
+        resp = get_session().get(uri)
         resp.raise_for_status()
         raw_content = resp.content.decode(resp.encoding or "utf-8")
         base_uri = urljoin(uri, ".")
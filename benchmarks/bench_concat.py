@@ -0,0 +1,194 @@
+"""
+Compares ways of putting hls segments together into one file:
+concatenating segment files (buffered copy, copy_file_range,
+sendfile, reflinks) against appending the segments in order
+while they download, which is what anipy_cli does (OrderedWriter).
+
+Usage:
+    python benchmarks/bench_concat.py [--size-mb 2048] [--segment-kb 2048] [--dir DIR]
+
+Run it with --dir on the file system to compare (e.g. Btrfs or
+XFS for reflinks), it needs about three times --size-mb free.
+Segment files are evicted from the page cache before every
+method, where the system allows it, and every method ends
+with an fsync of the result.
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+from typing import Callable, List, Optional
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from anipy_cli.ordered_writer import OrderedWriter
+
+# From linux/fs.h, clone a range of one file into another
+FICLONERANGE = 0x4020940D
+
+
+def evict(paths: List[Path]) -> None:
+    if not hasattr(os, "posix_fadvise"):
+        return
+
+    for path in paths:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+
+
+def preallocate(fd: int, size: int) -> None:
+    if hasattr(os, "posix_fallocate"):
+        os.posix_fallocate(fd, 0, size)
+
+
+def concat_copyfileobj(segments: List[Path], target: Path, total: int) -> None:
+    with target.open("wb") as out_file:
+        for segment in segments:
+            with segment.open("rb") as in_file:
+                shutil.copyfileobj(in_file, out_file)
+        out_file.flush()
+        os.fsync(out_file.fileno())
+
+
+def _concat_kernel(copy: Callable[[int, int, int, int], int]):
+    def concat(segments: List[Path], target: Path, total: int) -> None:
+        out_fd = os.open(target, os.O_WRONLY | os.O_CREAT | os.O_TRUNC)
+        try:
+            preallocate(out_fd, total)
+            offset = 0
+            for segment in segments:
+                in_fd = os.open(segment, os.O_RDONLY)
+                try:
+                    left = os.fstat(in_fd).st_size
+                    while left:
+                        copied = copy(in_fd, out_fd, offset, left)
+                        if copied == 0:
+                            raise OSError(f"{segment} ended early")
+                        offset += copied
+                        left -= copied
+                finally:
+                    os.close(in_fd)
+            os.fsync(out_fd)
+        finally:
+            os.close(out_fd)
+
+    return concat
+
+
+def _copy_file_range(in_fd: int, out_fd: int, offset: int, left: int) -> int:
+    return os.copy_file_range(in_fd, out_fd, left, offset_dst=offset)
+
+
+def _sendfile(in_fd: int, out_fd: int, offset: int, left: int) -> int:
+    os.lseek(out_fd, offset, os.SEEK_SET)
+    return os.sendfile(out_fd, in_fd, None, left)
+
+
+def _reflink(in_fd: int, out_fd: int, offset: int, left: int) -> int:
+    import fcntl
+    import struct
+
+    # struct file_clone_range: src_fd, src_offset, src_length, dest_offset
+    fcntl.ioctl(out_fd, FICLONERANGE, struct.pack("qQQQ", in_fd, 0, left, offset))
+    return left
+
+
+def append_from_memory(data: bytes, count: int, target: Path) -> None:
+    """No segment files, the segments go from memory to the file in order"""
+    names = [f"{index}.ts" for index in range(count)]
+    writer = OrderedWriter(target, names)
+    for index in range(count):
+        writer.put(index, data)
+    os.fsync(writer._file.fileno())
+    writer.close()
+
+
+def write_segments(data: bytes, count: int, folder: Path) -> List[Path]:
+    segments = []
+    for index in range(count):
+        path = folder / f"{index}.ts"
+        with path.open("wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        segments.append(path)
+
+    return segments
+
+
+def timed(func: Callable[[], None]) -> Optional[float]:
+    start = time.perf_counter()
+    try:
+        func()
+    except OSError as e:
+        print(f"{'':<10}{e.strerror or e}", end=" ")
+        return None
+
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--size-mb", type=int, default=2048)
+    parser.add_argument(
+        "--segment-kb",
+        type=int,
+        default=2048,
+        help="size of a segment, a multiple of 4 keeps them block aligned for reflinks",
+    )
+    parser.add_argument("--dir", type=Path, default=None)
+    args = parser.parse_args()
+
+    data = os.urandom(args.segment_kb * 1024)
+    count = max(args.size_mb * 1024 // args.segment_kb, 1)
+    total = count * len(data)
+    folder = Path(tempfile.mkdtemp(prefix="anipy-concat-", dir=args.dir))
+    target = folder / "merged.ts"
+
+    try:
+        print(f"{count} segments of {args.segment_kb}KiB in {folder}\n")
+        (folder / "parts").mkdir()
+        start = time.perf_counter()
+        segments = write_segments(data, count, folder / "parts")
+        write_time = time.perf_counter() - start
+
+        methods = [
+            ("copyfileobj", concat_copyfileobj),
+            ("sendfile", _concat_kernel(_sendfile)),
+        ]
+        if hasattr(os, "copy_file_range"):
+            methods.append(("copy_file_range", _concat_kernel(_copy_file_range)))
+        if sys.platform == "linux":
+            methods.append(("reflink (FICLONERANGE)", _concat_kernel(_reflink)))
+
+        print(f"{'method':<40}{'seconds':>10}{'GiB/s':>10}")
+        print(f"{'writing the segment files':<40}{write_time:>10.2f}")
+        for name, concat in methods:
+            evict(segments)
+            print(f"{'segment files + ' + name:<40}", end="")
+            took = timed(lambda: concat(segments, target, total))
+            if took is None:
+                print()
+            else:
+                print(f"{took:>10.2f}{total / took / 1024 ** 3:>10.2f}")
+            target.unlink(missing_ok=True)
+
+        shutil.rmtree(folder / "parts")
+        took = timed(lambda: append_from_memory(data, count, target))
+        print(
+            f"{'append from memory (OrderedWriter)':<40}{took:>10.2f}"
+            f"{total / took / 1024 ** 3:>10.2f}"
+        )
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
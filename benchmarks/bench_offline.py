@@ -0,0 +1,244 @@
+"""
+Times the scrapers and the downloader end to end against
+the local fixture server, without touching the network.
+
+Every benchmark starts cold (caches cleared) unless its name
+says otherwise. The results are written as json, so runs
+of different commits can be compared:
+
+    python benchmarks/bench_offline.py -o before.json
+    git checkout other-commit
+    python benchmarks/bench_offline.py -o after.json --compare before.json
+"""
+
+import os
+import sys
+import json
+import shutil
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from contextlib import redirect_stdout, redirect_stderr
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).parent
+sys.path.insert(0, str(BENCH_DIR.parent))
+
+from server import FixtureServer
+from fixtures import generate
+
+
+def setup_home(base_url: str) -> Path:
+    """
+    Point anipy-cli to a temporary config, this has to
+    happen before anipy_cli is imported, as the config
+    is read (and cached) on import.
+    """
+    home = Path(tempfile.mkdtemp(prefix="anipy-bench-"))
+    os.environ["HOME"] = str(home)
+    os.environ["USERPROFILE"] = str(home)
+
+    import yaml
+
+    # Same as Config._get_config_path(), but without importing anipy_cli
+    if sys.platform == "win32":
+        config_path = home / "AppData" / "Local" / "anipy-cli"
+    else:
+        config_path = home / ".config" / "anipy-cli"
+
+    config_path.mkdir(parents=True)
+    with (config_path / "config.yaml").open("w") as f:
+        yaml.dump(
+            {
+                "gogoanime_url": base_url,
+                "gogoanime_ajax_url": base_url,
+                "download_folder_path": str(home / "dls"),
+                "user_files_path": str(home / "user_files"),
+            },
+            f,
+        )
+
+    return home
+
+
+def clear_caches():
+    from anipy_cli import cache, url_handler
+
+    cache.ep_list_cache().clear()
+    cache.stream_cache().clear()
+    url_handler._enc_keys_cache.clear()
+
+
+def benchmarks(base_url: str):
+    from anipy_cli import Entry, query, epHandler, videourl, download
+    from anipy_cli.ts_verify import verify_ts
+
+    category_url = f"{base_url}category/{generate.SHOW}"
+    ep_url = f"{base_url}{generate.SHOW}-episode-1"
+
+    def query_get_links():
+        query(generate.SHOW, Entry()).get_links()
+
+    def ep_get_latest():
+        epHandler(Entry(category_url=category_url)).get_latest()
+
+    def stream_url():
+        videourl(Entry(ep_url=ep_url), "best").stream_url()
+
+    def download_hls():
+        url_class = videourl(Entry(show_name=generate.SHOW_NAME, ep_url=ep_url), "best")
+        url_class.stream_url()
+        dl_class = download(url_class.get_entry(), "best")
+        shutil.rmtree(dl_class.dl_path, ignore_errors=True)
+        dl_class.download()
+
+    def download_mp4():
+        entry = Entry(
+            show_name=generate.SHOW_NAME,
+            ep_url=ep_url,
+            embed_url=ep_url,
+            stream_url=f"{base_url}mp4/ep.1.mp4",
+            ep=1,
+            quality="720p",
+        )
+        dl_class = download(entry, "best")
+        shutil.rmtree(dl_class.dl_path, ignore_errors=True)
+        dl_class.download()
+
+    def verify_segments():
+        for data in segments:
+            verify_ts(data)
+
+    segments = [
+        path.read_bytes() for path in sorted(generate.FIXTURES.glob("hls/*.ts"))
+    ]
+
+    yield "query.get_links", query_get_links, True
+    yield "epHandler.get_latest", ep_get_latest, True
+    yield "epHandler.get_latest (cached)", ep_get_latest, False
+    yield "videourl.stream_url", stream_url, True
+    yield "videourl.stream_url (cached)", stream_url, False
+    if (generate.FIXTURES / "hls").is_dir():
+        yield "download (hls)", download_hls, True
+    if (generate.FIXTURES / "mp4").is_dir():
+        yield "download (mp4)", download_mp4, True
+    if segments:
+        yield "verify_ts (all hls fixture parts)", verify_segments, False
+
+
+def run(name, func, cold, rounds, server):
+    times = []
+    requests = server.requests
+    for _ in range(rounds):
+        if cold:
+            clear_caches()
+
+        with open(os.devnull, "w") as devnull:
+            with redirect_stdout(devnull), redirect_stderr(devnull):
+                start = time.perf_counter()
+                try:
+                    func()
+                except (Exception, SystemExit) as e:
+                    # anipy-cli exits on errors, keep going with the other benchmarks
+                    return {"error": str(e).strip() or type(e).__name__}
+                times.append(time.perf_counter() - start)
+
+    return {
+        "rounds": rounds,
+        "min": min(times),
+        "median": statistics.median(times),
+        "mean": statistics.mean(times),
+        "requests_per_round": (server.requests - requests) / rounds,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BENCH_DIR,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+    except FileNotFoundError:
+        return None
+
+
+def compare(results: dict, other_file: Path):
+    other = json.loads(other_file.read_text())
+    print(f"\n{'benchmark':<32}{'before':>10}{'after':>10}{'change':>10}")
+    for name, res in results["results"].items():
+        if "error" in res or "error" in other["results"].get(name, {"error": 1}):
+            continue
+
+        before = other["results"][name]["median"]
+        change = (res["median"] - before) / before * 100
+        print(
+            f"{name:<32}{before * 1000:>8.1f}ms{res['median'] * 1000:>8.1f}ms"
+            f"{change:>+9.1f}%"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("-n", "--rounds", type=int, default=5)
+    parser.add_argument(
+        "--latency", type=float, default=20, help="latency per request in ms"
+    )
+    parser.add_argument("-o", "--output", type=Path, help="write json results here")
+    parser.add_argument("--compare", type=Path, help="json results to compare with")
+    args = parser.parse_args()
+
+    if not (generate.FIXTURES / "hls").is_dir():
+        generate.hls_stream()
+    if not (generate.FIXTURES / "mp4").is_dir():
+        generate.mp4_stream()
+
+    server = FixtureServer(latency=args.latency / 1000).start()
+    home = setup_home(server.base_url)
+
+    from anipy_cli import soup
+
+    results = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "html_backend": soup.get_backend(),
+        "latency_ms": args.latency,
+        "results": {},
+    }
+
+    try:
+        for name, func, cold in benchmarks(server.base_url):
+            res = run(name, func, cold, args.rounds, server)
+            results["results"][name] = res
+            if "error" in res:
+                print(
+                    f"{name:<32}failed: {res['error'].splitlines()[-1]}",
+                    file=sys.stderr,
+                )
+                continue
+            print(
+                f"{name:<32}median {res['median'] * 1000:>9.1f}ms  "
+                f"min {res['min'] * 1000:>9.1f}ms  "
+                f"requests {res['requests_per_round']:>6.1f}",
+                file=sys.stderr,
+            )
+    finally:
+        server.shutdown()
+        shutil.rmtree(home, ignore_errors=True)
+
+    output = json.dumps(results, indent=4)
+    if args.output:
+        args.output.write_text(output)
+    else:
+        print(output)
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
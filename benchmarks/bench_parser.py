@@ -0,0 +1,71 @@
+"""
+Compares how long parsing the scraped pages takes with
+the old setup (full tree with html.parser) and with
+anipy_cli.soup (lxml if installed, only the needed parts).
+
+Usage:
+    python benchmarks/bench_parser.py [-n ROUNDS]
+"""
+
+import sys
+import argparse
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from anipy_cli import soup
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+PAGES = [
+    ("search", "search_1.html", soup.SEARCH_RESULTS),
+    ("category", "category.html", soup.ANIME_INFO),
+    ("episode list", "load_list_episode.html", None),
+    ("episode", "episode.html", soup.EMBED_LINKS),
+    ("embed", "embed.html", soup.EMBED_TOKEN),
+    ("season", "season.html", soup.SEASON_LIST),
+]
+
+
+def bench(markup: bytes, backend: str, only, rounds: int) -> float:
+    """Average seconds per parse"""
+    return (
+        timeit.timeit(
+            lambda: soup.make_soup(markup, only, backend=backend), number=rounds
+        )
+        / rounds
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("-n", "--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    backends = ["html.parser"] + (["lxml"] if soup.HAS_LXML else [])
+    print(f"selected backend: {soup.get_backend()}, rounds: {args.rounds}\n")
+    print(f"{'page':<14}{'setup':<26}{'ms/page':>10}{'speedup':>10}")
+
+    for name, fname, only in PAGES:
+        markup = (FIXTURES / fname).read_bytes()
+        # warm up
+        soup.make_soup(markup, only)
+
+        baseline = None
+        for backend in backends:
+            for strained in [False, True]:
+                if strained and only is None:
+                    continue
+
+                took = bench(markup, backend, only if strained else None, args.rounds)
+                baseline = baseline or took
+                setup = backend + (" + strainer" if strained else "")
+                print(
+                    f"{name:<14}{setup:<26}{took * 1000:>10.2f}{baseline / took:>9.1f}x"
+                )
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,380 @@
+"""
+Generates the html fixtures used by the benchmarks.
+The pages follow the markup of the gogoanime pages
+anipy-cli scrapes, including the header, sidebar and
+scripts around the parts that are actually used,
+so that parsing them costs about as much as parsing
+the real pages.
+
+The hls stream (hls/) and the mp4 file (mp4/) are encoded
+with ffmpeg and not checked in, the other fixtures are.
+
+Run it from anywhere, the files are written next to it:
+    python benchmarks/fixtures/generate.py
+"""
+
+import base64
+import json
+import shutil
+import subprocess
+from pathlib import Path
+
+from Cryptodome.Cipher import AES
+
+FIXTURES = Path(__file__).parent
+
+# Keys that the embed page exposes, same format as the real ones
+KEY = b"37911490979715163134003223491201"
+IV = b"3134003223491201"
+SECOND_KEY = b"54674138327930866480207815084989"
+
+# Replaced with the address of the fixture server when served
+EMBED_HOST = "//embed.gogo.local"
+
+SHOW = "hyouka"
+SHOW_NAME = "Hyouka"
+EPISODES = 1000
+SEARCH_PAGES = 8
+
+
+def aes_encrypt(data: str, key: bytes) -> str:
+    pad = lambda s: s + chr(len(s) % 16) * (16 - len(s) % 16)
+    cipher = AES.new(key, AES.MODE_CBC, iv=IV)
+    return base64.b64encode(cipher.encrypt(pad(data).encode())).decode()
+
+
+def page(title: str, content: str) -> str:
+    nav = "\n".join(
+        f'<li class="menu_{i}"><a href="/genre/genre-{i}" title="Genre {i}">Genre {i}</a></li>'
+        for i in range(45)
+    )
+    recent = "\n".join(f"""<li>
+  <a href="/recent-show-{i}-episode-{i % 12 + 1}" title="Recent Show {i}">
+    <div class="thumbnail-recent" style="background: url('https://gogocdn.net/cover/recent-show-{i}.png');"></div>
+    Recent Show {i}
+  </a>
+  <a href="/recent-show-{i}-episode-{i % 12 + 1}" title="Recent Show {i}"><p class="time_2">Episode {i % 12 + 1}</p></a>
+</li>""" for i in range(60))
+    scripts = "\n".join(
+        f'<script type="text/javascript">var _cfg_{i} = {{"id": {i}, "ads": false, "slot": "side-{i}"}};'
+        f"(function(){{var s=document.createElement('script');s.async=true;}})();</script>"
+        for i in range(25)
+    )
+    return f"""<!DOCTYPE html>
+<html lang="en-US">
+<head>
+<meta charset="UTF-8">
+<title>{title} at Gogoanime</title>
+<meta name="robots" content="index, follow">
+<meta name="description" content="{title} at Gogoanime">
+<link rel="stylesheet" type="text/css" href="https://gogoanime3.co/css/style.css?v=7.1">
+{scripts}
+</head>
+<body>
+<div class="clr"></div>
+<div id="wrapper_inside">
+<div id="wrapper">
+<div id="wrapper_bg">
+<section class="headnav">
+<nav class="menu_top"><ul>{nav}</ul></nav>
+</section>
+<section class="content">
+<section class="content_left">
+{content}
+</section>
+<section class="content_right">
+<div class="main_body"><div class="recent"><div class="added_series_body popular"><ul>
+{recent}
+</ul></div></div></div>
+</section>
+</section>
+<footer><div class="menu_bottom">{nav}</div></footer>
+</div></div></div>
+</body>
+</html>
+"""
+
+
+def search_page(page_nr: int) -> str:
+    results = "\n".join(f"""<li>
+  <div class="img">
+    <a href="/category/{SHOW}{'-' + str(n) if n else ''}" title="{SHOW_NAME}{' ' + str(n) if n else ''}">
+      <img src="https://gogocdn.net/cover/{SHOW}-{n}.png" alt="{SHOW_NAME}" />
+    </a>
+  </div>
+  <p class="name"><a href="/category/{SHOW}{'-' + str(n) if n else ''}" title="{SHOW_NAME}{' ' + str(n) if n else ''}">{SHOW_NAME}{' ' + str(n) if n else ''}{' (Dub)' if n % 3 == 2 else ''}</a></p>
+  <p class="released">Released: {2000 + n % 24}</p>
+</li>""" for n in range((page_nr - 1) * 20, page_nr * 20))
+    pagination = "\n".join(
+        f"<li{' class=selected' if i == page_nr else ''}><a href='?keyword={SHOW}&page={i}' data-page='{i}'>{i}</a></li>"
+        for i in range(1, SEARCH_PAGES + 1)
+    )
+    return page(
+        f"Search {SHOW}",
+        f"""<div class="main_body">
+<div class="anime_name anime_list"><div class="anime_name_pagination"><div class="pagination">
+<ul class='pagination-list'>{pagination}</ul>
+</div></div></div>
+<div class="last_episodes"><ul class="items">
+{results}
+</ul></div>
+</div>""",
+    )
+
+
+def category_page() -> str:
+    genres = ", ".join(
+        f'<a href="/genre/{g.lower()}" title="{g}">{g}</a>'
+        for g in ["Mystery", "School", "Slice of Life"]
+    )
+    return page(
+        SHOW_NAME,
+        f"""<div class="main_body">
+<div class="anime_info_body"><div class="anime_info_body_bg">
+<img src="https://gogocdn.net/images/anime/{SHOW}.jpg">
+<h1>{SHOW_NAME}</h1>
+<p></p>
+<p class="type"><span>Type: </span>
+<a href="/sub-category/summer-2012-anime" title="Summer 2012 Anime">Summer 2012 Anime</a>
+</p>
+<p class="type"><span>Plot Summary: </span>Energy-conservative high school student Houtarou Oreki ends up with more than he bargained for when he signs up for the Classics Club at his sister's behest.</p>
+<p class="type"><span>Genre: </span>{genres}</p>
+<p class="type"><span>Released: </span>2012</p>
+<p class="type"><span>Status: </span>
+<a href="/completed-anime.html" title="Completed Anime">Completed</a>
+</p>
+<p class="type"><span>Other name: </span>Hyou-ka: You can't escape, Hyouka: Forbidden Secrets</p>
+</div></div>
+<div class="anime_info_episodes"><h2>{SHOW_NAME}</h2>
+<div class="anime_info_episodes_next">
+<input type="hidden" value="1179" id="movie_id" class="movie_id">
+<input type="hidden" value="{SHOW}" id="default_ep" class="default_ep">
+<input type="hidden" value="{SHOW}" id="alias_anime" class="alias_anime">
+</div></div>
+<div class="anime_video_body"><ul id="episode_page">
+<li><a href="#" class="active" ep_start="0" ep_end="{EPISODES}">0-{EPISODES}</a></li>
+</ul></div>
+</div>""",
+    )
+
+
+def episode_list() -> str:
+    items = "\n".join(f"""<li>
+  <a href=" /{SHOW}-episode-{i}">
+    <div class="name"><span>EP</span> {i}</div>
+    <div class="vien"></div>
+    <div class="cate">SUB</div>
+  </a>
+</li>""" for i in range(EPISODES, 0, -1))
+    return f'<ul id="episode_related">\n{items}\n</ul>\n'
+
+
+def episode_page(embed_host: str) -> str:
+    servers = "\n".join(f"""<li class="server-{n}">
+  <a href="#" rel="{n}" data-video="{embed_host}/embed-{n}.php?id=MTE3OTI=&title={SHOW_NAME}+Episode+1">
+    <i class="iconlayer-{n}"></i>Server {n}<span>Choose this server</span>
+  </a>
+</li>""" for n in range(2, 9))
+    return page(
+        f"{SHOW_NAME} Episode 1",
+        f"""<div class="main_body">
+<div class="anime_video_body">
+<h1>{SHOW_NAME} Episode 1 English Subbed</h1>
+<div class="anime_muti_link"><ul>
+<li class="anime">
+  <a href="#" class="active" rel="1" data-video="{embed_host}/streaming.php?id=MTE3OTI=&title={SHOW_NAME}+Episode+1">
+    <i class="iconlayer-anime"></i>Gogo server<span>Choose this server</span>
+  </a>
+</li>
+{servers}
+</ul></div>
+</div>
+</div>""",
+    )
+
+
+def embed_page() -> str:
+    token = aes_encrypt(
+        f"id=MTE3OTI=&title={SHOW_NAME}+Episode+1&typesub=SUB&sub=&cover=", KEY
+    )
+    players = "\n".join(
+        f'<script type="text/javascript">jwplayer_cfg_{i} = {{"skin": "seven", "i": {i}}};</script>'
+        for i in range(20)
+    )
+    return f"""<!DOCTYPE html>
+<html>
+<head>
+<title>{SHOW_NAME} Episode 1</title>
+{players}
+<script type="text/javascript" src="/js/jquery.min.js" data-name="episode" data-value="{token}"></script>
+</head>
+<body class="container-{KEY.decode()}">
+<div class="wrapper container-{IV.decode()}">
+<div class="videocontent videocontent-{SECOND_KEY.decode()}">
+<div id="myVideo"></div>
+</div></div>
+</body>
+</html>
+"""
+
+
+def season_page() -> str:
+    items = "\n".join(f"""<li>
+  <div class="img"><a href="/category/summer-show-{i}" title="Summer Show {i}"><img src="https://gogocdn.net/cover/summer-show-{i}.png"></a></div>
+  <p class="name"><a href="/category/summer-show-{i}" title="Summer Show {i}">Summer Show {i}</a></p>
+  <p class="released">Released: 2012</p>
+</li>""" for i in range(60))
+    return page(
+        "Summer 2012 Anime",
+        f"""<div class="main_body"><div class="last_episodes"><ul class="items">
+{items}
+</ul></div></div>""",
+    )
+
+
+def ajax_response(stream_base: str) -> str:
+    """
+    Answer of encrypt-ajax.php, this is built when it is served
+    as the stream urls have to point to the fixture server.
+    """
+    sources = {
+        "source": [
+            {"file": f"{stream_base}/ep.1.m3u8", "label": "hls P", "type": "hls"}
+        ],
+        "source_bk": [
+            {"file": f"{stream_base}/ep.1.m3u8", "label": "hls P", "type": "hls"}
+        ],
+        "track": [],
+        "advertising": [],
+        "linkiframe": "",
+    }
+    return json.dumps({"data": aes_encrypt(json.dumps(sources), SECOND_KEY)})
+
+
+def master_playlist() -> str:
+    return """#EXTM3U
+#EXT-X-VERSION:3
+#EXT-X-STREAM-INF:BANDWIDTH=1200000,RESOLUTION=640x360,NAME="360p"
+ep.1.360.m3u8
+#EXT-X-STREAM-INF:BANDWIDTH=600000,RESOLUTION=320x180,NAME="180p"
+ep.1.180.m3u8
+"""
+
+
+def find_ffmpeg():
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg:
+        return ffmpeg
+
+    try:
+        import imageio_ffmpeg
+
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except (ImportError, RuntimeError):
+        return None
+
+
+def hls_stream(segments=60):
+    """
+    Encode a test video into a hls stream (one second segments),
+    this needs ffmpeg and is not checked in because of its size.
+    """
+    ffmpeg = find_ffmpeg()
+    if ffmpeg is None:
+        print("ffmpeg not found, skipping hls fixtures")
+        return
+
+    hls_dir = FIXTURES / "hls"
+    hls_dir.mkdir(exist_ok=True)
+    for height in [360, 180]:
+        subprocess.run(
+            [
+                ffmpeg,
+                "-y",
+                "-loglevel",
+                "error",
+                "-f",
+                "lavfi",
+                "-i",
+                f"testsrc2=size={height * 16 // 9}x{height}:rate=25",
+                "-f",
+                "lavfi",
+                "-i",
+                "sine=frequency=440:sample_rate=44100",
+                "-t",
+                str(segments),
+                "-c:v",
+                "libx264",
+                "-preset",
+                "ultrafast",
+                "-g",
+                "25",
+                "-c:a",
+                "aac",
+                "-f",
+                "hls",
+                "-hls_time",
+                "1",
+                "-hls_list_size",
+                "0",
+                "-hls_segment_filename",
+                str(hls_dir / f"{height}-%03d.ts"),
+                str(hls_dir / f"ep.1.{height}.m3u8"),
+            ],
+            check=True,
+        )
+
+    (hls_dir / "ep.1.m3u8").write_text(master_playlist())
+
+
+def mp4_stream(seconds=60):
+    """
+    Encode a test video into a mp4 file (about 30 MB), this
+    needs ffmpeg and is not checked in because of its size.
+    """
+    ffmpeg = find_ffmpeg()
+    if ffmpeg is None:
+        print("ffmpeg not found, skipping mp4 fixture")
+        return
+
+    mp4_dir = FIXTURES / "mp4"
+    mp4_dir.mkdir(exist_ok=True)
+    subprocess.run(
+        [
+            ffmpeg,
+            "-y",
+            "-loglevel",
+            "error",
+            "-f",
+            "lavfi",
+            "-i",
+            "testsrc2=size=1280x720:rate=25",
+            "-t",
+            str(seconds),
+            "-c:v",
+            "libx264",
+            "-preset",
+            "ultrafast",
+            "-b:v",
+            "4M",
+            str(mp4_dir / "ep.1.mp4"),
+        ],
+        check=True,
+    )
+
+
+def main():
+    for page_nr in range(1, SEARCH_PAGES + 1):
+        (FIXTURES / f"search_{page_nr}.html").write_text(search_page(page_nr))
+
+    (FIXTURES / "category.html").write_text(category_page())
+    (FIXTURES / "load_list_episode.html").write_text(episode_list())
+    (FIXTURES / "episode.html").write_text(episode_page(EMBED_HOST))
+    (FIXTURES / "embed.html").write_text(embed_page())
+    (FIXTURES / "season.html").write_text(season_page())
+    hls_stream()
+    mp4_stream()
+
+
+if __name__ == "__main__":
+    main()
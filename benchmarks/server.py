@@ -0,0 +1,142 @@
+"""
+Local stand-in for gogoanime, its ajax host, the embed
+host and the stream cdn, serving the files in fixtures/.
+
+Can also be started on its own to poke at it:
+    python benchmarks/server.py [--port PORT] [--latency MS]
+"""
+
+import re
+import time
+import argparse
+import threading
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from fixtures import generate
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.route()
+
+    def do_POST(self):
+        self.route()
+
+    def route(self):
+        self.server.count_request()
+        time.sleep(self.server.latency)
+
+        url = urlparse(self.path)
+        path = re.sub(r"/+", "/", url.path)
+        query = parse_qs(url.query)
+
+        if path == "/search.html":
+            page = query.get("page", ["1"])[0]
+            return self.send_file(FIXTURES / f"search_{page}.html")
+        elif path.startswith("/category/"):
+            return self.send_file(FIXTURES / "category.html")
+        elif path == "/ajax/load-list-episode":
+            return self.send_file(FIXTURES / "load_list_episode.html")
+        elif path == "/streaming.php":
+            return self.send_file(FIXTURES / "embed.html")
+        elif path == "/encrypt-ajax.php":
+            body = generate.ajax_response(f"{self.server.base_url}stream")
+            return self.send_body(body.encode(), "application/json")
+        elif path.startswith("/stream/"):
+            return self.send_file(FIXTURES / "hls" / path.split("/")[-1])
+        elif path.startswith("/mp4/"):
+            return self.send_file(FIXTURES / "mp4" / path.split("/")[-1])
+        elif re.match(r"^/[\w-]+-episode-[\d-]+$", path):
+            page = (FIXTURES / "episode.html").read_text()
+            page = page.replace(generate.EMBED_HOST, f"//{self.server.host}")
+            return self.send_body(page.encode(), "text/html")
+
+        self.send_error(404)
+
+    def send_file(self, path: Path):
+        if not path.is_file():
+            return self.send_error(404)
+
+        content_type = "text/html"
+        if path.suffix == ".m3u8":
+            content_type = "application/vnd.apple.mpegurl"
+        elif path.suffix == ".ts":
+            content_type = "video/mp2t"
+        elif path.suffix == ".mp4":
+            content_type = "video/mp4"
+
+        body = path.read_bytes()
+        match = re.match(r"bytes=(\d+)-(\d*)$", self.headers.get("Range", ""))
+        if match and self.server.ranges:
+            start = int(match.group(1))
+            end = min(int(match.group(2) or len(body) - 1), len(body) - 1)
+            content_range = f"bytes {start}-{end}/{len(body)}"
+            return self.send_body(body[start : end + 1], content_type, content_range)
+
+        self.send_body(body, content_type)
+
+    def send_body(self, body: bytes, content_type: str, content_range: str = None):
+        self.send_response(206 if content_range else 200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if content_range:
+            self.send_header("Content-Range", content_range)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class FixtureServer(ThreadingHTTPServer):
+    """
+    Serves the fixtures on 127.0.0.1, latency (seconds)
+    is added to every request to imitate a real connection.
+    Range requests are answered unless ranges is False.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, port=0, latency=0.0, ranges=True):
+        super().__init__(("127.0.0.1", port), FixtureHandler)
+        self.latency = latency
+        self.ranges = ranges
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    @property
+    def host(self):
+        return f"{self.server_address[0]}:{self.server_address[1]}"
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}/"
+
+    def count_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0, help="in milliseconds")
+    args = parser.parse_args()
+
+    server = FixtureServer(args.port, args.latency / 1000)
+    print(f"Serving fixtures on {server.base_url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -70,6 +70,13 @@ url_class = anipy_cli.videourl(entry, "best")
 url_class.stream_url()
 # get your entry back filled with stream and embed url fields
 entry = url_class.get_entry()
+# Resolve many entries at once, this runs
+# concurrently and returns a list of StreamResult
+# objects in the same order as the entries.
+# If an entry failed, result.ok is False and
+# result.error holds the exception.
+results = anipy_cli.videourl.resolve_many([entry, next_ep], "best")
+entries = [x.entry for x in results if x.ok]
 
 """DOWNLOAD"""
 
@@ -26,7 +26,6 @@ setup(
     url="https://github.com/sdaqo/anipy-cli",
     license="GPL-3.0",
     install_requires=[
-        "better-ffmpeg-progress",
         "pycryptodomex",
         "requests",
         "python-dateutil",
@@ -35,10 +34,11 @@ setup(
         "setuptools",
         "beautifulsoup4",
         "tqdm",
-        "moviepy",
         "pyyaml",
         "python-mpv",
-        "yaspin"
+        "yaspin",
+        "imageio-ffmpeg",
     ],
+    extras_require={"lxml": ["lxml"]},
     entry_points="[console_scripts]\nanipy-cli=anipy_cli.run_anipy_cli:main",
 )
@@ -0,0 +1,61 @@
+import time
+from anipy_cli.cache import PersistentCache
+
+
+def test_set_get(tmp_path):
+    """Check if values survive a new cache instance (persistence)"""
+    path = tmp_path / "cache.json"
+    PersistentCache(path).set("hyouka", {"movie_id": "42"})
+
+    assert PersistentCache(path).get("hyouka") == {"movie_id": "42"}
+
+
+def test_max_age(tmp_path):
+    """Check if values older than max_age are not returned"""
+    cache = PersistentCache(tmp_path / "cache.json")
+    cache.set("hyouka", [1, 2, 3])
+    cache._data["hyouka"]["time"] -= 100
+
+    assert cache.get("hyouka", max_age=50) is None
+    assert cache.get("hyouka", max_age=500) == [1, 2, 3]
+    assert cache.get("hyouka") == [1, 2, 3]
+
+
+def test_expires(tmp_path):
+    """Check if expired values are dropped"""
+    cache = PersistentCache(tmp_path / "cache.json")
+    cache.set("old", 1, expires=time.time() - 1)
+    cache.set("new", 2, expires=time.time() + 100)
+
+    assert cache.get("old") is None
+    assert cache.get("new") == 2
+
+
+def test_invalidate(tmp_path):
+    path = tmp_path / "cache.json"
+    cache = PersistentCache(path)
+    cache.set("hyouka", 1)
+    cache.invalidate("hyouka")
+
+    assert cache.get("hyouka") is None
+    assert PersistentCache(path).get("hyouka") is None
+
+
+def test_write_fails(tmp_path):
+    """Check if a cache that can't be written still works in the process"""
+    # The parent of the cache file is a file, so every write fails
+    (tmp_path / "cache").write_text("")
+    cache = PersistentCache(tmp_path / "cache" / "cache.json")
+    cache.set("hyouka", 1)
+
+    assert cache.get("hyouka") == 1
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["cache"]
+
+
+def test_write_leaves_no_temp_files(tmp_path):
+    path = tmp_path / "cache.json"
+    cache = PersistentCache(path)
+    for i in range(3):
+        cache.set(str(i), i)
+
+    assert list(tmp_path.iterdir()) == [path]
@@ -0,0 +1,184 @@
+import threading
+
+import pytest
+
+from anipy_cli import Entry
+from anipy_cli import scheduler
+from anipy_cli import dl_queue
+from anipy_cli.dl_queue import DownloadQueue, QueueWorker, QUEUED, RUNNING, DONE, FAILED
+
+
+def entry(ep):
+    return Entry(show_name="Hyouka", ep=ep, ep_url=f"https://gogo/hyouka-episode-{ep}")
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return DownloadQueue(tmp_path / "queue.db")
+
+
+class FakeDownload:
+    failures = {}
+    folder = None
+    fetched = []
+
+    def __init__(self, entry, quality, ffmpeg=False, dl_path=None):
+        self.entry = entry
+
+    def fetch(self):
+        self.fetched.append(self.entry.ep)
+        left = self.failures.get(self.entry.ep, 0)
+        if left:
+            self.failures[self.entry.ep] = left - 1
+            raise ConnectionError("cdn not reachable")
+
+        path = self.folder / f"ep{self.entry.ep}.mp4"
+        path.write_bytes(b"episode")
+        return path
+
+    def remux(self):
+        pass
+
+    def cancel(self):
+        pass
+
+
+@pytest.fixture
+def fake_download(monkeypatch, tmp_path):
+    monkeypatch.setattr(scheduler, "download", FakeDownload)
+    # The entries need no resolving
+    monkeypatch.setattr(
+        scheduler.DownloadScheduler, "_resolve", staticmethod(lambda entry: entry)
+    )
+    FakeDownload.failures = {}
+    FakeDownload.folder = tmp_path
+    FakeDownload.fetched = []
+    return FakeDownload
+
+
+def test_enqueue(queue):
+    """Check if the same episode is only queued once"""
+    assert queue.enqueue(entry(1), "best")
+    assert queue.enqueue(entry(2), "best")
+    assert not queue.enqueue(entry(1), "best")
+    assert queue.enqueue(entry(1), "worst")
+
+    jobs = queue.jobs()
+    assert [(job.ep, job.quality, job.state) for job in jobs] == [
+        ("1", "best", QUEUED),
+        ("2", "best", QUEUED),
+        ("1", "worst", QUEUED),
+    ]
+    assert jobs[0].get_entry().ep == 1
+
+
+def test_claim(queue):
+    """Check if jobs are claimed in order and only once"""
+    queue.enqueue(entry(1), "best")
+    queue.enqueue(entry(2), "best")
+
+    first, second = queue.claim(), queue.claim()
+    assert (first.ep, second.ep) == ("1", "2")
+    assert first.state == RUNNING
+    assert queue.claim() is None
+
+    queue.finish(first, "ep1.mp4")
+    queue.release(second)
+    assert [job.state for job in queue.jobs()] == [DONE, QUEUED]
+
+
+def test_fail(queue):
+    """Check if a failed job waits before its retry, and fails for good"""
+    queue.enqueue(entry(1), "best")
+    job = queue.claim()
+    assert queue.fail(job, "404", retries=2, delay=100) == QUEUED
+    assert queue.claim() is None
+
+    queue.fail(queue.jobs()[0], "404", retries=2, delay=0)
+    (job,) = queue.jobs()
+    assert job.state == FAILED
+    assert job.attempts == 2
+    assert job.last_error == "404"
+
+    # Adding it again gives it new retries
+    assert queue.enqueue(entry(1), "best")
+    assert queue.jobs()[0].attempts == 0
+
+
+def test_recover(queue, monkeypatch):
+    """Check if jobs of a worker that died are queued again"""
+    queue.enqueue(entry(1), "best")
+    queue.claim()
+    assert queue.recover() == 0
+
+    monkeypatch.setattr(queue, "STALE_AFTER", -1)
+    assert queue.recover() == 1
+    assert queue.claim().ep == "1"
+
+
+def test_worker(queue, fake_download):
+    """Check if the worker drains the queue and retries failed jobs"""
+    for ep in range(1, 6):
+        queue.enqueue(entry(ep), "best")
+    fake_download.failures = {3: 1, 4: 5}
+
+    worker = QueueWorker(queue, parallel=2)
+    worker.RETRY_DELAY = 0
+    worker.retries = 3
+    worker.run(until_empty=True)
+
+    jobs = {job.ep: job for job in queue.jobs()}
+    assert [jobs[ep].state for ep in "12345"] == [DONE, DONE, DONE, FAILED, DONE]
+    assert jobs["3"].attempts == 2
+    assert jobs["4"].attempts == 3
+    assert jobs["4"].last_error == "cdn not reachable"
+    assert jobs["1"].path == str(fake_download.folder / "ep1.mp4")
+    assert jobs["1"].finished >= jobs["1"].started
+
+
+def test_worker_missing_file(queue, fake_download, monkeypatch):
+    """Check if a download without a file at its path is not done"""
+    monkeypatch.setattr(FakeDownload, "fetch", lambda self: self.folder / "gone.mp4")
+    queue.enqueue(entry(1), "best")
+
+    worker = QueueWorker(queue, parallel=1)
+    worker.retries = 1
+    worker.run(until_empty=True)
+
+    (job,) = queue.jobs()
+    assert job.state == FAILED
+    assert "gone.mp4" in job.last_error
+
+
+def test_worker_stop_while_resolving(queue, fake_download, monkeypatch):
+    """Check if a job stopped before its transfer is queued again and not downloaded"""
+    resolving = threading.Event()
+    stopped = threading.Event()
+
+    def resolve(entry):
+        resolving.set()
+        stopped.wait(5)
+        return entry
+
+    monkeypatch.setattr(scheduler.DownloadScheduler, "_resolve", staticmethod(resolve))
+    queue.enqueue(entry(1), "best")
+    worker = QueueWorker(queue, parallel=1)
+
+    def stop():
+        resolving.wait(5)
+        worker.stop()
+        stopped.set()
+
+    threading.Thread(target=stop, daemon=True).start()
+    worker.run(until_empty=True)
+
+    assert fake_download.fetched == []
+    assert [job.state for job in queue.jobs()] == [QUEUED]
+
+
+def test_enqueue_all(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        dl_queue, "DownloadQueue", lambda: DownloadQueue(tmp_path / "q.db")
+    )
+    assert dl_queue.enqueue_all([entry(1), entry(2)], "best") == 2
+    assert dl_queue.enqueue_all([entry(2), entry(3)], "best") == 1
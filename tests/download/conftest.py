@@ -0,0 +1,88 @@
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+from anipy_cli import Entry, download
+from anipy_cli.config import Config
+from anipy_cli.retry import RetryPolicy
+
+
+class Handler(BaseHTTPRequestHandler):
+    """
+    Answers a GET with server.respond(handler), which returns
+    the status, the body and optionally extra headers.
+    """
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        status, body, *headers = self.server.respond(self)
+        self.send_response(status)
+        for name, value in (headers[0] if headers else {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def serve():
+    """
+    Start a local http server that answers with respond,
+    it has its url and the paths that were requested.
+    """
+    servers = []
+
+    def start(respond):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        server.respond = respond
+        server.requests = []
+        server.url = f"http://127.0.0.1:{server.server_address[1]}/"
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+
+
+@pytest.fixture(autouse=True)
+def library(tmp_path, monkeypatch):
+    """Keep the library index of the downloads in the test folder"""
+    path = tmp_path / "library.db"
+    monkeypatch.setattr(Config, "library_index_path", property(lambda self: path))
+    return path
+
+
+@pytest.fixture
+def fetch_stream(tmp_path, monkeypatch):
+    """
+    Download a hls stream with download.fetch(), one part at a
+    time and without checking that the parts are mpeg-ts.
+    Returns the merged ts, None if the download gave up.
+    Failed parts wait retry_delay seconds before a retry.
+    """
+    for option in ("download_workers", "download_workers_min", "download_workers_max"):
+        monkeypatch.setattr(Config, option, 1)
+    monkeypatch.setattr(Config, "download_segment_retries", 5)
+    monkeypatch.setattr(Config, "download_verify_segments", False)
+    monkeypatch.setattr(Config, "ffmpeg_hls", False)
+
+    def fetch(stream_url, retry_delay=0.0, failure_budget=50, **fields):
+        monkeypatch.setattr(
+            RetryPolicy, "delay", lambda self, attempt, failure=None: retry_delay
+        )
+        monkeypatch.setattr(Config, "download_failure_budget", failure_budget)
+        entry = Entry(show_name="Hyouka", ep=1, stream_url=stream_url, **fields)
+        try:
+            download(entry, "best", dl_path=tmp_path).fetch()
+        except SystemExit:
+            return None
+
+        return (tmp_path / "Hyouka" / "1_temp" / "Hyouka_1_merged.ts").read_bytes()
+
+    return fetch
@@ -0,0 +1,72 @@
+import os
+
+import m3u8
+import pytest
+from Cryptodome.Cipher import AES
+from Cryptodome.Util.Padding import pad
+
+from anipy_cli.hls_crypto import SegmentDecryptor, decrypt, segment_iv
+
+KEY = os.urandom(16)
+IV = os.urandom(16)
+PARTS = [os.urandom(188 * n) for n in (10, 33, 1)]
+
+
+def encrypt(data, iv):
+    return AES.new(KEY, AES.MODE_CBC, iv=iv).encrypt(pad(data, 16))
+
+
+PLAYLIST = (
+    "#EXTM3U\n#EXT-X-MEDIA-SEQUENCE:5\n"
+    f'#EXT-X-KEY:METHOD=AES-128,URI="key.bin",IV=0x{IV.hex()}\n'
+    "#EXTINF:4,\n0.ts\n"
+    '#EXT-X-KEY:METHOD=AES-128,URI="key.bin"\n'
+    "#EXTINF:4,\n1.ts\n#EXTINF:4,\n2.ts\n#EXT-X-ENDLIST\n"
+)
+
+
+def encrypted(handler):
+    if handler.path == "/index.m3u8":
+        return 200, PLAYLIST.encode()
+    if handler.path == "/key.bin":
+        return 200, KEY
+
+    index = int(handler.path[1:].split(".")[0])
+    # The first part has an explicit IV, the others use the sequence
+    iv = IV if index == 0 else (5 + index).to_bytes(16, "big")
+    return 200, encrypt(PARTS[index], iv)
+
+
+def test_chunked_decrypt():
+    """Check if data fed in odd sized chunks decrypts to the same"""
+    data = os.urandom(1000)
+    encrypted = encrypt(data, IV)
+    decryptor = SegmentDecryptor(KEY, IV)
+    clear = b"".join(
+        decryptor.update(encrypted[i : i + 7]) for i in range(0, len(encrypted), 7)
+    )
+
+    assert clear + decryptor.finalize() == data
+    assert decrypt(encrypted, KEY, IV) == data
+    with pytest.raises(ValueError):
+        decrypt(encrypted[:-3], KEY, IV)
+
+
+def test_segment_iv():
+    playlist = m3u8.loads(
+        "#EXTM3U\n"
+        '#EXT-X-KEY:METHOD=AES-128,URI="k",IV=0x0A\n#EXTINF:4,\na.ts\n'
+        '#EXT-X-KEY:METHOD=AES-128,URI="k"\n#EXTINF:4,\nb.ts\n'
+    )
+    first, second = (segment.key for segment in playlist.segments)
+
+    assert segment_iv(first, 3) == b"\x00" * 15 + b"\x0a"
+    assert segment_iv(second, 3) == (3).to_bytes(16, "big")
+
+
+def test_decrypted_download(serve, fetch_stream):
+    """Check if encrypted parts end up decrypted and the key is fetched once"""
+    server = serve(encrypted)
+
+    assert fetch_stream(server.url + "index.m3u8") == b"".join(PARTS)
+    assert server.requests.count("/key.bin") == 1
@@ -0,0 +1,62 @@
+from anipy_cli.journal import SegmentJournal
+
+NAMES = ["360-000.ts", "360-001.ts", "360-002.ts"]
+
+
+def write_segments(journal, path, count):
+    with path.open("ab") as f:
+        for name in NAMES[:count]:
+            f.write(b"\x47" * 188)
+            journal.add(name, 188)
+
+
+def test_resume(tmp_path):
+    """Check if a journal of the same variant is resumed"""
+    merged = tmp_path / "merged.ts"
+    journal = SegmentJournal(tmp_path)
+    assert journal.start("ep.1.m3u8", "ep.1.360.m3u8") is False
+    write_segments(journal, merged, 2)
+
+    journal = SegmentJournal(tmp_path)
+    assert journal.start("ep.1.m3u8", "ep.1.360.m3u8") is True
+    assert journal.resume(merged, NAMES) == 2
+
+
+def test_other_variant(tmp_path):
+    """Check if the journal gets reset when the variant changed"""
+    merged = tmp_path / "merged.ts"
+    journal = SegmentJournal(tmp_path)
+    journal.start("ep.1.m3u8", "ep.1.360.m3u8")
+    write_segments(journal, merged, 2)
+
+    journal = SegmentJournal(tmp_path)
+    assert journal.start("ep.1.m3u8", "ep.1.1080.m3u8") is False
+    assert journal.resume(merged, NAMES) == 0
+    assert merged.stat().st_size == 0
+
+
+def test_truncated_file(tmp_path):
+    """Check if a half written segment is cut off and forgotten"""
+    merged = tmp_path / "merged.ts"
+    journal = SegmentJournal(tmp_path)
+    journal.start("ep.1.m3u8", "ep.1.360.m3u8")
+    write_segments(journal, merged, 3)
+    with merged.open("ab") as f:
+        f.truncate(188 * 2 + 100)
+
+    assert journal.resume(merged, NAMES) == 2
+    assert merged.stat().st_size == 188 * 2
+    assert "360-002.ts" not in SegmentJournal(tmp_path).segments
+
+
+def test_cut_off_line(tmp_path):
+    """Check if a half written last line is ignored"""
+    journal = SegmentJournal(tmp_path)
+    journal.start("ep.1.m3u8", "ep.1.360.m3u8")
+    journal.add("360-000.ts", 188)
+    with journal.path.open("a") as f:
+        f.write('{"segment": "360-00')
+
+    journal = SegmentJournal(tmp_path)
+    assert journal.start("ep.1.m3u8", "ep.1.360.m3u8") is True
+    assert journal.segments == {"360-000.ts": 188}
@@ -0,0 +1,59 @@
+import pytest
+
+from anipy_cli import limiter as limiter_module
+from anipy_cli.limiter import AdaptiveLimiter
+
+
+class FakeTime:
+    """Clock that advances by 0.1s every time it is read"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        self.now += 0.1
+        return self.now
+
+
+@pytest.fixture(autouse=True)
+def fake_time(monkeypatch):
+    monkeypatch.setattr(limiter_module, "time", FakeTime())
+
+
+def run_window(limiter, ok=True, size=1024 * 1024, latency=0.1):
+    for _ in range(max(limiter.limit, 4)):
+        limiter.acquire()
+        limiter.release(ok, size, latency)
+
+
+def test_increase():
+    """Check if the limit grows while the connection keeps up, up to the maximum"""
+    limiter = AdaptiveLimiter(4, 2, 8)
+    for _ in range(10):
+        run_window(limiter)
+
+    assert limiter.limit == 8
+
+
+def test_decrease_on_errors():
+    """Check if failed requests halve the limit, down to the minimum"""
+    changes = []
+    limiter = AdaptiveLimiter(12, 2, 24, lambda *x: changes.append(x))
+    run_window(limiter, ok=False)
+    assert limiter.limit == 6
+
+    for _ in range(5):
+        run_window(limiter, ok=False)
+
+    assert limiter.limit == 2
+    assert changes[0] == (12, 6, "12 failed requests")
+
+
+def test_decrease_on_latency():
+    """Check if the limit goes down when requests start to queue up"""
+    limiter = AdaptiveLimiter(6, 2, 24)
+    run_window(limiter, latency=0.1)
+    assert limiter.limit == 7
+
+    run_window(limiter, latency=0.5)
+    assert limiter.limit == 6
@@ -0,0 +1,100 @@
+import time
+
+import m3u8
+
+from anipy_cli import Entry
+from anipy_cli.mirrors import MirrorSet, Source
+from anipy_cli.url_handler import videourl
+
+
+def playlist(sequence, count, duration=4):
+    parts = "".join(f"#EXTINF:{duration},\n{sequence + i}.ts\n" for i in range(count))
+    return f"#EXTM3U\n#EXT-X-MEDIA-SEQUENCE:{sequence}\n{parts}#EXT-X-ENDLIST\n"
+
+
+def mirrored(handler):
+    """Parts under /down/ always answer 503, the rest is served"""
+    if handler.path.endswith(".m3u8"):
+        return 200, playlist(10, 5).encode()
+    if handler.path.startswith("/down/"):
+        return 503, b""
+
+    return 200, handler.path.encode()
+
+
+def test_quality_mirrors():
+    """Check if the other sources of the picked quality become its mirrors"""
+    url_class = videourl(Entry(), "best")
+    url_class.quality(
+        [
+            {"file": "https://a.example/360.m3u8", "label": "360 P", "type": "hls"},
+            {"file": "https://a.example/720.m3u8", "label": "720 P", "type": "hls"},
+            {"file": "https://b.example/720.m3u8", "label": "720 P", "type": "hls"},
+        ],
+        [
+            {"file": "https://c.example/720.m3u8", "label": "720 P", "type": "hls"},
+            {"file": "https://b.example/720.m3u8", "label": "720 P", "type": "hls"},
+            {"file": "https://c.example/720.mp4", "label": "720 P", "type": "mp4"},
+        ],
+    )
+    entry = url_class.get_entry()
+    assert entry.stream_url == "https://b.example/720.m3u8"
+    assert entry.mirror_urls == [
+        "https://a.example/720.m3u8",
+        "https://c.example/720.m3u8",
+    ]
+
+
+def test_pick_by_sequence():
+    """Check if parts of a mirror are matched by media sequence and duration"""
+    primary = m3u8.M3U8(playlist(10, 5))
+    mirrors = MirrorSet(
+        10,
+        lambda: [
+            Source("late", m3u8.M3U8(playlist(12, 5))),
+            Source("other cut", m3u8.M3U8(playlist(10, 5, duration=6))),
+        ],
+    )
+    segment = primary.segments[3]
+    source, found = mirrors.pick(segment, 3, set())
+    assert (source.name, found) == ("primary", segment)
+
+    source, found = mirrors.pick(segment, 3, {source})
+    assert (source.name, found.uri) == ("late", "13.ts")
+
+    assert mirrors.pick(primary.segments[0], 0, {mirrors.sources[0]}) is None
+
+
+def test_demote():
+    """Check if a source that keeps failing is tried last for a while"""
+    mirrors = MirrorSet(loader=lambda: [Source("mirror")])
+    primary = mirrors.sources[0]
+    mirrors.pick(None, 0, {primary})
+
+    assert not mirrors.report(primary, False)
+    assert not mirrors.report(primary, True)
+    assert [mirrors.report(primary, False) for _ in range(3)] == [False, False, True]
+    assert [source.name for source in mirrors.ranked()] == ["mirror", "primary"]
+
+    primary.demoted_until = 0
+    assert mirrors.ranked()[0] is primary
+    assert mirrors.report(primary, False)
+
+
+def test_failover(serve, fetch_stream):
+    """Check if failed parts come from the mirror right away, and the primary is demoted"""
+    server = serve(mirrored)
+
+    started = time.monotonic()
+    merged = fetch_stream(
+        server.url + "down/index.m3u8",
+        retry_delay=5,
+        mirror_urls=[server.url + "up/index.m3u8"],
+    )
+
+    assert time.monotonic() - started < 5
+    assert merged == b"".join(f"/up/{10 + i}.ts".encode() for i in range(5))
+    # One request per part until the primary is demoted
+    parts_down = [path for path in server.requests if path.startswith("/down/1")]
+    assert parts_down == ["/down/10.ts", "/down/11.ts", "/down/12.ts"]
+    assert len(parts_down) == MirrorSet.DEMOTE_AFTER
@@ -0,0 +1,87 @@
+import os
+import re
+
+import pytest
+
+from anipy_cli import Entry, download
+from anipy_cli.library import Library
+
+BODY = os.urandom(3 * 1024 * 1024 + 123)
+
+
+def ranged(handler):
+    server = handler.server
+    server.ranges_requested.append(handler.headers.get("Range"))
+    match = re.match(r"bytes=(\d+)-(\d*)$", handler.headers.get("Range", ""))
+    if not (match and server.ranges):
+        return 200, BODY
+
+    start = int(match.group(1))
+    end = min(int(match.group(2) or len(BODY) - 1), len(BODY) - 1)
+    return (
+        206,
+        BODY[start : end + 1],
+        {"Content-Range": f"bytes {start}-{end}/{len(BODY)}"},
+    )
+
+
+@pytest.fixture(params=[True, False], ids=["ranges", "no_ranges"])
+def server(request, serve):
+    server = serve(ranged)
+    server.ranges = request.param
+    server.ranges_requested = []
+    return server
+
+
+def test_mp4_dl(server, tmp_path):
+    """Check if the file is complete with and without range support"""
+    url = server.url + "ep.1.mp4"
+    entry = Entry(show_name="Hyouka", embed_url=url, stream_url=url, ep=1)
+    download_class = download(entry, "best", dl_path=tmp_path)
+    download_class.MIN_RANGED_SIZE = 1024 * 1024
+
+    download_path = download_class.download()
+
+    assert download_path.read_bytes() == BODY
+    assert Library().find("Hyouka", 1).path == download_path.resolve()
+    assert list(download_path.parent.iterdir()) == [download_path]
+    if server.ranges:
+        # The probe and one request per connection
+        assert len(server.ranges_requested) > 2
+    else:
+        # The answer to the probe is the whole file
+        assert len(server.ranges_requested) == 1
+
+
+def test_mp4_dl_cancelled(server, tmp_path):
+    """Check if a cancelled download fails and leaves no file behind"""
+    url = server.url + "ep.1.mp4"
+    entry = Entry(show_name="Hyouka", embed_url=url, stream_url=url, ep=1)
+    download_class = download(entry, "best", dl_path=tmp_path)
+    download_class.MIN_RANGED_SIZE = 1024 * 1024
+    download_class.cancel()
+
+    with pytest.raises(SystemExit):
+        download_class.download()
+
+    assert list((tmp_path / "Hyouka").iterdir()) == []
+
+
+def test_mp4_dl_broken(serve, tmp_path):
+    """Check if a download that fails after the probe leaves no file behind"""
+
+    def probe_only(handler):
+        if handler.headers.get("Range") != "bytes=0-0":
+            return 404, b""
+        return 206, BODY[:1], {"Content-Range": f"bytes 0-0/{len(BODY)}"}
+
+    url = serve(probe_only).url + "ep.1.mp4"
+    entry = Entry(show_name="Hyouka", embed_url=url, stream_url=url, ep=1)
+    download_class = download(entry, "best", dl_path=tmp_path)
+    download_class.MIN_RANGED_SIZE = 1024 * 1024
+
+    with pytest.raises(SystemExit):
+        download_class.download()
+
+    assert list((tmp_path / "Hyouka").iterdir()) == []
+    assert Library().find("Hyouka", 1) is None
@@ -0,0 +1,105 @@
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from anipy_cli.journal import SegmentJournal
+from anipy_cli.ordered_writer import OrderedWriter
+
+
+def test_order(tmp_path):
+    """Check if segments put out of order end up in playlist order"""
+    names = [f"{i}.ts" for i in range(50)]
+    writer = OrderedWriter(tmp_path / "merged.ts", names, window=4)
+
+    def put(index):
+        threading.Event().wait(random.random() / 100)
+        writer.put(index, f"<{index}>".encode())
+
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(put, range(50)))
+    writer.close()
+
+    assert writer.done
+    expected = "".join(f"<{i}>" for i in range(50))
+    assert (tmp_path / "merged.ts").read_text() == expected
+
+
+def test_journal(tmp_path):
+    """Check if only contiguous segments are journaled"""
+    journal = SegmentJournal(tmp_path)
+    journal.start("ep.1.m3u8", "ep.1.360.m3u8")
+    writer = OrderedWriter(tmp_path / "merged.ts", ["0.ts", "1.ts", "2.ts"], journal)
+
+    writer.put(1, b"11")
+    assert journal.segments == {}
+
+    writer.put(0, b"0")
+    writer.close()
+    assert journal.segments == {"0.ts": 1, "1.ts": 2}
+    assert not writer.done
+
+
+def test_fail(tmp_path):
+    """Check if waiting workers are released when the writer fails"""
+    writer = OrderedWriter(tmp_path / "merged.ts", ["0.ts", "1.ts", "2.ts"], window=1)
+    results = []
+    waiting = threading.Thread(target=lambda: results.append(writer.put(2, b"2")))
+    waiting.start()
+
+    writer.fail()
+    waiting.join(timeout=5)
+    writer.close()
+
+    assert results == [False]
+    assert (tmp_path / "merged.ts").read_bytes() == b""
+
+
+def test_max_bytes(tmp_path):
+    """Check if reserve() waits for room, but never for the next segment"""
+    names = [f"{i}.ts" for i in range(4)]
+    writer = OrderedWriter(tmp_path / "merged.ts", names, max_bytes=250)
+    writer.DEFAULT_ESTIMATE = 100
+
+    assert writer.reserve(1)
+    assert writer.reserve(2)
+    waiting = threading.Thread(target=writer.reserve, args=(3,))
+    waiting.start()
+    waiting.join(timeout=0.2)
+    assert waiting.is_alive()
+
+    # The next segment goes ahead, even over the limit
+    assert writer.reserve(0)
+    assert writer.held == 300
+
+    writer.put(1, b"1" * 100)
+    writer.put(0, b"0" * 100)
+    waiting.join(timeout=5)
+    assert not waiting.is_alive()
+    assert writer.held == 200
+
+    writer.release(2)
+    assert writer.held == 100
+    writer.close()
+
+
+def test_bounded_memory(tmp_path):
+    """Check if the held bytes stay below the limit with many workers"""
+    names = [f"{i}.ts" for i in range(100)]
+    writer = OrderedWriter(tmp_path / "merged.ts", names, window=50, max_bytes=4000)
+    writer.DEFAULT_ESTIMATE = 1000
+    peak = []
+
+    def put(index):
+        writer.reserve(index)
+        peak.append(writer.held)
+        threading.Event().wait(random.random() / 200)
+        writer.put(index, bytes(1000))
+
+    with ThreadPoolExecutor(16) as pool:
+        list(pool.map(put, range(100)))
+    writer.close()
+
+    assert writer.done
+    assert writer.held == 0
+    # The next segment may go over by one
+    assert max(peak) <= 5000
@@ -0,0 +1,84 @@
+import sys
+import subprocess
+
+import pytest
+
+from anipy_cli.remux import (
+    RemuxError,
+    find_ffmpeg,
+    remux_command,
+    remux_file,
+    part_path,
+)
+
+FFMPEG = find_ffmpeg()
+needs_ffmpeg = pytest.mark.skipif(FFMPEG is None, reason="ffmpeg not found")
+
+
+@pytest.fixture
+def video(tmp_path):
+    """Two seconds of test video with a sine as audio"""
+    path = tmp_path / "video.mp4"
+    subprocess.run(
+        [FFMPEG, "-loglevel", "error", "-y"]
+        + ["-f", "lavfi", "-i", "testsrc=duration=2:size=160x120:rate=10"]
+        + ["-f", "lavfi", "-i", "sine=duration=2"]
+        + ["-c:v", "mpeg4", "-c:a", "aac", "-shortest", str(path)],
+        check=True,
+    )
+    return path
+
+
+def test_command():
+    """Check if a separate audio rendition replaces the audio of the video"""
+    command = remux_command("ffmpeg", "v.ts", "out.mp4")
+    assert command[command.index("-i") + 1] == "v.ts"
+    assert command.count("-i") == 1
+    assert "0:a?" in command
+
+    command = remux_command("ffmpeg", "v.ts", "out.mp4", "a.ts")
+    assert command.count("-i") == 2
+    assert "1:a" in command and "0:a?" not in command
+    assert command[-3:] == ["-c", "copy", "out.mp4"]
+
+
+@needs_ffmpeg
+def test_remux(video, tmp_path):
+    """Check if the streams are copied and the progress is reported"""
+    progress = []
+    output = tmp_path / "out.mkv"
+    log = tmp_path / "ffmpeg.log"
+    remux_file(video, output, video, log, progress.append)
+
+    assert output.stat().st_size > 0
+    assert not part_path(output).exists()
+    assert progress and progress[-1] > 1.5
+    assert log.is_file()
+
+
+def test_part_path(tmp_path):
+    """Check if the part file keeps the extension ffmpeg picks the container by"""
+    assert part_path(tmp_path / "ep.1.mp4") == tmp_path / "ep.1.part.mp4"
+
+
+@needs_ffmpeg
+def test_remux_error(video, tmp_path):
+    """Check if a failed remux leaves nothing behind"""
+    with pytest.raises(RemuxError):
+        remux_file(tmp_path / "missing.ts", tmp_path / "out.mp4")
+
+    # The audio rendition has no video stream to map
+    with pytest.raises(RemuxError):
+        remux_file(tmp_path / "missing.ts", tmp_path / "out.mp4", video)
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["video.mp4"]
+
+
+def test_fetch_needs_ffmpeg(serve, fetch_stream, monkeypatch):
+    """Check if a hls download without ffmpeg gives up before any transfer"""
+    # anipy_cli.download is the download class, not the module
+    monkeypatch.setattr(sys.modules["anipy_cli.download"], "find_ffmpeg", lambda: None)
+    server = serve(lambda handler: (200, b"#EXTM3U\n"))
+
+    assert fetch_stream(server.url + "index.m3u8") is None
+    assert server.requests == []
@@ -0,0 +1,94 @@
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+
+import pytest
+import requests
+
+from anipy_cli.retry import RetryPolicy, FailureBudget
+
+
+def http_error(status, headers=None):
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers or {})
+    return requests.HTTPError(response=response)
+
+
+def scripted(handler):
+    """Answers every path with the next status of its script, then 200"""
+    if handler.path == "/index.m3u8":
+        return 200, handler.server.playlist.encode()
+
+    script = handler.server.scripts.setdefault(handler.path, [])
+    status = script.pop(0) if script else 200
+    body = handler.path.encode() if status == 200 else b""
+    return status, body, {"Retry-After": "0"} if status == 503 else {}
+
+
+@pytest.fixture
+def server(serve):
+    server = serve(scripted)
+    server.scripts = {}
+    return server
+
+
+def run_segments(server, fetch_stream, names, budget=50):
+    parts = "".join(f"#EXTINF:4,\n{name}\n" for name in names)
+    server.playlist = f"#EXTM3U\n{parts}#EXT-X-ENDLIST\n"
+    return fetch_stream(server.url + "index.m3u8", failure_budget=budget)
+
+
+def test_retryable():
+    """Check which failures are worth another attempt"""
+    policy = RetryPolicy()
+    assert policy.is_retryable(http_error(429))
+    assert policy.is_retryable(http_error(503))
+    assert policy.is_retryable(requests.ConnectionError())
+    assert policy.is_retryable(requests.Timeout())
+    assert not policy.is_retryable(http_error(403))
+    assert not policy.is_retryable(http_error(404))
+
+
+def test_delay():
+    """Check if the backoff grows, is capped and follows Retry-After"""
+    policy = RetryPolicy(base_delay=1, max_delay=8)
+    assert all(0 <= policy.delay(0) <= 1 for _ in range(50))
+    assert all(0 <= policy.delay(10) <= 8 for _ in range(50))
+    assert policy.delay(0, http_error(429, {"Retry-After": "5"})) >= 5
+    assert policy.delay(0, http_error(429, {"Retry-After": "9999"})) == 120
+
+    date = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), True)
+    assert 20 < policy.delay(0, http_error(503, {"Retry-After": date})) <= 30
+    assert policy.delay(0, http_error(503, {"Retry-After": "soon"})) <= 1
+
+
+def test_failure_budget():
+    budget = FailureBudget(2)
+    assert budget.spend()
+    assert budget.spend()
+    assert not budget.spend()
+    assert budget.exhausted
+
+
+def test_segment_retried(server, fetch_stream):
+    """Check if parts that fail for a while still end up in the file"""
+    server.scripts = {"/1.ts": [503, 503], "/2.ts": [500]}
+    merged = run_segments(server, fetch_stream, ["0.ts", "1.ts", "2.ts"])
+
+    assert merged == b"/0.ts/1.ts/2.ts"
+    assert server.requests.count("/1.ts") == 3
+
+
+def test_segment_fatal(server, fetch_stream):
+    """Check if a 404 is not retried"""
+    server.scripts = {"/1.ts": [404]}
+    assert run_segments(server, fetch_stream, ["0.ts", "1.ts"]) is None
+    assert server.requests.count("/1.ts") == 1
+
+
+def test_segment_budget(server, fetch_stream):
+    """Check if the episode gives up once the failure budget is used up"""
+    server.scripts = {f"/{i}.ts": [503] * 10 for i in range(3)}
+    names = ["0.ts", "1.ts", "2.ts"]
+    assert run_segments(server, fetch_stream, names, budget=3) is None
+    assert len([path for path in server.requests if path.endswith(".ts")]) == 4
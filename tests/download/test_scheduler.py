@@ -0,0 +1,160 @@
+import time
+import threading
+
+from anipy_cli import Entry, videourl
+from anipy_cli import scheduler
+from anipy_cli.config import Config
+from anipy_cli.net import ConnectionBudget
+from anipy_cli.pipeline import Pipeline, Stage
+
+
+class FakeDownload:
+    lock = threading.Lock()
+    transferring = 0
+    max_transferring = 0
+    running = 0
+    max_running = 0
+
+    def __init__(self, entry, quality, ffmpeg=False, dl_path=None):
+        self.entry = entry
+
+    @classmethod
+    def change(cls, transferring, running):
+        with cls.lock:
+            cls.transferring += transferring
+            cls.running += running
+            cls.max_transferring = max(cls.max_transferring, cls.transferring)
+            cls.max_running = max(cls.max_running, cls.running)
+
+    def fetch(self):
+        if self.entry.ep == 3:
+            raise ConnectionError("cdn not reachable")
+
+        self.change(1, 1)
+        time.sleep(0.05)
+        self.change(-1, 0)
+        return f"ep{self.entry.ep}.mp4"
+
+    def remux(self):
+        time.sleep(0.1)
+        self.change(0, -1)
+
+    def cancel(self):
+        pass
+
+
+def test_scheduler(monkeypatch):
+    """Check the transfer limit, that merges overlap and that errors don't stop others"""
+    monkeypatch.setattr(scheduler, "download", FakeDownload)
+    entries = [Entry(ep=x, stream_url=f"https://cdn/ep{x}.mp4") for x in range(1, 9)]
+
+    download_scheduler = scheduler.DownloadScheduler("best", parallel=2)
+    results = download_scheduler.run(entries)
+
+    assert [x.entry.ep for x in results] == list(range(1, 9))
+    assert [x.ok for x in results] == [x != 3 for x in range(1, 9)]
+    assert results[0].path == "ep1.mp4"
+    assert FakeDownload.max_transferring == 2
+    assert FakeDownload.max_running > 2, "Merges did not overlap with transfers"
+    assert [x.items for x in download_scheduler.stats] == [8, 8, 7]
+
+
+class FakeVideourl(videourl):
+    def stream_url(self):
+        if self.entry.ep == 2:
+            raise ConnectionError("embed not reachable")
+
+        self.entry.stream_url = f"https://cdn/ep{self.entry.ep}.mp4"
+
+
+def test_scheduler_resolve(monkeypatch):
+    """Check if entries are resolved like resolve_many, at most one round ahead"""
+    monkeypatch.setattr(scheduler, "download", FakeDownload)
+    monkeypatch.setattr(scheduler, "videourl", FakeVideourl)
+    monkeypatch.setattr(Config, "stream_resolve_workers", 6)
+    entries = [Entry(ep=x, ep_url=f"https://gogo/ep-{x}") for x in range(1, 5)]
+
+    download_scheduler = scheduler.DownloadScheduler("best", parallel=2)
+    results = download_scheduler.run(entries)
+
+    # FakeDownload fails on EP 3
+    assert [x.ok for x in results] == [True, False, False, True]
+    assert str(results[1].error) == "embed not reachable"
+    assert results[3].path == "ep4.mp4"
+    assert download_scheduler.stats[0].workers == 2
+
+
+def test_pipeline_overlap():
+    """Check if stages overlap and the slowest stage is the most utilized"""
+
+    def stage(name, seconds):
+        def func(value):
+            time.sleep(seconds)
+            return value + [name]
+
+        return func
+
+    pipeline = Pipeline(
+        [
+            Stage("a", stage("a", 0.01)),
+            Stage("b", stage("b", 0.05)),
+            Stage("c", stage("c", 0.01)),
+        ]
+    )
+    start = time.monotonic()
+    results = pipeline.run([[x] for x in range(6)])
+
+    assert results == [[x, "a", "b", "c"] for x in range(6)]
+    # Serially it would take 6 * 0.07s
+    assert time.monotonic() - start < 6 * 0.07
+    stats = pipeline.stats()
+    assert max(stats, key=lambda x: x.utilization).name == "b"
+
+
+def test_budget_per_host():
+    """Check if the per host limit and the host overrides are kept"""
+    budget = ConnectionBudget(10, 2, {"slow.cdn": 1})
+    lock = threading.Lock()
+    active = {"fast.cdn": 0, "slow.cdn": 0}
+    peak = {"fast.cdn": 0, "slow.cdn": 0}
+
+    def fetch(host):
+        with budget.connection(f"https://{host}/ep.1.ts"):
+            with lock:
+                active[host] += 1
+                peak[host] = max(peak[host], active[host])
+            time.sleep(0.02)
+            with lock:
+                active[host] -= 1
+
+    threads = [
+        threading.Thread(target=fetch, args=(host,))
+        for host in ["fast.cdn", "slow.cdn"] * 6
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert peak == {"fast.cdn": 2, "slow.cdn": 1}
+
+
+def test_budget_per_host_default(monkeypatch):
+    """Check if one host can take all the workers of a download by default"""
+    conf = {"download_workers_max": 30}
+    monkeypatch.setattr(Config, "_read_config", staticmethod(lambda: (None, conf)))
+    assert Config().download_connections_per_host == 30
+
+    conf["download_connections_per_host"] = 8
+    assert Config().download_connections_per_host == 8
+
+
+def test_budget_speed_limit():
+    """Check if the speed limit slows down transfers"""
+    budget = ConnectionBudget(10, 10, speed_limit=100 * 1024)
+    start = time.monotonic()
+    for _ in range(3):
+        budget.throttle(50 * 1024)
+
+    # 150 KiB with 100 KiB in the bucket at 100 KiB/s
+    assert time.monotonic() - start >= 0.45
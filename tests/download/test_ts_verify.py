@@ -0,0 +1,95 @@
+import pytest
+
+from anipy_cli import ts_verify
+from anipy_cli.config import Config
+from anipy_cli.ts_verify import is_ts, verify_ts
+
+
+def packet(pid, counter, payload=True, discontinuity=False):
+    control = 0x01 if payload else 0x00
+    adaptation = b""
+    if discontinuity:
+        control |= 0x02
+        adaptation = bytes([1, 0x80])
+    header = bytes([0x47, pid >> 8 & 0x1F, pid & 0xFF, control << 4 | counter])
+    return (header + adaptation).ljust(188, b"\xff")
+
+
+def segment(count=50, pids=(0x100, 0x101)):
+    return b"".join(
+        packet(pids[i % len(pids)], i // len(pids) % 16) for i in range(count)
+    )
+
+
+def playlist(extension, count=3):
+    parts = "".join(f"#EXTINF:4,\n{i}.{extension}\n" for i in range(count))
+    return f"#EXTM3U\n{parts}#EXT-X-ENDLIST\n"
+
+
+@pytest.fixture(params=[True, False], ids=["numpy", "python"])
+def numpy(request, monkeypatch):
+    if request.param and not ts_verify.HAS_NUMPY:
+        pytest.skip("numpy not installed")
+    monkeypatch.setattr(ts_verify, "HAS_NUMPY", request.param)
+
+
+def test_valid(numpy):
+    assert verify_ts(segment()) is None
+
+
+def test_broken(numpy):
+    data = segment()
+    assert verify_ts(b"") == "empty"
+    assert verify_ts(b"<html><body>404</body></html>") == "got a html page instead"
+    assert "whole number" in verify_ts(data[:-100])
+    assert verify_ts(data[:188] + b"\x00" + data[189:]) == "packets without sync byte"
+
+
+def test_continuity(numpy):
+    """Check if a missing packet is found, unless it is flagged"""
+    data = segment()
+    assert verify_ts(data[: 188 * 10] + data[188 * 12 :]) == "2 continuity errors"
+
+    flagged = data[: 188 * 10] + packet(0x100, 6, discontinuity=True) + data[188 * 13 :]
+    assert verify_ts(flagged) == "1 continuity errors"
+
+    # Duplicates, packets without payload and null packets don't count
+    data = (
+        packet(0x100, 0)
+        + packet(0x100, 0)
+        + packet(0x100, 7, payload=False)
+        + packet(0x1FFF, 3)
+        + packet(0x100, 1)
+    )
+    assert verify_ts(data) is None
+
+
+def test_is_ts():
+    """Check if only segments meant to be mpeg-ts get verified"""
+    assert is_ts(segment(), "https://cdn/seg-1.jpg")
+    assert is_ts(b"<html>", "https://cdn/seg-1.ts?token=abc")
+    # ADTS (packed audio) starts with 0xFFF
+    assert not is_ts(b"\xff\xf1\x50\x80", "https://cdn/audio/seg-1.aac")
+
+
+def test_packed_audio_rendition(serve, fetch_stream, monkeypatch):
+    """Check if a verified download takes .aac parts of an audio rendition"""
+    monkeypatch.setattr(Config, "download_verify_segments", True)
+    adts = b"\xff\xf1\x50\x80" + bytes(100)
+    files = {
+        "/index.m3u8": "#EXTM3U\n"
+        '#EXT-X-MEDIA:TYPE=AUDIO,GROUP-ID="aud",NAME="en",URI="audio.m3u8"\n'
+        '#EXT-X-STREAM-INF:BANDWIDTH=1000,RESOLUTION=640x360,AUDIO="aud"\n'
+        "video.m3u8\n",
+        "/video.m3u8": playlist("ts"),
+        "/audio.m3u8": playlist("aac"),
+    }
+
+    def respond(handler):
+        if handler.path in files:
+            return 200, files[handler.path].encode()
+        return 200, segment() if handler.path.endswith(".ts") else adts
+
+    server = serve(respond)
+    assert fetch_stream(server.url + "index.m3u8") == segment() * 3
+    assert len([path for path in server.requests if path.endswith(".aac")]) == 3
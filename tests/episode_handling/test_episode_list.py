@@ -0,0 +1,30 @@
+from anipy_cli.url_handler import EpisodeList
+
+EP_LIST = [
+    {"ep": x, "link": f"https://gogoanime.tel/86-episode-{x.replace('.', '-')}"}
+    for x in ["1", "2", "3", "7", "7.5", "8", "10", "11"]
+]
+
+
+def test_link():
+    ep_index = EpisodeList(EP_LIST)
+
+    assert ep_index.link(7.5) == "https://gogoanime.tel/86-episode-7-5"
+    assert ep_index.link(4) is None
+    assert 10 in ep_index and "9" not in ep_index
+
+
+def test_range():
+    """Test range expansion including special episodes"""
+    ep_index = EpisodeList(EP_LIST)
+
+    assert ep_index.range("3", "10") == ["3", "7", "7.5", "8", "10"]
+    assert ep_index.range("10", "3") == []
+
+
+def test_specials_and_after():
+    ep_index = EpisodeList(EP_LIST)
+
+    assert ep_index.specials == ["7.5"]
+    assert [x["ep"] for x in ep_index.after(8)] == ["10", "11"]
+    assert ep_index.after(-1) == EP_LIST
@@ -0,0 +1,118 @@
+import os
+
+import pytest
+
+from anipy_cli import Entry, download
+from anipy_cli.config import Config
+from anipy_cli.library import Library, name_pattern
+
+
+@pytest.fixture
+def library(tmp_path, monkeypatch):
+    path = tmp_path / "library.db"
+    monkeypatch.setattr(Config, "library_index_path", property(lambda self: path))
+    return Library()
+
+
+@pytest.fixture
+def downloads(tmp_path, monkeypatch):
+    """Two shows in the download folder and one in the seasonals folder in it"""
+    root = tmp_path / "download"
+    for folder, names in [
+        ("Hyouka", ["Hyouka_1.mp4", "Hyouka_2.mp4", "notes.txt"]),
+        ("Kimi-no-Na-wa", ["Kimi-no-Na-wa_1.5.mp4"]),
+        ("seasonals/Frieren", ["Frieren_12.mp4"]),
+    ]:
+        (root / folder).mkdir(parents=True)
+        for name in names:
+            (root / folder / name).write_bytes(os.urandom(1000))
+    (root / "Hyouka" / "3_temp").mkdir()
+
+    monkeypatch.setattr(
+        Config, "download_name_format", "{show_name}_{episode_number}.mp4"
+    )
+    return root
+
+
+def test_name_pattern():
+    match = name_pattern("{show_name} - {episode_number} - {quality}.mp4").match(
+        "Hyouka - 12 - 1080p.mp4"
+    )
+    assert match.group("ep", "quality") == ("12", "1080p")
+    assert name_pattern("{show_name}_{episode_number}.mp4").match("Hyouka.mp4") is None
+
+
+def test_scan(library, downloads):
+    """Check if the episodes of all show folders are indexed, and only changes on a rescan"""
+    roots = [downloads, downloads / "seasonals"]
+    result = library.scan(roots)
+    assert (result.files, result.added, result.removed) == (4, 4, 0)
+
+    assert library.find("Hyouka", 1).path.name == "Hyouka_1.mp4"
+    assert library.find("Hyouka", "2.0") is not None
+    assert library.find("Kimi-no-Na-wa", 1.5) is not None
+    assert library.find("Frieren", 12) is not None
+    assert library.find("Hyouka", 3) is None
+    assert library.missing("Hyouka", [1, 2, 3, 4]) == [3, 4]
+
+    (downloads / "Hyouka" / "Hyouka_2.mp4").unlink()
+    result = library.scan(roots)
+    assert (result.files, result.added, result.removed) == (3, 0, 1)
+    assert library.missing("Hyouka", [1, 2]) == [2]
+
+
+def test_find_checks_disk(library, tmp_path):
+    """Check if a file that was cut off or removed does not count as downloaded"""
+    path = tmp_path / "Hyouka_1.mp4"
+    path.write_bytes(os.urandom(1000))
+    library.add(path, "Hyouka", 1, "1080p")
+    assert library.find("Hyouka", 1).quality == "1080p"
+
+    path.write_bytes(b"cut")
+    assert library.find("Hyouka", 1) is None
+    path.unlink()
+    assert library.find("Hyouka", 1) is None
+
+
+def test_download_skips_indexed(library, tmp_path, monkeypatch):
+    """Check if an indexed episode is skipped, though the name format changed"""
+    show_folder = tmp_path / "Hyouka"
+    show_folder.mkdir()
+    old = show_folder / "Hyouka - 1 - 480p.mp4"
+    old.write_bytes(os.urandom(1000))
+    library.add(old, "Hyouka", 1, "480p")
+
+    entry = Entry(
+        show_name="Hyouka",
+        ep=1,
+        quality="1080p",
+        stream_url="http://127.0.0.1:9/ep.mp4",
+    )
+    assert download(entry, "best", dl_path=tmp_path).fetch() == old.resolve()
+
+
+def test_rescan_keeps_category(library, downloads):
+    """Check if a rescan of a changed file keeps what the download recorded"""
+    path = downloads / "Hyouka" / "Hyouka_1.mp4"
+    library.add(path, "Hyouka", 1, "1080p", "https://example.com/category/hyouka")
+    path.write_bytes(os.urandom(2000))
+    (downloads / "Hyouka" / "Hyouka_3.part.mp4").write_bytes(b"")
+
+    library.scan([downloads])
+    found = library.find("Hyouka", 1)
+    assert found.size == 2000
+    assert found.category_url == "https://example.com/category/hyouka"
+    assert found.quality == "1080p"
+    assert library.find("Hyouka", 3) is None
+
+
+def test_download_does_not_index_existing(library, tmp_path):
+    """Check if a file at the download path is skipped, but not indexed"""
+    show_folder = tmp_path / "Hyouka"
+    show_folder.mkdir()
+    existing = show_folder / "Hyouka_1.mp4"
+    existing.write_bytes(bytes(1000))
+
+    entry = Entry(show_name="Hyouka", ep=1, stream_url="http://127.0.0.1:9/ep.mp4")
+    assert download(entry, "best", dl_path=tmp_path).fetch() == existing
+    assert library.find("Hyouka", 1) is None
@@ -0,0 +1,54 @@
+import time
+from copy import copy
+from anipy_cli.misc import Entry
+from anipy_cli.prefetch import StreamPrefetcher
+
+
+class FakePrefetcher(StreamPrefetcher):
+    def _resolve(self, entry, ep):
+        entry.ep = ep
+        entry.stream_url = f"https://cdn/hyouka-{ep}.m3u8"
+        return entry
+
+
+def test_prefetch_next_and_prev():
+    entry = Entry(category_url="https://gogoanime.tel/category/hyouka", ep=3)
+    prefetcher = FakePrefetcher("best")
+    prefetcher.prefetch(entry, next_ep=True, prev_ep=True)
+
+    assert prefetcher.get(entry, 4).stream_url == "https://cdn/hyouka-4.m3u8"
+    assert prefetcher.get(entry, 2).ep == 2
+    assert prefetcher.get(entry, 4) is None, "Prefetched entry returned twice"
+
+
+def test_prefetch_cancel():
+    entry = Entry(category_url="https://gogoanime.tel/category/hyouka", ep=3)
+    prefetcher = FakePrefetcher("best")
+    prefetcher.prefetch(entry)
+    prefetcher.cancel()
+
+    assert prefetcher.get(entry, 4) is None
+
+    other = copy(entry)
+    other.category_url = "https://gogoanime.tel/category/naruto"
+    prefetcher.prefetch(entry)
+    prefetcher.prefetch(other)
+
+    assert prefetcher.get(entry, 4) is None, "Prefetch of old show not dropped"
+    assert prefetcher.get(other, 4).category_url == other.category_url
+
+
+def test_prefetch_expired():
+    """Check if a prefetched stream whose url expired is not played"""
+    entry = Entry(category_url="https://gogoanime.tel/category/hyouka", ep=3)
+    prefetcher = FakePrefetcher("best")
+    prefetcher.prefetch(entry)
+    assert prefetcher.get(entry, 4) is not None
+
+    # Expires in 30 seconds, within the minute of margin
+    prefetcher._resolve = lambda entry, ep: Entry(
+        ep=ep,
+        stream_url=f"https://cdn/hyouka-{ep}.m3u8?expires={int(time.time()) + 30}",
+    )
+    prefetcher.prefetch(entry)
+    assert prefetcher.get(entry, 4) is None
@@ -0,0 +1,45 @@
+from anipy_cli import videourl, Entry
+from anipy_cli import url_handler
+
+PAGE = """
+<body class="container-1111111111111111">
+<div class="wrapper container-2222222222222222">
+<div class="videocontent-3333333333333333">
+"""
+
+
+class FakeVideourl(videourl):
+    page_loads = 0
+
+    def embed_page(self):
+        FakeVideourl.page_loads += 1
+        return PAGE
+
+
+def test_keys_cached_per_host():
+    """Keys are parsed once per embed host and shared between instances"""
+    url_handler._enc_keys_cache.clear()
+    FakeVideourl.page_loads = 0
+    entry = Entry(embed_url="https://embed.host/streaming.php?id=MTIz")
+
+    keys = FakeVideourl(entry, "best").get_enc_keys()
+    FakeVideourl(entry, "best").get_enc_keys()
+
+    assert keys == {
+        "key": b"1111111111111111",
+        "iv": b"2222222222222222",
+        "second_key": b"3333333333333333",
+    }
+    assert FakeVideourl.page_loads == 1
+
+
+def test_keys_invalidate():
+    url_handler._enc_keys_cache.clear()
+    FakeVideourl.page_loads = 0
+    url_class = FakeVideourl(Entry(embed_url="https://embed.host/e?id=1"), "best")
+
+    url_class.get_enc_keys()
+    url_class.invalidate_enc_keys()
+    url_class.get_enc_keys()
+
+    assert FakeVideourl.page_loads == 2
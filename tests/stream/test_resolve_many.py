@@ -0,0 +1,24 @@
+import time
+from anipy_cli import videourl, Entry
+
+
+class FakeVideourl(videourl):
+    def stream_url(self):
+        if self.entry.ep == 2:
+            raise ConnectionError("embed not reachable")
+
+        time.sleep(0.05 * (5 - self.entry.ep))
+        self.entry.stream_url = f"https://cdn/ep{self.entry.ep}.m3u8"
+
+
+def test_resolve_many_order_and_errors():
+    """Results are in input order and one failing entry does not stop the others"""
+    entries = [Entry(ep=x, ep_url=f"https://gogo/ep-{x}") for x in range(1, 5)]
+
+    results = FakeVideourl.resolve_many(entries, "best", workers=4)
+
+    assert [x.entry.ep for x in results] == [1, 2, 3, 4]
+    assert [x.ok for x in results] == [True, False, True, True]
+    assert isinstance(results[1].error, ConnectionError)
+    assert results[3].entry.stream_url == "https://cdn/ep4.m3u8"
+    assert entries[0].stream_url == "", "Input entries were modified"
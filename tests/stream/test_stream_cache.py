@@ -0,0 +1,88 @@
+import time
+
+import pytest
+
+from anipy_cli import Entry
+from anipy_cli.config import Config
+from anipy_cli.url_handler import stream_url_expiry, videourl
+
+
+def test_expiry_from_signed_url():
+    """The expiry of a signed url is used (minus a minute of margin)"""
+    expires = int(time.time()) + 3600
+    url = f"https://cdn.example/ep.1.m3u8?token=abc&expires={expires}"
+
+    assert stream_url_expiry(url) == expires - 60
+
+
+def test_expiry_fallback_ttl():
+    """Urls without (or with a past) expiry use the configured ttl"""
+    now = time.time()
+
+    assert stream_url_expiry("https://cdn.example/ep.1.m3u8") > now
+    assert stream_url_expiry("https://cdn.example/ep.1.m3u8?e=1000") > now
+
+
+def test_expiry_far_future(monkeypatch):
+    """Expiries too far ahead to be seconds (e.g. milliseconds) use the ttl"""
+    monkeypatch.setattr(Config, "stream_cache_ttl", 1800)
+    now = time.time()
+    url = f"https://cdn.example/ep.1.m3u8?expires={int(now * 1000)}"
+
+    assert now < stream_url_expiry(url) <= time.time() + 1800
+
+
+class FakeVideourl(videourl):
+    source_requests = 0
+
+    def embed_url(self):
+        self.entry.embed_url = "https://embed.host/streaming.php?id=MTIz"
+
+    def get_enc_keys(self, refresh=False):
+        return {}
+
+    def get_sources(self, enc_keys):
+        FakeVideourl.source_requests += 1
+        expires = int(time.time()) + 3600
+        return {
+            "source": [
+                {
+                    "file": f"https://cdn.example/ep.1.m3u8?expires={expires}",
+                    "label": "hls P",
+                    "type": "hls",
+                }
+            ]
+        }
+
+
+@pytest.fixture
+def cache_path(tmp_path, monkeypatch):
+    path = tmp_path / "stream_cache.json"
+    monkeypatch.setattr(Config, "stream_cache_path", property(lambda self: path))
+    FakeVideourl.source_requests = 0
+    return path
+
+
+def resolve():
+    url_class = FakeVideourl(Entry(ep_url="https://gogo/hyouka-episode-1"), "best")
+    url_class.stream_url()
+    return url_class.get_entry()
+
+
+def test_stream_url_cached(cache_path):
+    """A second stream_url() for the same episode and quality makes no request"""
+    first = resolve()
+    second = resolve()
+
+    assert FakeVideourl.source_requests == 1
+    assert second.stream_url == first.stream_url
+    assert second.embed_url == first.embed_url
+
+
+def test_stream_url_cache_disabled(cache_path, monkeypatch):
+    """With stream_cache_ttl 0 even signed urls are not cached"""
+    monkeypatch.setattr(Config, "stream_cache_ttl", 0)
+    resolve()
+    resolve()
+
+    assert FakeVideourl.source_requests == 2